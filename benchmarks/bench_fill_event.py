@@ -0,0 +1,95 @@
+"""Benchmark the watcher -> dispatcher event hand-off.
+
+Compares the legacy dict event (built in the watcher, then re-read with
+``.get``/``float`` in the dispatcher) against :class:`server.events.FillEvent`
+on the FILLED frames from ``benchmarks/data/user_data_frames.jsonl``.
+Reports best-of-5 CPU time and retained bytes per event.
+
+Usage::
+
+    python -m benchmarks.bench_fill_event [--rounds 2000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_json_codec import load_frames  # noqa: E402
+from server import json_codec  # noqa: E402
+from server.events import FillEvent  # noqa: E402
+
+
+def _legacy(fill: dict, free_usdt: float, free_btc: float) -> tuple:
+    event = {
+        "type": "order_fill",
+        "order": fill,
+        "balances": {"USDT": free_usdt, "BTC": free_btc},
+        "side": fill.get("S"),
+        "base_filled": float(fill.get("z", 0.0)),
+        "quote_filled": float(fill.get("Z", 0.0)),
+        "leader_free_usdt": free_usdt,
+        "leader_free_btc": free_btc,
+        "event_id": f"{fill.get('i')}-{fill.get('E')}-{fill.get('Z')}",
+        "symbol": fill.get("s"),
+    }
+    # What CopyDispatcher.dispatch used to do on entry.
+    leader_quote = float(event.get("quote_filled", 0.0))
+    leader_base = float(event.get("base_filled", 0.0))
+    usdt = float(event.get("leader_pre_usdt") or event.get("leader_free_usdt", 0.0))
+    btc = float(event.get("leader_pre_btc") or event.get("leader_free_btc", 0.0))
+    return event, (event.get("event_id"), event.get("side"), leader_quote, leader_base, usdt, btc)
+
+
+def _typed(fill: dict, free_usdt: float, free_btc: float) -> tuple:
+    event = FillEvent.from_execution_report(fill, free_usdt=free_usdt, free_btc=free_btc)
+    return event, (
+        event.event_id, event.side, event.quote_filled, event.base_filled,
+        event.ref_usdt, event.ref_btc,
+    )
+
+
+def _measure(build, fills: list[dict], rounds: int, repeat: int = 5) -> tuple[float, float]:
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for fill in fills:
+                build(fill, 100.0, 1.0)
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(fill, 100.0, 1.0)[0] for fill in fills]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return elapsed / (rounds * len(fills)), (after - before) / len(fills)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    fills = [
+        f for f in map(json_codec.loads, load_frames())
+        if f.get("e") == "executionReport" and f.get("X") == "FILLED"
+    ]
+    legacy_t, legacy_b = _measure(_legacy, fills, args.rounds)
+    typed_t, typed_b = _measure(_typed, fills, args.rounds)
+
+    print(f"events: {len(fills)} x {args.rounds} rounds")
+    print(f"dict:      {legacy_t * 1e6:6.2f} us/event  {legacy_b:7.0f} B/event retained")
+    print(f"FillEvent: {typed_t * 1e6:6.2f} us/event  {typed_b:7.0f} B/event retained")
+
+
+if __name__ == "__main__":
+    main()
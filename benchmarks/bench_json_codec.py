@@ -0,0 +1,59 @@
+"""Benchmark JSON decoding of recorded Binance user-data frames.
+
+Compares the stdlib :func:`json.loads` against :func:`server.json_codec.loads`
+on the frames in ``benchmarks/data/user_data_frames.jsonl``.
+
+Usage::
+
+    python -m benchmarks.bench_json_codec [--rounds 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from server import json_codec  # noqa: E402
+
+FRAMES_FILE = Path(__file__).with_name("data") / "user_data_frames.jsonl"
+
+
+def load_frames(path: Path = FRAMES_FILE) -> list[str]:
+    """Return recorded frames as raw text, exactly as the websocket yields them."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def _time_decoder(decode, frames: list[str], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for frame in frames:
+            decode(frame)
+    return time.perf_counter() - start
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    frames = load_frames()
+    total = len(frames) * args.rounds
+    stdlib = _time_decoder(json.loads, frames, args.rounds)
+    fast = _time_decoder(json_codec.loads, frames, args.rounds)
+
+    print(f"frames: {len(frames)} x {args.rounds} rounds = {total} decodes")
+    print(f"json (stdlib):      {stdlib / total * 1e6:8.2f} us/frame")
+    print(f"{json_codec.BACKEND + ' (codec):':<20}{fast / total * 1e6:8.2f} us/frame")
+    print(f"speedup:            {stdlib / fast:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Compare order round-trip latency: REST vs the Binance WebSocket API.
+
+Times sequential market orders sent with
+:meth:`server.connectors.binance.BinanceConnector.create_market_order`
+against :class:`server.connectors.binance_ws_api.BinanceWsApiConnector`.
+
+By default both run against a loopback emulator (an HTTP/1.1 keep-alive
+server and a WebSocket API server), which isolates client-side overhead.
+``--live`` uses the Binance spot testnet with the test order endpoints
+(``/api/v3/order/test`` and ``order.test``), so nothing is filled; the
+keys are read from ``BINANCE_TESTNET_KEY`` / ``BINANCE_TESTNET_SECRET``.
+
+Usage::
+
+    python -m benchmarks.bench_order_latency [--orders 200] [--live]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import websockets  # noqa: E402
+
+from server.connectors.binance import BinanceConnector  # noqa: E402
+from server.connectors.binance_ws_api import BinanceWsApiConnector, ws_api_sessions  # noqa: E402
+from server.connectors.http import close_shared_transports  # noqa: E402
+
+ACK = {"symbol": "BTCUSDT", "orderId": 1, "status": "FILLED", "executedQty": "0.0001"}
+
+
+async def _http_handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    body = json.dumps(ACK).encode()
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            if length:
+                await reader.readexactly(length)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                b"Content-Length: %d\r\n\r\n%s" % (len(body), body)
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _ws_handler(ws) -> None:
+    async for raw in ws:
+        req = json.loads(raw)
+        await ws.send(json.dumps({"id": req["id"], "status": 200, "result": ACK}))
+
+
+async def _time(call, orders: int) -> list[float]:
+    await call(0)  # 预热：建立连接
+    samples = []
+    for i in range(orders):
+        start = time.perf_counter()
+        await call(i + 1)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(name: str, samples: list[float]) -> None:
+    q = statistics.quantiles(samples, n=100)
+    print(
+        f"{name:<10} mean {statistics.fmean(samples):7.3f} ms  p50 {q[49]:7.3f}  "
+        f"p90 {q[89]:7.3f}  p99 {q[98]:7.3f}"
+    )
+
+
+async def run(orders: int, live: bool) -> None:
+    if live:
+        key = os.environ["BINANCE_TESTNET_KEY"]
+        secret = os.environ["BINANCE_TESTNET_SECRET"]
+        rest = BinanceConnector(testnet=True)
+        ws = BinanceWsApiConnector(key, secret, testnet=True)
+        servers = []
+    else:
+        key = secret = "bench"
+        http_server = await asyncio.start_server(_http_handler, "127.0.0.1", 0)
+        ws_server = await websockets.serve(_ws_handler, "127.0.0.1", 0)
+        servers = [http_server, ws_server]
+        rest = BinanceConnector(rest_base=f"http://127.0.0.1:{http_server.sockets[0].getsockname()[1]}")
+        ws = BinanceWsApiConnector(key, secret, url=f"ws://127.0.0.1:{ws_server.sockets[0].getsockname()[1]}")
+
+    try:
+        rest_samples = await _time(
+            lambda i: rest.create_market_order(
+                key, secret, "BUY", quote_amount=10, client_order_id=f"benchrest{i}", test=live
+            ),
+            orders,
+        )
+        ws_samples = await _time(
+            lambda i: ws.order_market_buy("BTCUSDT", 10, client_order_id=f"benchws{i}", test=live),
+            orders,
+        )
+    finally:
+        await rest.close()
+        await ws.close()
+        await ws_api_sessions.aclose()
+        await close_shared_transports()
+        for server in servers:
+            server.close()
+            await server.wait_closed()
+
+    print(f"orders: {orders} each ({'testnet' if live else 'loopback'})")
+    _report("REST", rest_samples)
+    _report("WS API", ws_samples)
+    print(f"speedup:   {statistics.median(rest_samples) / statistics.median(ws_samples):7.2f}x (p50)")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--live", action="store_true", help="use the Binance spot testnet")
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.orders, args.live))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark batch follower sizing against the per-account Python loop.
+
+Usage::
+
+    python -m benchmarks.bench_sizing [--followers 5000] [--rounds 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from server import sizing  # noqa: E402
+from server.sizing import FollowerTable, size_orders  # noqa: E402
+
+
+def _per_account(rows, side: str, ratio: float) -> list[float]:
+    out = []
+    for _, exchange, usdt, btc in rows:
+        amount = max(0.0, (usdt if side == "BUY" else btc) * ratio)
+        decimals = sizing.AMOUNT_DECIMALS[exchange][side]
+        out.append(sizing.round_down(amount, decimals))
+    return out
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--followers", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(1)
+    rows = [
+        (f"acc{i}", rng.choice(["binance", "bitget"]), rng.uniform(0, 5000), rng.uniform(0, 0.2))
+        for i in range(args.followers)
+    ]
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        _per_account(rows, "BUY", 0.137)
+    loop = (time.perf_counter() - start) / args.rounds
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        size_orders(FollowerTable.from_rows(rows), "BUY", 0.137, 0.0)
+    batch = (time.perf_counter() - start) / args.rounds
+
+    backend = "numpy" if sizing.np is not None else "python"
+    print(f"followers: {args.followers}")
+    print(f"per-account loop: {loop * 1e3:8.3f} ms/event")
+    print(f"batch ({backend}): {batch * 1e3:8.3f} ms/event (incl. table build)")
+
+
+if __name__ == "__main__":
+    main()
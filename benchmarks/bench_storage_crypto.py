@@ -0,0 +1,82 @@
+"""Benchmark encrypting a credential store of many follower accounts.
+
+Compares the legacy per-byte XOR encoding with :func:`server.crypto.seal`
+(AES-256-GCM when ``cryptography`` is installed, the stdlib SHAKE-256 +
+HMAC cipher otherwise). Key derivation is cached and excluded, as it is
+after the first save of a store.
+
+Usage::
+
+    python -m benchmarks.bench_storage_crypto [--accounts 500] [--rounds 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from server import crypto  # noqa: E402
+
+
+def _legacy_xor(data: bytes, secret: bytes) -> bytes:
+    key = hashlib.sha256(secret).digest()
+    return base64.b64encode(bytes(b ^ key[i % len(key)] for i, b in enumerate(data)))
+
+
+def _store(accounts: int) -> bytes:
+    return json.dumps({"accounts": [
+        {
+            "name": f"follower-{i}",
+            "exchange": "binance" if i % 2 else "bitget",
+            "env": "prod",
+            "api_key": os.urandom(32).hex(),
+            "api_secret": os.urandom(32).hex(),
+            "passphrase": None if i % 2 else os.urandom(8).hex(),
+            "status": "active",
+        }
+        for i in range(accounts)
+    ]}).encode("utf-8")
+
+
+def _time(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    secret = b"benchmark-secret"
+    salt = os.urandom(crypto.SALT_SIZE)
+    plain = _store(args.accounts)
+    sealed = crypto.seal(plain, secret, salt=salt)  # 预先派生并缓存密钥
+
+    legacy = _time(lambda: _legacy_xor(plain, secret), args.rounds)
+    seal = _time(lambda: crypto.seal(plain, secret, salt=salt), args.rounds)
+    unseal = _time(lambda: crypto.open_sealed(sealed, secret), args.rounds)
+    cipher = "aes-256-gcm" if crypto.DEFAULT_CIPHER == crypto.AES_GCM else "shake256+hmac"
+
+    print(f"store: {args.accounts} accounts, {len(plain) / 1024:.1f} KiB")
+    print(f"legacy xor:          {legacy * 1e3:8.3f} ms/save")
+    print(f"seal ({cipher + '):':<15}{seal * 1e3:8.3f} ms/save")
+    print(f"open ({cipher + '):':<15}{unseal * 1e3:8.3f} ms/load")
+    print(f"speedup:             {legacy / seal:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
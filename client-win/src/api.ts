@@ -86,11 +86,80 @@ export async function getBalance(account: string) {
   return res.data;
 }
 
-export async function getCopyResults() {
-  const res = await client.get('/copy/results');
+export interface BalancesSnapshot {
+  epoch: string;
+  version: number;
+  balances: Record<string, { BTC: number; USDT: number; stale: boolean }>;
+}
+
+/**
+ * Fetch every account's balance in one request. Returns `null` when the
+ * server answers 304 because nothing changed since `etag`.
+ */
+export async function getBalances(
+  etag?: string
+): Promise<{ etag: string; data: BalancesSnapshot } | null> {
+  const res = await client.get('/balances', {
+    headers: etag ? { 'If-None-Match': etag } : undefined,
+    validateStatus: (s) => (s >= 200 && s < 300) || s === 304
+  });
+  if (res.status === 304) return null;
+  return { etag: res.headers['etag'], data: res.data };
+}
+
+export async function getCopyResults(breakers = false) {
+  const res = await client.get('/copy/results', {
+    params: breakers ? { breakers: true } : undefined
+  });
   return res.data;
 }
 
+// ---------------------------------------------------------------------------
+// Push feed (Server-Sent Events)
+// ---------------------------------------------------------------------------
+
+export interface PushMessage {
+  type: 'result' | 'balance' | 'watcher' | 'resync';
+  ts: number;
+  [key: string]: any;
+}
+
+/**
+ * Stream push messages from `/stream` until the connection drops.
+ * Uses fetch instead of EventSource so the Authorization header can be sent.
+ */
+export async function streamUpdates(
+  onMessage: (msg: PushMessage) => void,
+  signal?: AbortSignal
+): Promise<void> {
+  const res = await fetch(`${API_BASE_URL}/stream`, {
+    headers: { Authorization: `Bearer ${API_TOKEN}` },
+    signal
+  });
+  if (!res.ok || !res.body) {
+    throw new Error(`stream failed: ${res.status}`);
+  }
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buffer += decoder.decode(value, { stream: true });
+    let sep: number;
+    while ((sep = buffer.indexOf('\n\n')) >= 0) {
+      const frame = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      const data = frame
+        .split('\n')
+        .filter((line) => line.startsWith('data: '))
+        .map((line) => line.slice(6))
+        .join('\n');
+      if (data) onMessage(JSON.parse(data));
+    }
+  }
+}
+
 export async function updateAccountStatus(name: string, status: string) {
   const res = await client.put(
     `/accounts/${encodeURIComponent(name)}/status`,
@@ -6,9 +6,11 @@ import {
   listAccounts,
   createFollowerAccount,
   verifyFollowerAccount,
-  getBalance,
+  getBalances,
   getCopyResults,
-  updateAccountStatus
+  updateAccountStatus,
+  streamUpdates,
+  PushMessage
 } from './api';
 
 const statusEl = document.getElementById('status')!;
@@ -167,40 +169,79 @@ async function refreshGlobal() {
   }
 }
 
+function renderBalance(name: string, bal: any) {
+  const row = accountRows[name];
+  if (!row) return;
+  row.usdtEl.textContent = (bal.USDT ?? 0).toFixed(2);
+  row.btcEl.textContent = (bal.BTC ?? 0).toFixed(6);
+}
+
+function renderResult(name: string, r: any) {
+  const row = accountRows[name];
+  if (!row || !r) return;
+  row.resultEl.textContent = r.success ? 'Success' : 'Fail';
+  row.errorEl.textContent = r.success ? '' : r.error || '';
+}
+
+let balancesEtag: string | undefined;
+
 async function updateBalances() {
-  await Promise.all(
-    accounts.map(async (acc: any) => {
-      try {
-        const bal = await getBalance(acc.name);
-        const row = accountRows[acc.name];
-        row.usdtEl.textContent = (bal.USDT ?? 0).toFixed(2);
-        row.btcEl.textContent = (bal.BTC ?? 0).toFixed(6);
-      } catch (e) {
-        const row = accountRows[acc.name];
-        row.usdtEl.textContent = 'Err';
-        row.btcEl.textContent = 'Err';
-      }
-    })
-  );
+  try {
+    const res = await getBalances(balancesEtag);
+    if (!res) return;
+    balancesEtag = res.etag;
+    Object.entries(res.data.balances).forEach(([name, bal]) =>
+      renderBalance(name, bal)
+    );
+  } catch (e) {
+    Object.values(accountRows).forEach((row) => {
+      row.usdtEl.textContent = 'Err';
+      row.btcEl.textContent = 'Err';
+    });
+  }
 }
 
 async function updateResults() {
   try {
     const results = await getCopyResults();
-    Object.keys(accountRows).forEach((name) => {
-      const row = accountRows[name];
-      const r = results[name];
-      if (r) {
-        row.resultEl.textContent = r.success ? 'Success' : 'Fail';
-        row.errorEl.textContent = r.success ? '' : r.error || '';
-      }
-    });
+    Object.keys(accountRows).forEach((name) => renderResult(name, results[name]));
   } catch (e) {
     // ignore
   }
 }
 
+// Live updates come from the push feed; polling only runs while it is down.
+let streaming = false;
+
+function handlePush(msg: PushMessage) {
+  if (msg.type === 'balance') {
+    renderBalance(msg.account, msg.balance);
+  } else if (msg.type === 'result') {
+    renderResult(msg.account, msg.result);
+  } else if (msg.type === 'resync') {
+    balancesEtag = undefined;
+    updateBalances();
+    updateResults();
+  }
+}
+
+async function runStream() {
+  for (;;) {
+    try {
+      streaming = true;
+      await streamUpdates(handlePush);
+    } catch (e) {
+      // fall through to reconnect
+    }
+    streaming = false;
+    await new Promise((resolve) => setTimeout(resolve, 3000));
+    updateBalances();
+    updateResults();
+  }
+}
+
 setInterval(() => {
+  if (streaming) return;
   updateBalances();
   updateResults();
 }, 5000);
@@ -250,6 +291,7 @@ addAccBtn.addEventListener('click', async () => {
   }
   await createFollowerAccount(payload);
   await loadAccounts();
+  balancesEtag = undefined;
   updateBalances();
   updateResults();
 });
@@ -258,4 +300,5 @@ refreshGlobal();
 loadAccounts().then(() => {
   updateBalances();
   updateResults();
+  runStream();
 });
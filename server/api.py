@@ -7,14 +7,22 @@ import logging
 import os
 from typing import Any, Dict, List
 
-from fastapi import APIRouter, Header, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 
 from .accounts import AccountStatus, account_service
 from .balances import balance_service
 from .copy_dispatcher import copy_dispatcher
 from .models import CopyStatusResponse, LeaderConfig, StatusResponse
-from .storage import load_leader_credentials, save_leader_credentials
+from .json_codec import dumps_bytes
+from .prestage import PRESTAGE_ENABLED, PreStager
+from .profiling import profiler, spans
+from .push import push_hub
+from .sharding import ShardedDispatcher
+from . import storage
+from .leader_election import LeaderElector, SQLiteLease
+from .storage import asave_leader_credentials, load_leader_credentials
 
 # ⚠️ 注意：
 # 你的 follower 相关接口定义在独立模块中，需要把它的 router include 进来。
@@ -53,23 +61,181 @@ async def _run_leader_watcher(cfg: LeaderConfig) -> None:
     from . import leader_watcher
 
     logging.info("[LEADER] _run_leader_watcher starting...")
+    push_hub.publish("watcher", state="starting", exchange=cfg.exchange, env=cfg.env)
 
+    journal = None
+    stager = None
     try:
+        if PRESTAGE_ENABLED:
+            # 收到 leader 的 NEW 回报即预先计算、签名 follower 订单
+            stager = PreStager(
+                copy_dispatcher, allow=lambda: _elector is None or _elector.is_leader
+            )
+        journal_file = os.getenv("LEADER_JOURNAL_FILE")
+        if journal_file:
+            from .journal import EventJournal
+
+            journal = EventJournal(journal_file)
+            logging.info("[LEADER] journaling leader frames to %s", journal_file)
+
         logging.info("[LEADER] launching watch_leader_orders stream...")
-        async for event in leader_watcher.watch_leader_orders(
-            cfg.api_key,
-            cfg.api_secret,
-            testnet=cfg.env == "test",
-        ):
+        if cfg.exchange == "bitget":
+            from .bitget_watcher import watch_bitget_leader_orders
+
+            stream = watch_bitget_leader_orders(
+                cfg.api_key,
+                cfg.api_secret,
+                cfg.passphrase or "",
+                demo=cfg.env in ("demo", "test"),
+                journal=journal,
+                on_activity=copy_dispatcher.prewarm,
+                stager=stager,
+            )
+        else:
+            stream = leader_watcher.watch_leader_orders(
+                cfg.api_key,
+                cfg.api_secret,
+                testnet=cfg.env == "test",
+                journal=journal,
+                on_activity=copy_dispatcher.prewarm,  # 重连 / NEW 回报时预热 follower 连接
+                stager=stager,
+            )
+        async for event in stream:
+            if _elector is not None and not _elector.is_leader:
+                # 租约已失效：不再下单，等待被 on_demoted 取消
+                logging.warning("[LEADER] lease lost, dropping event %s", event.event_id)
+                continue
+            push_hub.publish(
+                "watcher", state="fill", event_id=event.event_id, side=event.side
+            )
             try:
-                logging.info(f"[LEADER] received event: {event.get('type')}")
+                logging.info(f"[LEADER] received event: {event.type} {event.event_id}")
                 await copy_dispatcher.dispatch(event)
             except Exception:
                 logging.exception("dispatch failed")
+    except asyncio.CancelledError:
+        push_hub.publish("watcher", state="stopped")
+        raise
     except Exception as e:  # 打印完整 traceback，便于诊断
         import traceback
+        push_hub.publish("watcher", state="failed", error=str(e))
         logging.error(f"❌ leader watcher failed: {e}")
         logging.error(traceback.format_exc())
+    finally:
+        if stager is not None:
+            await stager.close()
+        if journal is not None:
+            journal.close()
+
+
+async def _stop_leader_task() -> None:
+    global _leader_task
+    if _leader_task:
+        _leader_task.cancel()
+        try:
+            await _leader_task
+        except BaseException:
+            pass
+        _leader_task = None
+
+
+async def _restart_leader_task(cfg: LeaderConfig) -> None:
+    global _leader_task
+    await _stop_leader_task()
+    _leader_task = asyncio.create_task(_run_leader_watcher(cfg))
+
+
+# ---------------------------------------------------------------------------
+# Leader election (multi-worker deployments)
+# ---------------------------------------------------------------------------
+
+_elector: LeaderElector | None = None
+_creds_mtime: int = 0
+
+
+def _credentials_mtime() -> int:
+    try:
+        return os.stat(storage._cred_file).st_mtime_ns
+    except OSError:
+        return 0
+
+
+async def _start_saved_leader() -> None:
+    """Start the watcher from stored credentials, if any."""
+    global _creds_mtime
+    _creds_mtime = _credentials_mtime()
+    creds = load_leader_credentials()
+    if not isinstance(creds, dict) or not creds.get("api_key"):
+        await _stop_leader_task()
+        return
+    try:
+        cfg = LeaderConfig(**creds)
+    except Exception:
+        logging.exception("[LEADER] stored leader credentials are invalid")
+        return
+    await _restart_leader_task(cfg)
+    logging.info("[LEADER] watcher started by elected process")
+
+
+async def _on_lease_renewed() -> None:
+    # 其它 worker 收到 PUT /leader 时只写文件，由 leader 进程在续约时发现并重启 watcher
+    if _credentials_mtime() != _creds_mtime:
+        await _start_saved_leader()
+
+
+# Copy on/off switch in the lease file: /copy/start and /copy/stop may reach
+# a standby worker, but the elected worker does the dispatching.
+COPY_ENABLED_SETTING = "copy_enabled"
+
+
+async def _shared_copy_enabled() -> bool:
+    """Copy switch shared by every worker (on until first stopped)."""
+    if _elector is None:
+        return copy_dispatcher.is_running()
+    value = await asyncio.to_thread(_elector.lease.get_setting, COPY_ENABLED_SETTING)
+    return value != "0"
+
+
+async def _set_copy_enabled(enabled: bool) -> None:
+    if _elector is not None:
+        await asyncio.to_thread(
+            _elector.lease.set_setting, COPY_ENABLED_SETTING, "1" if enabled else "0"
+        )
+    if enabled:
+        copy_dispatcher.start()
+    else:
+        copy_dispatcher.stop()
+
+
+async def start_leader_election() -> None:
+    """Campaign for the watcher lease when ``LEADER_LEASE_FILE`` is set.
+
+    Set it (to a path shared by all workers) when running
+    ``uvicorn --workers N``; only the elected worker runs the leader watcher.
+    """
+    global _elector
+    lease_file = os.getenv("LEADER_LEASE_FILE")
+    if not lease_file or _elector is not None:
+        return
+    _elector = LeaderElector(
+        SQLiteLease(lease_file),
+        ttl=float(os.getenv("LEADER_LEASE_TTL", "5")),
+        renew_interval=float(os.getenv("LEADER_LEASE_RENEW", "1")),
+        on_elected=_start_saved_leader,
+        on_demoted=_stop_leader_task,
+        on_renew=_on_lease_renewed,
+    )
+    # 每次下单前检查共享开关，停止跟单对所有 worker 立即生效
+    copy_dispatcher.set_gate(_shared_copy_enabled)
+    _elector.start()
+
+
+async def stop_leader_election() -> None:
+    global _elector
+    if _elector is not None:
+        copy_dispatcher.set_gate(None)
+        await _elector.stop()
+        _elector = None
 
 
 # Routers
@@ -91,6 +257,55 @@ async def read_status() -> StatusResponse:
 # Protected endpoints
 # ---------------------------------------------------------------------------
 
+# Serialized full snapshot, reused until the balance version changes
+_balances_body: tuple[str, int, bytes] | None = None
+
+
+@protected_router.get("/balances")
+async def read_balances(
+    request: Request, since: int | None = None, epoch: str | None = None
+) -> Response:
+    """Return every account's cached balance with a snapshot version.
+
+    Versions only count within one process lifetime, identified by
+    ``epoch`` (a random token per process). The response carries an
+    ``ETag`` for epoch and version. Sending it back in ``If-None-Match``, or
+    passing ``since=<version>&epoch=<epoch>`` when nothing changed since
+    then, yields ``304 Not Modified`` without serializing anything. With
+    both only the accounts changed after that version are returned; with
+    another epoch (a restart, another worker) or a version ahead of the
+    server the full snapshot is returned.
+    """
+    global _balances_body
+
+    version = balance_service.version
+    current = balance_service.epoch
+    etag = f'"{current}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    if since is not None and (epoch != current or since > version):
+        since = None
+    if since == version:
+        return Response(status_code=304, headers=headers)
+
+    if since is not None:
+        body = dumps_bytes(
+            {"epoch": current, "version": version, "balances": balance_service.snapshot(since)}
+        )
+    else:
+        if _balances_body is None or _balances_body[:2] != (current, version):
+            _balances_body = (
+                current,
+                version,
+                dumps_bytes(
+                    {"epoch": current, "version": version, "balances": balance_service.snapshot()}
+                ),
+            )
+        body = _balances_body[2]
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @protected_router.get("/balances/{account}")
 async def read_balance(account: str) -> Dict[str, float | bool]:
     """Return the most recently cached balance for ``account``."""
@@ -99,52 +314,183 @@ async def read_balance(account: str) -> Dict[str, float | bool]:
 
 @protected_router.put("/leader")
 async def configure_leader(config: LeaderConfig) -> Dict[str, bool]:
-    """Persist leader credentials and start watching orders."""
-    save_leader_credentials(config.dict())
-
-    global _leader_task
-    if _leader_task:
-        _leader_task.cancel()
-        try:
-            await _leader_task
-        except Exception:
-            pass
-
-    _leader_task = asyncio.create_task(_run_leader_watcher(config))
+    """Persist leader credentials and start watching orders.
+
+    With leader election enabled only the elected process runs the watcher;
+    on a standby the new credentials are picked up by the elected process.
+    """
+    global _creds_mtime
+    if config.exchange == "bitget" and not config.passphrase:
+        raise HTTPException(status_code=400, detail="passphrase required")
+    await asave_leader_credentials(config.dict(exclude_none=True))
+    _creds_mtime = _credentials_mtime()
+
+    if _elector is not None and not _elector.is_leader:
+        logging.info("[LEADER] not the elected process, watcher runs elsewhere")
+        return {"listening": True}
+
+    await _restart_leader_task(config)
     # 你之前加的“验活”打印，保留：
     print("🔥🔥🔥 configure_leader() 被调用了并成功创建了 watcher task")
     logging.info("[LEADER] watcher restarted in background")
     return {"listening": True}
 
 
+@protected_router.get("/leader/election")
+async def get_leader_election() -> Dict[str, Any]:
+    """Return this process's leader election state."""
+    if _elector is None:
+        return {"enabled": False, "is_leader": True}
+    return _elector.status()
+
+
+@protected_router.get("/leader/liveness")
+async def get_leader_liveness() -> Dict[str, Any]:
+    """Liveness checks and connection metrics of the leader user-data stream."""
+    from . import leader_watcher
+
+    status = leader_watcher.stream_status()
+    if status is None:
+        return {"running": False}
+    return {"running": True, **status}
+
+
 @protected_router.get("/copy/status", response_model=CopyStatusResponse)
 async def get_copy_status() -> CopyStatusResponse:
     """Return dispatcher running state and stored leader API key."""
     creds = load_leader_credentials()
     leader = creds.get("api_key") if isinstance(creds, dict) else None
-    return CopyStatusResponse(running=copy_dispatcher.is_running(), leader=leader)
+    return CopyStatusResponse(running=await _shared_copy_enabled(), leader=leader)
 
 
 @protected_router.post("/copy/start")
 async def start_copy() -> Dict[str, bool]:
-    """Enable order copying."""
-    copy_dispatcher.start()
+    """Enable order copying (in every worker when leader election is enabled)."""
+    await _set_copy_enabled(True)
     return {"running": True}
 
 
 @protected_router.post("/copy/stop")
 async def stop_copy() -> Dict[str, bool]:
-    """Disable order copying."""
-    copy_dispatcher.stop()
+    """Disable order copying (in every worker when leader election is enabled)."""
+    await _set_copy_enabled(False)
     return {"running": False}
 
 
 @protected_router.get("/copy/results")
-async def get_copy_results() -> Dict[str, Dict[str, Any]]:
-    """Return the results of the most recent copy trade dispatch."""
+async def get_copy_results(breakers: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Return the results of the most recent copy trade dispatch.
+
+    With ``?breakers=true`` the response is ``{"results": ..., "breakers": ...}``
+    and also carries the per-account and per-exchange circuit breaker states.
+    Results are kept per process: with leader election only the elected
+    worker has them, a standby returns its own (usually empty) state.
+    """
+    if breakers:
+        return {
+            "results": copy_dispatcher.get_last_results(),
+            "breakers": copy_dispatcher.get_breaker_states(),
+        }
     return copy_dispatcher.get_last_results()
 
 
+@protected_router.get("/copy/results/history")
+async def get_copy_result_history(
+    account: str | None = None,
+    event_id: str | None = None,
+    start: float | None = None,
+    end: float | None = None,
+    limit: int = 100,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Query the bounded dispatch history, newest first.
+
+    Filter by ``account``, ``event_id`` and/or a ``start``/``end`` time range
+    (Unix seconds). Like ``/copy/results`` the history is per process and
+    only complete on the elected worker.
+    """
+    records = copy_dispatcher.get_history().query(
+        account=account,
+        event_id=event_id,
+        start=start,
+        end=end,
+        limit=max(1, min(limit, 1000)),
+    )
+    return {"records": [r.to_dict() for r in records]}
+
+
+@protected_router.get("/copy/warmer")
+async def get_copy_warmer() -> Dict[str, Any]:
+    """Status of the follower connection warmer."""
+    return copy_dispatcher.get_warmer_status()
+
+
+@protected_router.get("/copy/shards")
+async def get_copy_shards() -> Dict[str, List[Dict[str, Any]]]:
+    """Per-worker dispatch metrics; empty unless ``DISPATCH_SHARDS`` > 1."""
+    return {"shards": copy_dispatcher.get_shard_metrics()}
+
+
+@protected_router.get("/stream")
+async def stream_updates() -> StreamingResponse:
+    """Server-Sent Events feed of dispatch results, balances and watcher state.
+
+    Each event is a small JSON delta (``result``, ``balance`` or ``watcher``).
+    A ``resync`` event means the client fell behind and should re-fetch the
+    full state over REST. Events are published in-process: with leader
+    election a stream served by a standby worker carries only that worker's
+    balance updates, not dispatch results or watcher state.
+    """
+    sub = push_hub.subscribe()
+    return StreamingResponse(
+        push_hub.sse_stream(sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Profiling
+# ---------------------------------------------------------------------------
+
+class SpanConfigPayload(BaseModel):
+    """Payload for toggling dispatch timing spans."""
+    enabled: bool
+    reset: bool = False
+
+
+@protected_router.get("/profiling/spans")
+async def get_dispatch_spans() -> Dict[str, Any]:
+    """Return per-exchange, per-stage dispatch timing histograms."""
+    return {"enabled": spans.enabled, "stages": spans.snapshot()}
+
+
+@protected_router.put("/profiling/spans")
+async def set_dispatch_spans(payload: SpanConfigPayload) -> Dict[str, Any]:
+    """Enable or disable dispatch timing spans, optionally clearing them."""
+    spans.enabled = payload.enabled
+    if payload.reset:
+        spans.reset()
+    if isinstance(copy_dispatcher, ShardedDispatcher):
+        copy_dispatcher.set_spans(payload.enabled, payload.reset)
+    return {"enabled": spans.enabled}
+
+
+@protected_router.post("/profiling/capture")
+async def capture_profile(seconds: float = 10.0, mode: str = "cprofile") -> Response:
+    """Profile the server for ``seconds`` and return a text report.
+
+    ``mode`` is ``cprofile`` or ``pyinstrument`` (if installed). Only one
+    capture may run at a time.
+    """
+    try:
+        report = await profiler.capture(max(0.1, min(seconds, 120.0)), mode)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return Response(report, media_type="text/plain")
+
+
 # ---------------------------------------------------------------------------
 # Account management
 # ---------------------------------------------------------------------------
@@ -164,6 +510,8 @@ async def list_accounts() -> List[Dict[str, Any]]:
 async def update_account_status(name: str, payload: AccountStatusPayload) -> Dict[str, str]:
     """Update the status of an account."""
     account_service.update_account(name, status=payload.status)
+    if payload.status == AccountStatus.ACTIVE:
+        copy_dispatcher.reset_breaker(name)
     return {"status": payload.status.value}
 
 
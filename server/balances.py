@@ -3,9 +3,11 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Dict
+import uuid
+from typing import Any, Callable, Dict, Mapping, Set
 
 from .accounts import account_service
+from .push import push_hub
 
 try:  # Optional imports during tests where dependencies may be missing
     from .connectors.binance_sdk_connector import BinanceSDKConnector
@@ -20,17 +22,38 @@ class BalanceService:
     Balances are retrieved from exchange REST endpoints and cached in-memory.
     Updates can be triggered by external events via :meth:`trigger_update`
     while a polling loop running every few seconds acts as a fallback.
+
+    Order acknowledgements are applied to the cache immediately through
+    :meth:`apply_fill` as an optimistic delta, and the confirming REST refresh
+    is deferred and batched across accounts.
+
+    ``on_change`` is called with every changed balance. After
+    :meth:`use_remote` the service stops polling and is fed through
+    :meth:`apply_remote` instead (the dispatch shards own the balances).
     """
 
-    def __init__(self, poll_interval: float = 5.0) -> None:
+    def __init__(self, poll_interval: float = 5.0, refresh_delay: float = 1.0) -> None:
         self._cache: Dict[str, Dict[str, float | bool]] = {}
         self._poll_interval = poll_interval
+        self._refresh_delay = refresh_delay
+        # Bumped on every local delta so in-flight REST fetches that started
+        # earlier do not overwrite the optimistic balance with older data.
+        self._ledger_seq: Dict[str, int] = {}
+        self._pending_refresh: Set[str] = set()
+        self._refresh_task: asyncio.Task | None = None
+        # Monotonic snapshot version, bumped whenever any cached balance changes;
+        # only comparable within one process, identified by the epoch
+        self._version = 0
+        self._epoch = uuid.uuid4().hex[:12]
+        self._changed_at: Dict[str, int] = {}
         self._connectors = {}
         if BinanceSDKConnector:
             self._connectors["binance"] = BinanceSDKConnector
         if BitgetConnector:
             self._connectors["bitget"] = BitgetConnector
         self._tasks: Dict[str, asyncio.Task] = {}
+        self._remote = False
+        self.on_change: Callable[[str, Dict[str, float | bool]], None] | None = None
 
     async def update_balance(self, account_name: str) -> None:
         """Fetch and cache the latest balance for ``account_name``."""
@@ -45,6 +68,7 @@ class BalanceService:
         connector_cls = self._connectors.get(account.exchange)
         if connector_cls is None:
             return
+        seq = self._ledger_seq.get(account_name, 0)
         try:
             if account.exchange == "bitget":
                 async with connector_cls(demo=account.env == "demo") as connector:
@@ -63,23 +87,80 @@ class BalanceService:
                     balance = await connector.get_balance(
                         account.api_key, account.api_secret
                     )
-            self._cache[account_name] = {**balance, "stale": False}
+            if self._ledger_seq.get(account_name, 0) != seq:
+                # A fill was applied while fetching; a newer refresh is queued.
+                return
+            self._set_cache(account_name, {**balance, "stale": False})
             print(f"[BALANCE] {account_name}: BTC={balance.get('BTC', 0)}, USDT={balance.get('USDT', 0)}")
         except Exception:
             # Errors are swallowed to keep polling alive
-            prev = self._cache.get(
-                account_name, {"BTC": 0.0, "USDT": 0.0, "stale": True}
+            prev = dict(
+                self._cache.get(account_name, {"BTC": 0.0, "USDT": 0.0, "stale": True})
             )
             prev["stale"] = True
-            self._cache[account_name] = prev
+            self._set_cache(account_name, prev)
+
+    def _set_cache(self, account_name: str, balance: Dict[str, float | bool]) -> None:
+        changed = self._cache.get(account_name) != balance
+        self._cache[account_name] = balance
+        if changed:
+            self._version += 1
+            self._changed_at[account_name] = self._version
+            push_hub.publish("balance", account=account_name, balance=balance)
+            if self.on_change is not None:
+                self.on_change(account_name, balance)
+
+    def use_remote(self) -> None:
+        """Stop polling; balances now arrive through :meth:`apply_remote`."""
+        self._remote = True
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+    def apply_remote(self, account_name: str, balance: Dict[str, float | bool]) -> None:
+        """Store a balance reported by the process that owns ``account_name``."""
+        self._set_cache(account_name, balance)
 
     def trigger_update(self, account_name: str) -> None:
         """Trigger an asynchronous balance refresh for ``account_name``."""
         asyncio.create_task(self.update_balance(account_name))
 
+    def apply_fill(self, account_name: str, side: str, result: Mapping[str, Any]) -> None:
+        """Apply an order acknowledgement to the cached balance right away.
+
+        ``result`` is the exchange order response. When it carries fill
+        information (``executedQty``/``cummulativeQuoteQty`` and ``fills``
+        commissions, as returned by Binance) the cached balance is adjusted
+        optimistically. A REST refresh is always scheduled to confirm it.
+        """
+        delta = fill_delta(side, result)
+        if delta:
+            prev = self._cache.get(
+                account_name, {"BTC": 0.0, "USDT": 0.0, "stale": True}
+            )
+            updated = dict(prev)
+            for asset, change in delta.items():
+                updated[asset] = max(0.0, float(updated.get(asset, 0.0)) + change)
+            self._set_cache(account_name, updated)
+            self._ledger_seq[account_name] = self._ledger_seq.get(account_name, 0) + 1
+        self.schedule_refresh(account_name)
+
+    def schedule_refresh(self, account_name: str) -> None:
+        """Queue a deferred REST refresh; queued accounts are fetched together."""
+        self._pending_refresh.add(account_name)
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._flush_refresh())
+
+    async def _flush_refresh(self) -> None:
+        while self._pending_refresh:
+            await asyncio.sleep(self._refresh_delay)
+            names = list(self._pending_refresh)
+            self._pending_refresh.clear()
+            await asyncio.gather(*(self.update_balance(n) for n in names))
+
     def register_account(self, account_name: str) -> None:
         """Begin polling balances for ``account_name`` if not already running."""
-        if account_name not in self._tasks:
+        if not self._remote and account_name not in self._tasks:
             self._tasks[account_name] = asyncio.create_task(self._poll(account_name))
             # Populate initial balance data immediately
             self.trigger_update(account_name)
@@ -91,11 +172,33 @@ class BalanceService:
 
     async def start(self) -> None:
         """Start polling balances for all known accounts."""
+        if self._remote:
+            return
         for account in account_service.list_accounts():
             # Synchronously populate cache before starting background polling
             await self.update_balance(account.name)
             self.register_account(account.name)
 
+    @property
+    def version(self) -> int:
+        """Snapshot version; increases every time a cached balance changes."""
+        return self._version
+
+    @property
+    def epoch(self) -> str:
+        """Random token of this service instance; versions restart with it."""
+        return self._epoch
+
+    def snapshot(self, since: int | None = None) -> Dict[str, Dict[str, float | bool]]:
+        """Return cached balances, or only those changed after version ``since``."""
+        if since is None:
+            return dict(self._cache)
+        return {
+            name: bal
+            for name, bal in self._cache.items()
+            if self._changed_at.get(name, 0) > since
+        }
+
     async def get_balance(self, account_name: str) -> Dict[str, float | bool]:
         """Return cached balance information for an account."""
         return self._cache.get(
@@ -103,6 +206,32 @@ class BalanceService:
         )
 
 
+def fill_delta(side: str, result: Mapping[str, Any]) -> Dict[str, float]:
+    """Return the BTC/USDT balance change implied by an order response.
+
+    Commissions charged in BTC or USDT are deducted from the received asset;
+    commissions in other assets (e.g. BNB) are ignored. Responses without
+    fill information yield an empty delta.
+    """
+    if not isinstance(result, Mapping):
+        return {}
+    try:
+        base = float(result.get("executedQty") or 0.0)
+        quote = float(result.get("cummulativeQuoteQty") or 0.0)
+    except (TypeError, ValueError):
+        return {}
+    if base <= 0 and quote <= 0:
+        return {}
+    fees: Dict[str, float] = {}
+    for fill in result.get("fills") or ():
+        asset = fill.get("commissionAsset")
+        if asset in ("BTC", "USDT"):
+            fees[asset] = fees.get(asset, 0.0) + float(fill.get("commission") or 0.0)
+    if side.upper() == "BUY":
+        return {"USDT": -quote, "BTC": base - fees.get("BTC", 0.0)}
+    return {"BTC": -base, "USDT": quote - fees.get("USDT", 0.0)}
+
+
 # Singleton instance used by API routes
 balance_service = BalanceService()
 
@@ -0,0 +1,309 @@
+"""Leader account order watcher for Bitget.
+
+Bitget leaders are watched over the v2 private websocket: the watcher logs
+in, subscribes to the spot ``orders`` and ``account`` channels and keeps the
+connection alive with text ``ping`` frames. Every push is translated into the
+Binance user-data frame it corresponds to (``executionReport`` /
+``outboundAccountPosition``), so the journal, :class:`~server.prestage.PreStager`
+and :class:`~server.events.FillEvent` see the same schema for both venues and
+:class:`~server.copy_dispatcher.CopyDispatcher` needs no Bitget special case.
+
+Bitget does not order ``account`` pushes relative to ``orders`` pushes, so
+instead of waiting for the next balance frame (as :class:`FillTracker` does
+for Binance) a FILLED market order is emitted at once, with the leader's
+post-trade balances derived from the last balance frame and the filled
+amounts. After a reconnect the orders filled while the socket was down are
+fetched over REST and emitted as well.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+from typing import AsyncIterator, Callable, Dict, Iterable, List
+
+from .connectors.bitget import BitgetConnector
+from .events import FillEvent
+from .journal import EventJournal
+from .json_codec import loads
+from .leader_watcher import FillTracker
+from .prestage import PreStager
+
+logger = logging.getLogger(__name__)
+
+# Bitget closes connections without a ping for 2 minutes; it recommends 30 s
+PING_INTERVAL = 25.0
+# Reconnect backoff bounds in seconds
+RECONNECT_DELAY = 1.0
+RECONNECT_MAX_DELAY = 30.0
+# Backfill reaches this far (ms) before the last message seen on the socket
+BACKFILL_MARGIN_MS = 5_000
+# Order ids remembered to drop fills seen on both the socket and the backfill
+SEEN_ORDERS = 1024
+
+ORDER_STATUS = {
+    "init": "NEW",
+    "new": "NEW",
+    "live": "NEW",
+    "partially_filled": "PARTIALLY_FILLED",
+    "partial_fill": "PARTIALLY_FILLED",
+    "filled": "FILLED",
+    "full_fill": "FILLED",
+    "cancelled": "CANCELED",
+    "canceled": "CANCELED",
+}
+
+
+def order_report(item: Dict) -> Dict:
+    """Translate an ``orders`` push item (or REST history order) to an ``executionReport``."""
+    get = item.get
+    side = str(get("side") or "").upper()
+    order_type = str(get("orderType") or "").upper()
+    status = str(get("status") or "")
+    base = float(get("accBaseVolume") or get("baseVolume") or 0.0)
+    quote = get("quoteVolume")
+    if quote in (None, ""):
+        quote = base * float(get("priceAvg") or 0.0)
+    # 市价买单的 size 为报价币金额（WS 推送另有 notional 字段）
+    requested = get("notional") if side == "BUY" and get("notional") else get("size")
+    report = {
+        "e": "executionReport",
+        "E": int(get("uTime") or get("cTime") or 0),
+        "s": get("instId") or get("symbol"),
+        "c": get("clientOid"),
+        "S": side,
+        "o": order_type,
+        "X": ORDER_STATUS.get(status, status.upper()),
+        "i": get("orderId"),
+        "z": base,
+        "Z": round(float(quote), 8),
+    }
+    report["Q" if side == "BUY" else "q"] = float(requested or 0.0)
+    return report
+
+
+def account_position(items: Iterable[Dict]) -> Dict:
+    """Translate ``account`` push items to an ``outboundAccountPosition`` frame."""
+    items = list(items)
+    return {
+        "e": "outboundAccountPosition",
+        "E": max((int(i.get("uTime") or 0) for i in items), default=0),
+        "B": [{"a": i.get("coin"), "f": str(i.get("available", "0"))} for i in items],
+    }
+
+
+def translate(msg: Dict) -> List[Dict]:
+    """Binance-style frames for one private websocket push (empty for acks)."""
+    arg = msg.get("arg") or {}
+    data = msg.get("data")
+    if not data or "event" in msg:
+        return []
+    channel = arg.get("channel")
+    if channel == "orders":
+        return [order_report(item) for item in data]
+    if channel == "account":
+        return [account_position(data)]
+    return []
+
+
+class BitgetFillTracker(FillTracker):
+    """Emit a :class:`FillEvent` as soon as a Bitget market order is FILLED.
+
+    Balances come from ``outboundAccountPosition`` frames. When the latest
+    balance frame is older than the fill, the fill is applied to the held
+    balances to get the post-trade values; otherwise the balance frame
+    already includes it. Fills are emitted once per order id.
+    """
+
+    __slots__ = ("balance_time", "_seen")
+
+    def __init__(self, free_usdt: float = 0.0, free_btc: float = 0.0) -> None:
+        super().__init__(free_usdt, free_btc)
+        self.balance_time = 0
+        self._seen: Dict[object, None] = {}
+
+    def feed(self, payload: Dict) -> FillEvent | None:
+        etype = payload.get("e")
+
+        if etype == "outboundAccountPosition":
+            for b in payload.get("B", ()):
+                asset = b.get("a")
+                if asset == "USDT":
+                    self.free_usdt = float(b["f"])
+                elif asset == "BTC":
+                    self.free_btc = float(b["f"])
+            self.balance_time = max(self.balance_time, int(payload.get("E") or 0))
+            return None
+
+        if etype != "executionReport":
+            return None
+        if payload.get("X") != "FILLED" or payload.get("o") != "MARKET":
+            return None
+        oid = payload.get("i")
+        if oid in self._seen:
+            return None
+        self._seen[oid] = None
+        if len(self._seen) > SEEN_ORDERS:
+            del self._seen[next(iter(self._seen))]
+
+        ts = int(payload.get("E") or 0)
+        if ts > self.balance_time:
+            quote, base = float(payload["Z"]), float(payload["z"])
+            if payload.get("S") == "BUY":
+                self.free_usdt, self.free_btc = self.free_usdt - quote, self.free_btc + base
+            else:
+                self.free_usdt, self.free_btc = self.free_usdt + quote, self.free_btc - base
+            self.balance_time = ts
+        return FillEvent.from_execution_report(
+            payload, free_usdt=self.free_usdt, free_btc=self.free_btc
+        )
+
+
+async def _ping_loop(ws, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        await ws.send("ping")
+
+
+async def watch_bitget_leader_orders(
+    api_key: str,
+    api_secret: str,
+    passphrase: str,
+    *,
+    demo: bool = False,
+    symbol: str = "BTCUSDT",
+    journal: EventJournal | None = None,
+    ws_url: str | None = None,
+    on_activity: Callable[[str], None] | None = None,
+    stager: PreStager | None = None,
+    ping_interval: float = PING_INTERVAL,
+) -> AsyncIterator[FillEvent]:
+    """Yield leader fill events from the Bitget private websocket.
+
+    Same contract as :func:`server.leader_watcher.watch_leader_orders`: the
+    journal records the translated frames, ``on_activity`` is called with
+    ``"leader_reconnect"`` / ``"leader_new"`` and fills dispatched by the
+    ``stager`` are journaled but not yielded. The connection is re-opened
+    with exponential backoff; it is also dropped when nothing (not even a
+    ``pong``) arrives for two ping intervals.
+    """
+
+    logger.info("Starting Bitget leader order watcher: demo=%s", demo)
+    channels = [
+        {"instType": "SPOT", "channel": "orders", "instId": symbol},
+        {"instType": "SPOT", "channel": "account", "coin": "default"},
+    ]
+
+    def _process(frame: Dict) -> FillEvent | None:
+        if journal is not None:
+            journal.record_frame(frame)
+        if on_activity is not None and frame.get("e") == "executionReport" and frame.get("X") == "NEW":
+            on_activity("leader_new")
+        if stager is not None:
+            stager.observe(frame, tracker.free_usdt, tracker.free_btc)
+        event = tracker.feed(frame)
+        if event is None:
+            return None
+        if journal is not None:
+            journal.record_fill(event)
+        if stager is not None and stager.consume(event.event_id):
+            return None
+        return event
+
+    async with BitgetConnector(demo=demo) as connector:
+        balances = await connector.get_balance(api_key, api_secret, passphrase)
+        tracker = BitgetFillTracker(
+            float(balances.get("USDT", 0.0)), float(balances.get("BTC", 0.0))
+        )
+        last_seen: int | None = None
+        delay = RECONNECT_DELAY
+
+        while True:
+            try:
+                ws = await connector.ws_connect(
+                    api_key, api_secret, passphrase, channels, url=ws_url
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("[BITGET-WS] connect failed: %r, retrying in %.0fs", exc, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+            delay = RECONNECT_DELAY
+            logger.info("[BITGET-WS] connected")
+            if on_activity is not None:
+                on_activity("leader_reconnect")
+            pinger = asyncio.create_task(_ping_loop(ws, ping_interval))
+            try:
+                if last_seen is not None:
+                    # 断线期间的成交：刷新余额后按 REST 历史订单补发
+                    frames = await _backfill(
+                        connector, api_key, api_secret, passphrase, symbol,
+                        last_seen - BACKFILL_MARGIN_MS,
+                    )
+                    if frames:
+                        balances = await connector.get_balance(api_key, api_secret, passphrase)
+                        tracker.free_usdt = float(balances.get("USDT", 0.0))
+                        tracker.free_btc = float(balances.get("BTC", 0.0))
+                        tracker.balance_time = int(time.time() * 1000)
+                    for frame in frames:
+                        event = _process(frame)
+                        if event is not None:
+                            yield event
+                last_seen = int(time.time() * 1000)
+
+                while True:
+                    try:
+                        raw = await asyncio.wait_for(ws.recv(), ping_interval * 2)
+                    except asyncio.TimeoutError:
+                        logger.warning("[BITGET-WS] no data for %.0fs, reconnecting", ping_interval * 2)
+                        break
+                    last_seen = int(time.time() * 1000)
+                    if raw == "pong":
+                        continue
+                    msg = loads(raw)
+                    if msg.get("event") == "error":
+                        logger.error("[BITGET-WS] error: %s %s", msg.get("code"), msg.get("msg"))
+                        continue
+                    for frame in translate(msg):
+                        event = _process(frame)
+                        if event is not None:
+                            yield event
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("[BITGET-WS] connection lost: %r", exc)
+            finally:
+                pinger.cancel()
+                with contextlib.suppress(BaseException):
+                    await pinger
+                with contextlib.suppress(Exception):
+                    await ws.close()
+            await asyncio.sleep(delay)
+
+
+async def _backfill(
+    connector: BitgetConnector,
+    api_key: str,
+    api_secret: str,
+    passphrase: str,
+    symbol: str,
+    since: int,
+) -> List[Dict]:
+    """``executionReport`` frames for market orders filled since ``since`` (ms)."""
+    try:
+        orders = await connector.get_order_history(
+            api_key, api_secret, passphrase, symbol=symbol, start_time=since
+        )
+    except Exception as exc:
+        logger.error("[BITGET-WS] backfill failed: %r", exc)
+        return []
+    frames = [order_report(o) for o in orders]
+    frames = [f for f in frames if f["X"] == "FILLED" and f["o"] == "MARKET"]
+    frames.sort(key=lambda f: f["E"])
+    if frames:
+        logger.info("[BITGET-WS] backfilling %d fills", len(frames))
+    return frames
@@ -0,0 +1,187 @@
+"""Circuit breakers that let the dispatcher skip failing followers quickly."""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Dict, Tuple
+
+
+class BreakerState(str, Enum):
+    """Enumeration of circuit breaker states."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass
+class CircuitBreaker:
+    """Classic closed → open → half-open breaker.
+
+    ``failure_threshold`` consecutive failures open the breaker. After
+    ``reset_timeout`` seconds a single trial call is let through (half-open);
+    its outcome closes the breaker again or re-opens it. A trial whose
+    outcome is never recorded is replaced by a new one after another
+    ``reset_timeout``. ``trips`` counts how many times the breaker opened
+    since the last success.
+    """
+
+    failure_threshold: int = 3
+    reset_timeout: float = 30.0
+    state: BreakerState = BreakerState.CLOSED
+    failures: int = 0
+    trips: int = 0
+    opened_at: float = 0.0
+    trial_at: float = 0.0
+    last_error: str | None = None
+
+    def would_allow(self, now: float) -> bool:
+        """Whether :meth:`allow` would let a call through, without taking the trial."""
+        if self.state is BreakerState.OPEN:
+            return now - self.opened_at >= self.reset_timeout
+        if self.state is BreakerState.HALF_OPEN:
+            return now - self.trial_at >= self.reset_timeout
+        return True
+
+    def allow(self, now: float) -> bool:
+        """Return whether a call may be attempted at ``now``."""
+        if not self.would_allow(now):
+            return False
+        if self.state is not BreakerState.CLOSED:
+            # 半开：只放行一次试探调用，结果回来前其余调用继续跳过
+            self.state = BreakerState.HALF_OPEN
+            self.trial_at = now
+        return True
+
+    def record_success(self) -> None:
+        self.state = BreakerState.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.last_error = None
+
+    def record_failure(self, now: float, error: str | None = None) -> None:
+        self.failures += 1
+        self.last_error = error
+        if (
+            self.state is BreakerState.HALF_OPEN
+            or self.failures >= self.failure_threshold
+        ):
+            self.state = BreakerState.OPEN
+            self.opened_at = now
+            self.trips += 1
+            self.failures = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "failures": self.failures,
+            "trips": self.trips,
+            "opened_at": self.opened_at or None,
+            "last_error": self.last_error,
+        }
+
+
+class BreakerRegistry:
+    """Per-account and per-exchange breakers keyed by name.
+
+    An account whose breaker trips ``pause_after_trips`` times in a row
+    without a success is reported as hopeless so the caller can pause it.
+    """
+
+    def __init__(
+        self,
+        *,
+        account_threshold: int = 3,
+        exchange_threshold: int = 10,
+        reset_timeout: float = 30.0,
+        pause_after_trips: int = 5,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._account_threshold = account_threshold
+        self._exchange_threshold = exchange_threshold
+        self._reset_timeout = reset_timeout
+        self._pause_after_trips = pause_after_trips
+        self._clock = clock
+        self._accounts: Dict[str, CircuitBreaker] = {}
+        self._exchanges: Dict[str, CircuitBreaker] = {}
+
+    def _account(self, name: str) -> CircuitBreaker:
+        breaker = self._accounts.get(name)
+        if breaker is None:
+            breaker = self._accounts[name] = CircuitBreaker(
+                self._account_threshold, self._reset_timeout
+            )
+        return breaker
+
+    def _exchange(self, name: str) -> CircuitBreaker:
+        breaker = self._exchanges.get(name)
+        if breaker is None:
+            breaker = self._exchanges[name] = CircuitBreaker(
+                self._exchange_threshold, self._reset_timeout
+            )
+        return breaker
+
+    def check(self, account: str, exchange: str) -> str | None:
+        """Reason a call to ``account`` would be refused, without taking a trial."""
+        now = self._clock()
+        if not self._exchange(exchange).would_allow(now):
+            return f"circuit open: exchange {exchange}"
+        if not self._account(account).would_allow(now):
+            return f"circuit open: account {account}"
+        return None
+
+    def allow(self, account: str, exchange: str) -> Tuple[bool, str | None]:
+        """Return ``(allowed, reason)`` for a call to ``account`` on ``exchange``.
+
+        Half-open trials are only taken when both breakers let the call through.
+        """
+        reason = self.check(account, exchange)
+        if reason is not None:
+            return False, reason
+        now = self._clock()
+        self._exchange(exchange).allow(now)
+        self._account(account).allow(now)
+        return True, None
+
+    def record(
+        self,
+        account: str,
+        exchange: str,
+        result: Dict[str, Any],
+        *,
+        exchange_fault: bool = True,
+    ) -> bool:
+        """Feed a dispatch result into both breakers.
+
+        Failures with ``exchange_fault=False`` (rejections of this account,
+        such as a bad key or insufficient balance) only count against the
+        account; the exchange answered, so its breaker treats them as a
+        success. Returns ``True`` when the account has become hopeless and
+        should be paused.
+        """
+        now = self._clock()
+        acct = self._account(account)
+        exch = self._exchange(exchange)
+        if result.get("success"):
+            acct.record_success()
+            exch.record_success()
+            return False
+        error = result.get("error")
+        acct.record_failure(now, error)
+        if exchange_fault:
+            exch.record_failure(now, error)
+        else:
+            exch.record_success()
+        return acct.trips >= self._pause_after_trips
+
+    def reset(self, account: str) -> None:
+        """Forget the breaker for ``account`` (e.g. after re-activation)."""
+        self._accounts.pop(account, None)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        return {
+            "accounts": {k: v.to_dict() for k, v in self._accounts.items()},
+            "exchanges": {k: v.to_dict() for k, v in self._exchanges.items()},
+        }
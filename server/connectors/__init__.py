@@ -8,4 +8,6 @@ try:  # pragma: no cover - optional dependency
 except Exception:  # noqa: BLE001
     BinanceSDKConnector = None  # type: ignore
 
-__all__ = ["BinanceConnector", "BitgetConnector", "BinanceSDKConnector"]
+from .binance_ws_api import BinanceWsApiConnector
+
+__all__ = ["BinanceConnector", "BitgetConnector", "BinanceSDKConnector", "BinanceWsApiConnector"]
@@ -3,14 +3,30 @@
 from dataclasses import dataclass, field
 from typing import Dict, Optional
 
+import asyncio
 import hmac
 import time
 from hashlib import sha256
 from urllib.parse import urlencode
 
-import httpx
 import websockets
 
+from ..json_codec import response_json
+from .http import shared_client, use_http2
+from ..profiling import spans
+from ..retry import RECV_WINDOW_MS
+
+
+# Binance error code for "Order does not exist."
+ORDER_NOT_FOUND = -2013
+
+
+def _binance_code(resp) -> Optional[int]:
+    try:
+        return response_json(resp).get("code")
+    except Exception:
+        return None
+
 
 @dataclass
 class BinanceConnector:
@@ -32,15 +48,26 @@ class BinanceConnector:
         else:
             self._ws_base = "wss://stream.binance.com:9443/ws"
             self._ws_style = "ws"
-        self._client = httpx.AsyncClient(base_url=self.rest_base)
+        self._client = shared_client(self.rest_base)
         self._ws = None
 
+    @classmethod
+    async def warm(cls, accounts, *, env: str = "", parallel: int = 1) -> None:
+        """Open up to ``parallel`` pooled connections with ``/api/v3/time``."""
+        conn = cls(testnet=env == "test")
+        if use_http2(conn.rest_base):
+            parallel = 1  # 单连接多路复用
+        try:
+            await asyncio.gather(*(conn.get_time() for _ in range(parallel)))
+        finally:
+            await conn.close()
+
     async def get_time(self) -> Optional[int]:
         """Example REST call to fetch server time."""
         try:
             resp = await self._client.get("/api/v3/time")
             resp.raise_for_status()
-            data = resp.json()
+            data = response_json(resp)
             return data.get("serverTime")
         except Exception:
             return None
@@ -60,7 +87,7 @@ class BinanceConnector:
             url = f"/api/v3/account?{query}&signature={signature}"
             resp = await self._client.get(url, headers=headers)
             resp.raise_for_status()
-            data = resp.json().get("balances", [])
+            data = response_json(resp).get("balances", [])
             result: Dict[str, float] = {"BTC": 0.0, "USDT": 0.0}
             for bal in data:
                 asset = bal.get("asset")
@@ -88,13 +115,18 @@ class BinanceConnector:
         quote_amount: float | None = None,
         base_amount: float | None = None,
         symbol: str = "BTCUSDT",
+        client_order_id: str | None = None,
+        test: bool = False,
     ) -> Dict:
         """Place a market order on Binance.
 
         Depending on ``side`` the order uses either ``quote_amount`` (for
         BUY orders) or ``base_amount`` (for SELL orders). Errors from the
         exchange are propagated as ``httpx.HTTPStatusError`` allowing callers
-        to capture the failure reason.
+        to capture the failure reason. ``client_order_id`` is sent as
+        ``newClientOrderId`` so the order can be found with :meth:`get_order`.
+        ``test`` sends it to ``/api/v3/order/test``, which validates the
+        signed order without placing it.
         """
 
         timestamp = int(time.time() * 1000)
@@ -102,6 +134,7 @@ class BinanceConnector:
             "symbol": symbol,
             "side": side,
             "type": "MARKET",
+            "recvWindow": str(RECV_WINDOW_MS),
             "timestamp": str(timestamp),
         }
 
@@ -113,15 +146,44 @@ class BinanceConnector:
             if base_amount is None:
                 raise ValueError("base_amount required for SELL orders")
             params["quantity"] = str(base_amount)
+        if client_order_id:
+            params["newClientOrderId"] = client_order_id
 
-        query = urlencode(params)
-        signature = hmac.new(api_secret.encode(), query.encode(), sha256).hexdigest()
+        with spans.span("sign", "binance"):
+            query = urlencode(params)
+            signature = hmac.new(api_secret.encode(), query.encode(), sha256).hexdigest()
         headers = {"X-MBX-APIKEY": api_key}
-        url = f"/api/v3/order?{query}&signature={signature}"
+        path = "/api/v3/order/test" if test else "/api/v3/order"
+        url = f"{path}?{query}&signature={signature}"
 
         resp = await self._client.post(url, headers=headers)
         resp.raise_for_status()
-        return resp.json()
+        return response_json(resp)
+
+    async def get_order(
+        self,
+        api_key: str,
+        api_secret: str,
+        client_order_id: str,
+        symbol: str = "BTCUSDT",
+    ) -> Optional[Dict]:
+        """Look up an order by client order id; ``None`` if it does not exist."""
+        params = {
+            "symbol": symbol,
+            "origClientOrderId": client_order_id,
+            "timestamp": str(int(time.time() * 1000)),
+        }
+        with spans.span("sign", "binance"):
+            query = urlencode(params)
+            signature = hmac.new(api_secret.encode(), query.encode(), sha256).hexdigest()
+        resp = await self._client.get(
+            f"/api/v3/order?{query}&signature={signature}",
+            headers={"X-MBX-APIKEY": api_key},
+        )
+        if resp.status_code == 400 and _binance_code(resp) == ORDER_NOT_FOUND:
+            return None
+        resp.raise_for_status()
+        return response_json(resp)
 
     async def create_listen_key(self, api_key: str) -> Optional[str]:
         """Create a userDataStream listen key."""
@@ -130,7 +192,7 @@ class BinanceConnector:
                 "/api/v3/userDataStream", headers={"X-MBX-APIKEY": api_key}
             )
             resp.raise_for_status()
-            return resp.json().get("listenKey")
+            return response_json(resp).get("listenKey")
         except Exception:
             return None
 
@@ -146,7 +208,7 @@ class BinanceConnector:
             pass
 
     async def close(self) -> None:
-        """Close underlying HTTP and WebSocket connections."""
+        """Close the WebSocket; pooled HTTP connections stay open for reuse."""
         await self._client.aclose()
         if self._ws is not None and not self._ws.closed:
             await self._ws.close()
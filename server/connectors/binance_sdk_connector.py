@@ -3,10 +3,10 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import contextlib
 import logging
-import inspect
+import os
+import time
 from dataclasses import dataclass, field
 from typing import Callable, Dict, Optional
 
@@ -25,8 +25,39 @@ try:
 except Exception:
     httpx = None
 
+from services.leader_ws import OPEN, LeaderStreamSupervisor
+
+from ..json_codec import loads, response_json
+from ..retry import RECV_WINDOW_MS
+
+try:
+    from .http import (
+        CONNECT_TIMEOUT,
+        READ_TIMEOUT,
+        mount_shared_adapter,
+        shared_client,
+        warm_requests_pool,
+    )
+except Exception:  # httpx missing
+    mount_shared_adapter = shared_client = warm_requests_pool = None
+    CONNECT_TIMEOUT, READ_TIMEOUT = 3.0, 5.0
+
 CallbackType = Callable[[Dict], None]
 
+# User-data stream liveness: websocket ping cadence / pong deadline and the
+# longest gap without messages or pongs before the connection is replaced.
+STREAM_PING_INTERVAL = float(os.getenv("LEADER_PING_INTERVAL", "20"))
+STREAM_PING_TIMEOUT = float(os.getenv("LEADER_PING_TIMEOUT", "10"))
+STREAM_MAX_SILENCE = float(os.getenv("LEADER_MAX_SILENCE", "60"))
+# 每隔多久通过 REST 确认 listen key 仍然有效
+LISTEN_KEY_PROBE_INTERVAL = float(os.getenv("LEADER_LISTEN_KEY_PROBE", "300"))
+# Binance: "This listenKey does not exist."
+LISTEN_KEY_NOT_FOUND = -1125
+
+
+def _origin(testnet: bool) -> str:
+    return "https://testnet.binance.vision" if testnet else "https://api.binance.com"
+
 logger = logging.getLogger(__name__)
 
 
@@ -39,7 +70,7 @@ class BinanceSDKConnector:
     testnet: bool = False
     _client: Client = field(init=False)
     _ws_task: Optional[asyncio.Task] = field(default=None, init=False)
-    _keepalive_task: Optional[asyncio.Task] = field(default=None, init=False)
+    _supervisor: Optional[LeaderStreamSupervisor] = field(default=None, init=False)
     _http: Optional[httpx.AsyncClient] = field(default=None, init=False)
     _ws: Optional[websockets.WebSocketClientProtocol] = field(default=None, init=False)
 
@@ -49,7 +80,14 @@ class BinanceSDKConnector:
 
         logger.info(f"🧪 BinanceSDKConnector initializing... testnet={self.testnet}")
         try:
-            self._client = Client(self.api_key, self.api_secret, testnet=self.testnet)
+            self._client = Client(
+                self.api_key,
+                self.api_secret,
+                testnet=self.testnet,
+                requests_params={"timeout": (CONNECT_TIMEOUT, READ_TIMEOUT)},
+                # 不在构造时同步 ping：连接由共享连接池与 ConnectionWarmer 预热
+                ping=False,
+            )
             logger.info("✅ Binance Client created")
         except Exception as e:
             import traceback
@@ -60,6 +98,10 @@ class BinanceSDKConnector:
         if self.testnet:
             self._client.API_URL = "https://testnet.binance.vision/api"
             logger.info("🔧 Using testnet API URL")
+        # 同一交易所的所有账户共享连接池，避免每笔订单重新握手 TCP/TLS
+        session = getattr(self._client, "session", None)
+        if session is not None and mount_shared_adapter is not None:
+            mount_shared_adapter(session, _origin(self.testnet))
 
     async def get_balance(self) -> Dict[str, float]:
         def _get_balance() -> Dict[str, float]:
@@ -78,28 +120,64 @@ class BinanceSDKConnector:
 
         return await asyncio.to_thread(_get_balance)
 
-    async def order_market_buy(self, symbol: str, quote_amount: float) -> Dict:
+    async def order_market_buy(
+        self, symbol: str, quote_amount: float, client_order_id: Optional[str] = None
+    ) -> Dict:
+        extra = {"newClientOrderId": client_order_id} if client_order_id else {}
+
         def _order() -> Dict:
             return self._client.create_order(
                 symbol=symbol,
                 side="BUY",
                 type="MARKET",
                 quoteOrderQty=quote_amount,
+                recvWindow=RECV_WINDOW_MS,
+                **extra,
             )
 
+        # 取消时若线程尚未开始，请求不会发出；已开始则已签名，recvWindow 限定其有效期
         return await asyncio.to_thread(_order)
 
-    async def order_market_sell(self, symbol: str, quantity: float) -> Dict:
+    async def order_market_sell(
+        self, symbol: str, quantity: float, client_order_id: Optional[str] = None
+    ) -> Dict:
+        extra = {"newClientOrderId": client_order_id} if client_order_id else {}
+
         def _order() -> Dict:
             return self._client.create_order(
                 symbol=symbol,
                 side="SELL",
                 type="MARKET",
                 quantity=quantity,
+                recvWindow=RECV_WINDOW_MS,
+                **extra,
             )
 
         return await asyncio.to_thread(_order)
 
+    async def get_order(self, symbol: str, client_order_id: str) -> Optional[Dict]:
+        """Look up an order by client order id; ``None`` if it does not exist."""
+
+        def _get() -> Optional[Dict]:
+            try:
+                return self._client.get_order(symbol=symbol, origClientOrderId=client_order_id)
+            except Exception as exc:
+                if getattr(exc, "code", None) == -2013:  # Order does not exist.
+                    return None
+                raise
+
+        return await asyncio.to_thread(_get)
+
+    @classmethod
+    async def warm(cls, accounts, *, env: str = "", parallel: int = 1) -> None:
+        """Open up to ``parallel`` connections in the shared ``requests`` pool."""
+        if warm_requests_pool is None:
+            return
+        origin = _origin(env == "test")
+        await asyncio.gather(*(
+            asyncio.to_thread(warm_requests_pool, origin, "/api/v3/time") for _ in range(parallel)
+        ))
+
     async def __aenter__(self) -> "BinanceSDKConnector":
         return self
 
@@ -109,11 +187,6 @@ class BinanceSDKConnector:
             with contextlib.suppress(Exception):
                 await self._ws_task
             self._ws_task = None
-        if self._keepalive_task is not None:
-            self._keepalive_task.cancel()
-            with contextlib.suppress(Exception):
-                await self._keepalive_task
-            self._keepalive_task = None
         if self._ws is not None:
             with contextlib.suppress(Exception):
                 await self._ws.close()
@@ -128,7 +201,26 @@ class BinanceSDKConnector:
     async def __aexit__(self, exc_type, exc, tb) -> None:
         await self.close()
 
-    async def start_user_socket(self, callback: CallbackType) -> None:
+    async def start_user_socket(
+        self,
+        callback: CallbackType,
+        *,
+        ws_url: Optional[str] = None,
+        raw_tap: Optional[Callable[[str | bytes], None]] = None,
+        on_connect: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """Stream user-data frames to ``callback`` in a background task.
+
+        The connection is run by :class:`services.leader_ws.LeaderStreamSupervisor`
+        (reconnect backoff, listen-key keepalive and rotation, websocket ping
+        RTT, stale-stream and listen-key checks, per-connection metrics in
+        :attr:`stream_status`). An async ``callback`` is awaited
+        before the next frame is read. ``ws_url`` connects straight to the
+        given websocket (e.g. a local playback server) instead of obtaining a
+        listen key. ``raw_tap`` is called with every raw frame before
+        decoding, for traffic capture. ``on_connect`` is called after every
+        (re)connect of the stream.
+        """
         if websockets is None or httpx is None:
             raise RuntimeError("websockets and httpx packages are required")
 
@@ -138,69 +230,74 @@ class BinanceSDKConnector:
             rest_base = "https://testnet.binance.vision"
             ws_base = "wss://stream.testnet.binance.vision:9443/ws"
         if self._http is None:
-            self._http = httpx.AsyncClient(base_url=rest_base)
+            self._http = shared_client(rest_base)
 
         headers = {"X-MBX-APIKEY": self.api_key}
 
-        async def _runner() -> None:
-            while True:
+        async def _create_listen_key() -> Optional[str]:
+            if ws_url is not None:
+                return None
+            resp = await self._http.post("/api/v3/userDataStream", headers=headers)
+            resp.raise_for_status()
+            logger.info("listen key retrieved")
+            return response_json(resp).get("listenKey")
+
+        async def _keepalive(listen_key: str) -> None:
+            resp = await self._http.put(
+                "/api/v3/userDataStream", params={"listenKey": listen_key}, headers=headers
+            )
+            resp.raise_for_status()
+
+        async def _probe(listen_key: str) -> bool:
+            resp = await self._http.put(
+                "/api/v3/userDataStream", params={"listenKey": listen_key}, headers=headers
+            )
+            if resp.status_code == 400:
+                with contextlib.suppress(Exception):
+                    if response_json(resp).get("code") == LISTEN_KEY_NOT_FOUND:
+                        return False
+            resp.raise_for_status()
+            return True
+
+        async def _ping() -> float:
+            ws = self._ws
+            if ws is None:
+                raise ConnectionError("user data stream not connected")
+            start = time.monotonic()
+            await (await ws.ping())
+            return time.monotonic() - start
+
+        async def _connect(listen_key: Optional[str]):
+            # 由 supervisor 负责 ping：可测量往返时延，并在无 pong 时主动重连
+            async with websockets.connect(
+                ws_url or f"{ws_base}/{listen_key}", ping_interval=None
+            ) as ws:
+                self._ws = ws
                 try:
-                    resp = await self._http.post("/api/v3/userDataStream", headers=headers)
-                    resp.raise_for_status()
-                    listen_key = resp.json().get("listenKey")
-                    logger.info("listen key retrieved")
-                except asyncio.CancelledError:
-                    raise
-                except Exception as exc:
-                    import traceback
-                    logger.error("❌ failed to obtain listen key: %s", exc)
-                    logger.error(traceback.format_exc())
-                    await asyncio.sleep(5)
-                    continue
-
-                async with websockets.connect(f"{ws_base}/{listen_key}") as ws:
-                    self._ws = ws
-
-                    async def _keepalive() -> None:
-                        logger.info("keepalive started")
-                        try:
-                            while True:
-                                await asyncio.sleep(30 * 60)
-                                try:
-                                    await self._http.put(
-                                        "/api/v3/userDataStream",
-                                        params={"listenKey": listen_key},
-                                        headers=headers,
-                                    )
-                                except Exception as exc:
-                                    logger.warning("keepalive failed: %s", exc)
-                                    await ws.close()
-                                    break
-                        except asyncio.CancelledError:
-                            pass
-                        finally:
-                            logger.info("keepalive stopped")
-
-                    self._keepalive_task = asyncio.create_task(_keepalive())
-
-                    try:
-                        async for message in ws:
-                            data = json.loads(message)
-                            res = callback(data)
-                            if inspect.isawaitable(res):
-                                await res
-                    except asyncio.CancelledError:
-                        raise
-                    except Exception as exc:
-                        logger.warning("websocket error: %s", exc)
-                    finally:
-                        if self._keepalive_task is not None:
-                            self._keepalive_task.cancel()
-                            with contextlib.suppress(Exception):
-                                await self._keepalive_task
-                            self._keepalive_task = None
-                        self._ws = None
-                        logger.info("websocket closed, reconnecting")
-                        await asyncio.sleep(1)
-
-        self._ws_task = asyncio.create_task(_runner())
+                    yield OPEN
+                    async for message in ws:
+                        if raw_tap is not None:
+                            raw_tap(message)
+                        yield loads(message)
+                finally:
+                    self._ws = None
+
+        self._supervisor = LeaderStreamSupervisor(
+            _create_listen_key,
+            _connect,
+            _keepalive,
+            callback,
+            on_connect=on_connect,
+            ping=_ping,
+            ping_interval=STREAM_PING_INTERVAL,
+            ping_timeout=STREAM_PING_TIMEOUT,
+            max_silence=STREAM_MAX_SILENCE,
+            probe_listen_key=_probe,
+            probe_interval=LISTEN_KEY_PROBE_INTERVAL,
+        )
+        self._ws_task = asyncio.create_task(self._supervisor.run())
+
+    @property
+    def stream_status(self) -> Optional[Dict]:
+        """Supervisor state and connection metrics of the user-data stream."""
+        return self._supervisor.status() if self._supervisor is not None else None
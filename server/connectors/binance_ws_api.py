@@ -0,0 +1,293 @@
+"""Binance WebSocket API order placement.
+
+Orders are sent as signed ``order.place`` requests over a persistent
+connection to the WebSocket API instead of one HTTP request each. Requests
+carry an ``id`` and responses are matched back to the waiting caller, so
+many orders can be in flight on one connection.
+
+Sessions are pooled per account (``BINANCE_WS_API_SHARED=1`` shares one
+connection per endpoint, i.e. per IP, between accounts; every request is
+signed with its own key either way) and reconnect on next use after a
+drop. When the WebSocket API cannot be reached the connector places the
+order over REST with :class:`~server.connectors.binance.BinanceConnector`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hmac
+import itertools
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from hashlib import sha256
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+
+import websockets
+
+from ..json_codec import dumps, loads
+from ..profiling import spans
+from ..retry import RECV_WINDOW_MS
+from .binance import ORDER_NOT_FOUND, BinanceConnector
+from .http import READ_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+WS_API_URL = "wss://ws-api.binance.com:443/ws-api/v3"
+WS_API_TESTNET_URL = "wss://ws-api.testnet.binance.vision/ws-api/v3"
+
+# After a failed connect, go straight to REST for this many seconds
+RECONNECT_COOLDOWN = 5.0
+
+
+class WsApiError(Exception):
+    """Error response from the WebSocket API (mirrors a REST error)."""
+
+    def __init__(self, status: int, code: Any, msg: str) -> None:
+        super().__init__(f"{status} {code} {msg}")
+        self.status_code = status
+        self.code = code
+        self.msg = msg
+
+
+class WsApiUnavailable(Exception):
+    """The request was not sent: the session is down or could not connect."""
+
+
+class WsApiDisconnected(ConnectionError):
+    """The connection dropped after the request was sent; outcome unknown."""
+
+
+def sign(params: Dict[str, Any], api_key: str, api_secret: str) -> Dict[str, Any]:
+    """Add ``apiKey``, ``timestamp`` and the HMAC ``signature`` to ``params``."""
+    params = {**params, "apiKey": api_key, "timestamp": int(time.time() * 1000)}
+    with spans.span("sign", "binance"):
+        payload = urlencode(sorted(params.items()))
+        params["signature"] = hmac.new(api_secret.encode(), payload.encode(), sha256).hexdigest()
+    return params
+
+
+class WsApiSession:
+    """One WebSocket API connection with request/response correlation."""
+
+    def __init__(self, url: str, *, request_timeout: float = READ_TIMEOUT) -> None:
+        self.url = url
+        self.request_timeout = request_timeout
+        self.loop = asyncio.get_running_loop()
+        self._ws = None
+        self._reader: asyncio.Task | None = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+        self._retry_at = 0.0
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and self._reader is not None and not self._reader.done()
+
+    async def ensure_connected(self) -> None:
+        if self.connected:
+            return
+        async with self._lock:
+            if self.connected:
+                return
+            if time.monotonic() < self._retry_at:
+                raise WsApiUnavailable("websocket API reconnect cooling down")
+            try:
+                self._ws = await asyncio.wait_for(websockets.connect(self.url), self.request_timeout)
+            except Exception as exc:
+                self._retry_at = time.monotonic() + RECONNECT_COOLDOWN
+                raise WsApiUnavailable(f"websocket API connect failed: {exc!r}") from exc
+            self._reader = asyncio.create_task(self._read(self._ws))
+            logger.info("[WS-API] connected %s", self.url)
+
+    async def _read(self, ws) -> None:
+        try:
+            async for raw in ws:
+                msg = loads(raw)
+                fut = self._pending.pop(str(msg.get("id")), None)
+                if fut is None or fut.done():
+                    continue
+                if msg.get("status") == 200:
+                    fut.set_result(msg.get("result"))
+                else:
+                    err = msg.get("error") or {}
+                    fut.set_exception(WsApiError(msg.get("status", 0), err.get("code"), err.get("msg", "")))
+        except Exception as exc:  # 连接异常断开
+            logger.warning("[WS-API] connection lost: %r", exc)
+        finally:
+            self._ws = None
+            pending, self._pending = self._pending, {}
+            for fut in pending.values():
+                if not fut.done():
+                    fut.set_exception(WsApiDisconnected("websocket API connection closed"))
+
+    async def request(self, method: str, params: Dict[str, Any]) -> Any:
+        """Send one request and wait for its response."""
+        await self.ensure_connected()
+        req_id = str(next(self._ids))
+        fut = self.loop.create_future()
+        self._pending[req_id] = fut
+        try:
+            await self._ws.send(dumps({"id": req_id, "method": method, "params": params}))
+        except Exception as exc:
+            # 帧没有发出，可以安全地改走 REST
+            self._pending.pop(req_id, None)
+            raise WsApiUnavailable(f"websocket API send failed: {exc!r}") from exc
+        try:
+            return await asyncio.wait_for(fut, self.request_timeout)
+        finally:
+            self._pending.pop(req_id, None)
+
+    async def close(self) -> None:
+        if self._ws is not None:
+            await self._ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+            self._reader = None
+
+
+class WsApiSessionPool:
+    """Persistent sessions keyed by endpoint and (unless shared) API key."""
+
+    def __init__(self, shared: bool = False) -> None:
+        self.shared = shared
+        self._sessions: Dict[tuple, WsApiSession] = {}
+
+    def get(self, url: str, api_key: str) -> WsApiSession:
+        key = (url,) if self.shared else (url, api_key)
+        session = self._sessions.get(key)
+        if session is None or session.loop is not asyncio.get_running_loop():
+            session = self._sessions[key] = WsApiSession(url)
+        return session
+
+    async def aclose(self) -> None:
+        sessions, self._sessions = list(self._sessions.values()), {}
+        loop = asyncio.get_running_loop()
+        for session in sessions:
+            if session.loop is loop:
+                await session.close()
+
+
+ws_api_sessions = WsApiSessionPool(
+    shared=os.getenv("BINANCE_WS_API_SHARED", "").lower() in ("1", "true", "yes")
+)
+
+
+@dataclass
+class BinanceWsApiConnector:
+    """Binance follower connector placing orders over the WebSocket API.
+
+    Drop-in for :class:`~server.connectors.binance_sdk_connector.BinanceSDKConnector`
+    on the order path (``order_market_buy``/``order_market_sell``/``get_order``).
+    """
+
+    api_key: str
+    api_secret: str
+    testnet: bool = False
+    url: Optional[str] = None
+    _rest: Optional[BinanceConnector] = field(default=None, init=False)
+
+    def __post_init__(self) -> None:
+        if self.url is None:
+            self.url = WS_API_TESTNET_URL if self.testnet else WS_API_URL
+
+    @classmethod
+    async def warm(cls, accounts, *, env: str = "", parallel: int = 1) -> None:
+        """Connect (or reconnect) each account's session and round-trip a ``ping``."""
+        url = WS_API_TESTNET_URL if env == "test" else WS_API_URL
+        sessions = {id(s): s for s in (ws_api_sessions.get(url, a.api_key) for a in accounts)}
+        await asyncio.gather(*(s.request("ping", {}) for s in sessions.values()))
+
+    def _session(self) -> WsApiSession:
+        return ws_api_sessions.get(self.url, self.api_key)
+
+    def _rest_connector(self) -> BinanceConnector:
+        if self._rest is None:
+            self._rest = BinanceConnector(testnet=self.testnet)
+        return self._rest
+
+    def prepare_market_order(self, symbol: str, side: str, amount: float,
+                             client_order_id: Optional[str] = None) -> Dict[str, Any]:
+        """Signed ``order.place`` params; ``amount`` is quote for BUY, base for SELL."""
+        field_name = "quoteOrderQty" if side == "BUY" else "quantity"
+        params: Dict[str, Any] = {
+            "symbol": symbol, "side": side, "type": "MARKET", field_name: str(amount),
+            "recvWindow": RECV_WINDOW_MS,
+        }
+        if client_order_id:
+            params["newClientOrderId"] = client_order_id
+        return sign(params, self.api_key, self.api_secret)
+
+    async def send_prepared(self, params: Dict[str, Any]) -> Dict:
+        """Send params from :meth:`prepare_market_order` (REST fallback re-signs)."""
+        amounts = {k: float(params[k]) for k in ("quoteOrderQty", "quantity") if k in params}
+        return await self._order(
+            params["symbol"], params["side"], amounts, params.get("newClientOrderId"), signed=params
+        )
+
+    async def _order(self, symbol: str, side: str, amounts: Dict[str, float],
+                     client_order_id: Optional[str], test: bool = False,
+                     signed: Optional[Dict[str, Any]] = None) -> Dict:
+        if signed is None:
+            params: Dict[str, Any] = {
+                "symbol": symbol, "side": side, "type": "MARKET", "recvWindow": RECV_WINDOW_MS,
+            }
+            params.update({k: str(v) for k, v in amounts.items()})
+            if client_order_id:
+                params["newClientOrderId"] = client_order_id
+            signed = sign(params, self.api_key, self.api_secret)
+        method = "order.test" if test else "order.place"
+        try:
+            return await self._session().request(method, signed)
+        except WsApiUnavailable as exc:
+            logger.warning("[WS-API] %s, placing order over REST", exc)
+        return await self._rest_connector().create_market_order(
+            self.api_key,
+            self.api_secret,
+            side,
+            quote_amount=amounts.get("quoteOrderQty"),
+            base_amount=amounts.get("quantity"),
+            symbol=symbol,
+            client_order_id=client_order_id,
+            test=test,
+        )
+
+    async def order_market_buy(self, symbol: str, quote_amount: float,
+                               client_order_id: Optional[str] = None, *, test: bool = False) -> Dict:
+        return await self._order(symbol, "BUY", {"quoteOrderQty": quote_amount}, client_order_id, test)
+
+    async def order_market_sell(self, symbol: str, quantity: float,
+                                client_order_id: Optional[str] = None, *, test: bool = False) -> Dict:
+        return await self._order(symbol, "SELL", {"quantity": quantity}, client_order_id, test)
+
+    async def get_order(self, symbol: str, client_order_id: str) -> Optional[Dict]:
+        """Look up an order by client order id; ``None`` if it does not exist."""
+        params = {"symbol": symbol, "origClientOrderId": client_order_id}
+        try:
+            return await self._session().request(
+                "order.status", sign(params, self.api_key, self.api_secret)
+            )
+        except WsApiError as exc:
+            if exc.code == ORDER_NOT_FOUND:
+                return None
+            raise
+        except WsApiUnavailable:
+            pass
+        return await self._rest_connector().get_order(
+            self.api_key, self.api_secret, client_order_id, symbol
+        )
+
+    async def close(self) -> None:
+        """Release the REST fallback; the pooled session stays open."""
+        if self._rest is not None:
+            await self._rest.close()
+            self._rest = None
+
+    async def __aenter__(self) -> "BinanceWsApiConnector":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
@@ -1,8 +1,9 @@
 """Bitget exchange connectors."""
 
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional
 
+import asyncio
 import base64
 import hmac
 import time
@@ -10,30 +11,62 @@ from hashlib import sha256
 import json
 import logging
 
-import httpx
 import websockets
 
+from ..json_codec import loads, response_json
+from .http import READ_TIMEOUT, SignedRequest, shared_client, use_http2
+from ..profiling import spans
+
 logger = logging.getLogger(__name__)
 
 
+# Bitget error codes meaning the queried order does not exist
+ORDER_NOT_FOUND = ("40109", "43001")
+
+WS_PRIVATE_URL = "wss://ws.bitget.com/v2/ws/private"
+WS_PRIVATE_DEMO_URL = "wss://wspap.bitget.com/v2/ws/private"
+
+
+class BitgetWsError(Exception):
+    """Login or subscribe rejected by the private websocket."""
+
+    def __init__(self, code: Any, msg: str) -> None:
+        super().__init__(f"{code} {msg}")
+        self.code = code
+        self.msg = msg
+
+
 @dataclass
 class BitgetConnector:
     """Minimal Bitget REST/WebSocket connector with demo trading support."""
 
     demo: bool = False
     rest_base: str = "https://api.bitget.com"
-    ws_base: str = "wss://ws.bitget.com/spot/v1/stream"
+    ws_base: Optional[str] = None
 
     def __post_init__(self) -> None:
-        self._client = httpx.AsyncClient(base_url=self.rest_base)
+        if self.ws_base is None:
+            self.ws_base = WS_PRIVATE_DEMO_URL if self.demo else WS_PRIVATE_URL
+        self._client = shared_client(self.rest_base)
         self._ws = None
 
+    @classmethod
+    async def warm(cls, accounts, *, env: str = "", parallel: int = 1) -> None:
+        """Open up to ``parallel`` pooled connections with the public time endpoint."""
+        conn = cls(demo=env == "demo")
+        if use_http2(conn.rest_base):
+            parallel = 1  # 单连接多路复用
+        try:
+            await asyncio.gather(*(conn.get_time() for _ in range(parallel)))
+        finally:
+            await conn.close()
+
     async def get_time(self) -> Optional[int]:
         """Example REST call to fetch server time."""
         try:
             resp = await self._client.get("/api/spot/v1/public/time")
             resp.raise_for_status()
-            data = resp.json()
+            data = response_json(resp)
             return int(data.get("serverTime")) if data else None
         except Exception:
             return None
@@ -63,7 +96,7 @@ class BitgetConnector:
                 headers["paptrading"] = "1"
             resp = await self._client.get(path, headers=headers)
             resp.raise_for_status()
-            data = resp.json().get("data", [])
+            data = response_json(resp).get("data", [])
             result: Dict[str, float] = {"BTC": 0.0, "USDT": 0.0}
             for item in data:
                 coin = item.get("coin") or item.get("coinName")
@@ -75,13 +108,88 @@ class BitgetConnector:
         except Exception:
             return {"BTC": 0.0, "USDT": 0.0}
 
-    async def ws_connect(self, channel: str):
-        """Return a websocket connection for a given channel."""
-        url = f"{self.ws_base}?channel={channel}"
-        self._ws = await websockets.connect(url)
-        return self._ws
+    @staticmethod
+    def ws_login_args(api_key: str, api_secret: str, passphrase: str) -> Dict[str, str]:
+        """Signed ``login`` arguments for the private websocket (timestamp in seconds)."""
+        ts = str(int(time.time()))
+        with spans.span("sign", "bitget"):
+            sign = base64.b64encode(
+                hmac.new(api_secret.encode(), f"{ts}GET/user/verify".encode(), sha256).digest()
+            ).decode()
+        return {"apiKey": api_key, "passphrase": passphrase, "timestamp": ts, "sign": sign}
 
-    async def create_market_order(
+    async def ws_connect(
+        self,
+        api_key: str,
+        api_secret: str,
+        passphrase: str,
+        channels: List[Dict[str, str]],
+        *,
+        url: str | None = None,
+        timeout: float = READ_TIMEOUT,
+    ):
+        """Open the private websocket, log in and subscribe to ``channels``.
+
+        Returns the connection once the login is acknowledged; the subscribe
+        acknowledgements arrive on the connection like any other message.
+        Raises :class:`BitgetWsError` when the login is rejected. Keepalive
+        (text ``ping`` / ``pong``) is left to the caller.
+        """
+        ws = await asyncio.wait_for(
+            websockets.connect(url or self.ws_base, ping_interval=None), timeout
+        )
+        try:
+            await ws.send(json.dumps(
+                {"op": "login", "args": [self.ws_login_args(api_key, api_secret, passphrase)]}
+            ))
+            while True:
+                raw = await asyncio.wait_for(ws.recv(), timeout)
+                if raw == "pong":
+                    continue
+                msg = loads(raw)
+                if msg.get("event") == "login":
+                    break
+                if msg.get("event") == "error":
+                    raise BitgetWsError(msg.get("code"), msg.get("msg", ""))
+            await ws.send(json.dumps({"op": "subscribe", "args": channels}))
+        except BaseException:
+            await ws.close()
+            raise
+        self._ws = ws
+        return ws
+
+    async def get_order_history(
+        self,
+        api_key: str,
+        api_secret: str,
+        passphrase: str,
+        *,
+        symbol: str = "BTCUSDT",
+        start_time: int | None = None,
+        limit: int = 100,
+    ) -> List[Dict]:
+        """Return recent orders for ``symbol`` created since ``start_time`` (ms)."""
+        ts = str(int(time.time() * 1000))
+        path = f"/api/v2/spot/trade/history-orders?symbol={symbol}&limit={limit}"
+        if start_time is not None:
+            path += f"&startTime={int(start_time)}"
+        with spans.span("sign", "bitget"):
+            sign = base64.b64encode(
+                hmac.new(api_secret.encode(), f"{ts}GET{path}".encode(), sha256).digest()
+            ).decode()
+        headers = {
+            "ACCESS-KEY": api_key,
+            "ACCESS-SIGN": sign,
+            "ACCESS-TIMESTAMP": ts,
+            "ACCESS-PASSPHRASE": passphrase,
+        }
+        if self.demo:
+            headers["paptrading"] = "1"
+        resp = await self._client.get(path, headers=headers)
+        resp.raise_for_status()
+        return response_json(resp).get("data") or []
+
+    def prepare_market_order(
         self,
         api_key: str,
         api_secret: str,
@@ -91,18 +199,17 @@ class BitgetConnector:
         quote_amount: float | None = None,
         base_amount: float | None = None,
         symbol: str = "BTCUSDT",
-    ) -> Dict:
-        """Place a market order on Bitget.
+        client_oid: str | None = None,
+    ) -> SignedRequest:
+        """Build and sign a market order request without sending it.
 
         Bitget's v2 spot trade API uses a single ``size`` field for both BUY and
         SELL orders. For BUY orders, ``size`` represents the quote (USDT) amount
         to spend. For SELL orders, ``size`` is the base asset amount to sell.
-        Orders also require ``orderType`` and ``force`` parameters. Errors will
-        raise ``httpx.HTTPStatusError`` so callers can surface meaningful
-        messages to users.
+        Orders also require ``orderType`` and ``force`` parameters.
         """
-
-        ts = str(int(time.time() * 1000))
+        now = time.time()
+        ts = str(int(now * 1000))
         path = "/api/v2/spot/trade/place-order"
         body: Dict[str, str] = {
             "symbol": symbol,
@@ -119,12 +226,15 @@ class BitgetConnector:
             if base_amount is None:
                 raise ValueError("base_amount required for SELL orders")
             body["size"] = str(base_amount)
+        if client_oid:
+            body["clientOid"] = client_oid
 
-        body_str = json.dumps(body)
-        prehash = f"{ts}POST{path}{body_str}"
-        sign = base64.b64encode(
-            hmac.new(api_secret.encode(), prehash.encode(), sha256).digest()
-        ).decode()
+        with spans.span("sign", "bitget"):
+            body_str = json.dumps(body)
+            prehash = f"{ts}POST{path}{body_str}"
+            sign = base64.b64encode(
+                hmac.new(api_secret.encode(), prehash.encode(), sha256).digest()
+            ).decode()
         headers = {
             "ACCESS-KEY": api_key,
             "ACCESS-SIGN": sign,
@@ -134,13 +244,77 @@ class BitgetConnector:
         }
         if self.demo:
             headers["paptrading"] = "1"
+        return SignedRequest("POST", path, headers, body_str, now)
+
+    async def send_prepared(self, request: SignedRequest) -> Dict:
+        """Send a request from :meth:`prepare_market_order`."""
+        resp = await self._client.post(request.path, headers=request.headers, content=request.content)
+        resp.raise_for_status()
+        return response_json(resp)
+
+    async def create_market_order(
+        self,
+        api_key: str,
+        api_secret: str,
+        passphrase: str,
+        side: str,
+        *,
+        quote_amount: float | None = None,
+        base_amount: float | None = None,
+        symbol: str = "BTCUSDT",
+        client_oid: str | None = None,
+    ) -> Dict:
+        """Place a market order on Bitget.
 
-        resp = await self._client.post(path, headers=headers, content=body_str)
+        See :meth:`prepare_market_order` for the request format. Errors will
+        raise ``httpx.HTTPStatusError`` so callers can surface meaningful
+        messages to users. ``client_oid`` tags the order so it can be found
+        with :meth:`get_order`.
+        """
+        return await self.send_prepared(self.prepare_market_order(
+            api_key,
+            api_secret,
+            passphrase,
+            side,
+            quote_amount=quote_amount,
+            base_amount=base_amount,
+            symbol=symbol,
+            client_oid=client_oid,
+        ))
+
+    async def get_order(
+        self, api_key: str, api_secret: str, passphrase: str, client_oid: str
+    ) -> Optional[Dict]:
+        """Look up an order by ``clientOid``; ``None`` if it does not exist."""
+        ts = str(int(time.time() * 1000))
+        path = f"/api/v2/spot/trade/orderInfo?clientOid={client_oid}"
+        with spans.span("sign", "bitget"):
+            sign = base64.b64encode(
+                hmac.new(api_secret.encode(), f"{ts}GET{path}".encode(), sha256).digest()
+            ).decode()
+        headers = {
+            "ACCESS-KEY": api_key,
+            "ACCESS-SIGN": sign,
+            "ACCESS-TIMESTAMP": ts,
+            "ACCESS-PASSPHRASE": passphrase,
+        }
+        if self.demo:
+            headers["paptrading"] = "1"
+        resp = await self._client.get(path, headers=headers)
+        if resp.status_code == 400:
+            try:
+                if str(response_json(resp).get("code")) in ORDER_NOT_FOUND:
+                    return None
+            except Exception:
+                pass
         resp.raise_for_status()
-        return resp.json()
+        data = response_json(resp).get("data")
+        if isinstance(data, list):
+            return data[0] if data else None
+        return data or None
 
     async def close(self) -> None:
-        """Close underlying HTTP and WebSocket connections."""
+        """Close the WebSocket; pooled HTTP connections stay open for reuse."""
         await self._client.aclose()
         if self._ws is not None and not self._ws.closed:
             await self._ws.close()
@@ -0,0 +1,216 @@
+"""Shared HTTP client settings and connection pools for the exchange connectors.
+
+Connectors are created per order, so each used to open (and close) its own
+TCP/TLS connections. Instead every connector client routes requests through
+one pooled transport per exchange origin, kept warm across connectors:
+
+* ``httpx`` connectors get a thin per-instance ``AsyncClient`` whose
+  transport is :class:`SharedTransport`; closing the client leaves the pool
+  open. Pools are per event loop because ``httpcore`` connections cannot be
+  shared between loops.
+* ``python-binance`` clients (``requests``) get :func:`mount_shared_adapter`,
+  which mounts one process wide urllib3 pool per origin into the session
+  while keeping the session's own API key headers.
+
+HTTP/2 is used for the origins in ``HTTP2_HOSTS`` when the ``h2`` package is
+installed (``pip install httpx[http2]``), multiplexing concurrent follower
+orders over a single connection. All pools share one TLS context, so the CA
+bundle is loaded once.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import weakref
+from dataclasses import dataclass, field
+from typing import Dict
+from urllib.parse import urlsplit
+
+import httpx
+
+try:  # optional: HTTP/2 support for httpx
+    import h2  # noqa: F401
+except Exception:  # pragma: no cover
+    h2 = None
+
+try:  # optional: only needed by the python-binance connector
+    from requests.adapters import HTTPAdapter
+except Exception:  # pragma: no cover
+    HTTPAdapter = None
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+# Explicit limits so one hung request cannot stall the event loop for long.
+CONNECT_TIMEOUT = _env_float("HTTP_CONNECT_TIMEOUT", 3.0)
+READ_TIMEOUT = _env_float("HTTP_READ_TIMEOUT", 5.0)
+
+DEFAULT_TIMEOUT = httpx.Timeout(
+    connect=CONNECT_TIMEOUT, read=READ_TIMEOUT, write=READ_TIMEOUT, pool=CONNECT_TIMEOUT
+)
+
+# Per-origin pool sizing: a few warm connections carry all followers of a venue.
+POOL_LIMITS = httpx.Limits(
+    max_connections=_env_int("HTTP_POOL_MAX", 20),
+    max_keepalive_connections=_env_int("HTTP_POOL_KEEPALIVE", 10),
+    keepalive_expiry=_env_float("HTTP_KEEPALIVE_EXPIRY", 60.0),
+)
+
+# Origins known to negotiate HTTP/2 via ALPN
+HTTP2_HOSTS = frozenset(
+    h.strip()
+    for h in os.getenv(
+        "HTTP2_HOSTS", "api.binance.com,testnet.binance.vision,api.bitget.com"
+    ).split(",")
+    if h.strip()
+)
+HTTP2_ENABLED = h2 is not None and os.getenv("HTTP2", "1").lower() not in ("0", "false", "no")
+
+_ssl_context = None
+
+
+def ssl_context():
+    """TLS context shared by every pool (CA bundle loaded once)."""
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = httpx.create_ssl_context()
+    return _ssl_context
+
+
+def _origin(url: httpx.URL | str) -> str:
+    parts = urlsplit(str(url))
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def use_http2(origin: str) -> bool:
+    return HTTP2_ENABLED and urlsplit(origin).hostname in HTTP2_HOSTS
+
+
+class TransportPool:
+    """Pooled ``httpx`` transports keyed by event loop and origin."""
+
+    def __init__(self) -> None:
+        self._pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncHTTPTransport]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def get(self, origin: str) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        pools = self._pools.get(loop)
+        if pools is None:
+            pools = self._pools[loop] = {}
+        transport = pools.get(origin)
+        if transport is None:
+            transport = pools[origin] = httpx.AsyncHTTPTransport(
+                verify=ssl_context(), http2=use_http2(origin), limits=POOL_LIMITS
+            )
+        return transport
+
+    def origins(self) -> list[str]:
+        """Origins with an open pool on the running loop."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return []
+        return sorted(self._pools.get(loop, {}))
+
+    async def aclose(self) -> None:
+        """Close the pools of the running loop."""
+        pools = self._pools.pop(asyncio.get_running_loop(), {})
+        for transport in pools.values():
+            await transport.aclose()
+
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    """Route requests to the shared pool; closing it leaves the pool open."""
+
+    def __init__(self, pool: TransportPool | None = None) -> None:
+        self._pool = pool or transport_pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._pool.get(_origin(request.url)).handle_async_request(request)
+
+    async def aclose(self) -> None:
+        pass
+
+
+@dataclass
+class SignedRequest:
+    """A fully signed request prepared ahead of sending (order pre-staging)."""
+
+    method: str
+    path: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    content: str | None = None
+    created: float = 0.0  # time.time() of the signature
+
+
+def shared_client(base_url: str, **kwargs) -> httpx.AsyncClient:
+    """Per-connector ``AsyncClient`` backed by the shared connection pools."""
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    return httpx.AsyncClient(base_url=base_url, transport=SharedTransport(), **kwargs)
+
+
+if HTTPAdapter is not None:
+
+    class _SharedAdapter(HTTPAdapter):
+        """``requests`` adapter whose pool survives ``Session.close()``."""
+
+        def close(self) -> None:
+            pass
+
+        def close_pool(self) -> None:
+            super().close()
+
+else:  # pragma: no cover
+    _SharedAdapter = None
+
+_adapters: Dict[str, "HTTPAdapter"] = {}
+
+
+def mount_shared_adapter(session, origin: str) -> None:
+    """Mount the process wide connection pool for ``origin`` into ``session``."""
+    if _SharedAdapter is None:
+        return
+    adapter = _adapters.get(origin)
+    if adapter is None:
+        adapter = _adapters[origin] = _SharedAdapter(
+            pool_connections=1,
+            pool_maxsize=POOL_LIMITS.max_keepalive_connections or 10,
+        )
+    session.mount(origin, adapter)
+
+
+def warm_requests_pool(origin: str, path: str) -> None:
+    """GET ``origin + path`` through the shared ``requests`` pool (blocking)."""
+    import requests
+
+    with requests.Session() as session:
+        mount_shared_adapter(session, origin)
+        session.get(origin + path, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+
+
+async def close_shared_transports() -> None:
+    """Close all shared pools; called on application shutdown."""
+    await transport_pool.aclose()
+    adapters = list(_adapters.values())
+    _adapters.clear()
+    for adapter in adapters:
+        adapter.close_pool()
+
+
+# Singleton used by every connector
+transport_pool = TransportPool()
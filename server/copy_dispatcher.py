@@ -1,23 +1,46 @@
 """Dispatch copy trading orders to follower accounts."""
 
 from __future__ import annotations
+import asyncio
 import logging
-from math import floor
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
 
 from .accounts import AccountStatus, account_service, AccountService
 from .balances import balance_service, BalanceService
-from .idempotency import IdempotencyStore
+from .circuit_breaker import BreakerRegistry
+from .events import FillEvent
+from .idempotency import IdempotencyStore, open_idempotency_store
+from .order_ids import client_order_id
+from .retry import (
+    ACCEPT_WINDOW,
+    OrderOutcomeUnknown,
+    RetryPolicy,
+    is_exchange_fault,
+    is_retryable,
+    needs_lookup,
+)
+from .profiling import spans
+from .push import push_hub
+from .rate_limit import RateLimited, RateLimiter
+from .result_history import ResultHistory
+from .sizing import FollowerTable, round_down, size_orders
+from .warmer import ConnectionWarmer
 
 try:  # optional during tests
-    from .connectors import BinanceSDKConnector, BitgetConnector
+    from .connectors import BinanceSDKConnector, BinanceWsApiConnector, BitgetConnector
 except Exception:  # pragma: no cover
-    BinanceSDKConnector = BitgetConnector = None
+    BinanceSDKConnector = BinanceWsApiConnector = BitgetConnector = None
 
 # Maintain backwards compatibility for tests that patch BinanceConnector
 BinanceConnector = BinanceSDKConnector
 
 SYMBOL = "BTCUSDT"
 
+# Binance follower order path: "sdk" (python-binance REST) or "ws" (WebSocket API)
+BINANCE_ORDER_MODE = os.getenv("BINANCE_ORDER_MODE", "sdk").lower()
 
 class CopyDispatcher:
     """Dispatcher that will copy leader orders to follower accounts."""
@@ -27,6 +50,9 @@ class CopyDispatcher:
         accounts: AccountService,
         balances: BalanceService,
         idem_store: IdempotencyStore,
+        breakers: BreakerRegistry | None = None,
+        history: ResultHistory | None = None,
+        retry: RetryPolicy | None = None,
     ) -> None:
         self._accounts = accounts
         self._balances = balances
@@ -34,11 +60,25 @@ class CopyDispatcher:
         self._connectors = {}
         if BinanceConnector:
             self._connectors["binance"] = BinanceConnector
+        if BINANCE_ORDER_MODE == "ws" and BinanceWsApiConnector:
+            self._connectors["binance"] = BinanceWsApiConnector
         if BitgetConnector:
             self._connectors["bitget"] = BitgetConnector
         self._enabled: bool = True
+        # 多进程部署时由共享开关决定是否跟单（见 set_gate）
+        self._gate: Callable[[], Awaitable[bool]] | None = None
         # Store per-account results for UI consumption
         self._last_results: dict[str, dict] = {}
+        # Per-account / per-exchange circuit breakers fed by those results
+        self._breakers = breakers or BreakerRegistry()
+        # Bounded per-event history of the same results
+        self._history = history if history is not None else ResultHistory()
+        # 单笔订单的重试次数与延迟预算
+        self._retry_policy = retry or RetryPolicy()
+        # 空闲期保持 follower 连接池常热
+        self._warmer = ConnectionWarmer(accounts, lambda: self._connectors)
+        # 每个账户的下单令牌桶
+        self._limiter = RateLimiter()
         self._log = logging.getLogger(__name__)
 
     def start(self) -> None:
@@ -50,9 +90,103 @@ class CopyDispatcher:
     def is_running(self) -> bool:
         return self._enabled
 
+    def set_gate(self, gate: Callable[[], Awaitable[bool]] | None) -> None:
+        """Ask ``gate`` whether copying is enabled before every dispatch.
+
+        Used with leader election, where ``/copy/start`` and ``/copy/stop``
+        may reach another process than the one dispatching.
+        """
+        self._gate = gate
+
+    async def _check_enabled(self) -> bool:
+        if self._gate is not None:
+            try:
+                self._enabled = await self._gate()
+            except Exception:
+                self._log.exception("[COPY] copy switch check failed, keeping enabled=%s", self._enabled)
+        return self._enabled
+
     def get_last_results(self) -> dict[str, dict]:
         return self._last_results
 
+    def get_breaker_states(self) -> dict[str, dict]:
+        return self._breakers.snapshot()
+
+    def reset_breaker(self, account_name: str) -> None:
+        self._breakers.reset(account_name)
+
+    def get_history(self) -> ResultHistory:
+        return self._history
+
+    def get_shard_metrics(self) -> list[dict]:
+        """Per-worker metrics in sharded mode; empty for in-process dispatch."""
+        return []
+
+    def get_warmer_status(self) -> dict:
+        return self._warmer.status()
+
+    def prewarm(self, reason: str) -> None:
+        """Re-warm follower connections now (leader reconnect or pre-trade activity)."""
+        self._warmer.poke(reason)
+
+    async def startup(self) -> None:
+        """Start background resources (worker processes in sharded mode)."""
+        self._warmer.start()
+
+    async def shutdown(self) -> None:
+        """Release resources acquired by :meth:`startup`."""
+        await self._warmer.stop()
+
+    def _set_result(
+        self,
+        account,
+        result: dict,
+        *,
+        event_id,
+        side: str,
+        amount: float,
+        latency_ms: float = 0.0,
+    ) -> None:
+        """Store ``result`` for the UI, append it to the history and push it."""
+        self._last_results[account.name] = result
+        self._history.append(
+            event_id=event_id,
+            account=account.name,
+            exchange=account.exchange,
+            side=side,
+            amount=amount,
+            success=bool(result.get("success")),
+            latency_ms=latency_ms,
+            order_id=_order_id(result.get("data")),
+            error=result.get("error"),
+        )
+        push_hub.publish("result", account=account.name, result=result)
+
+    def _record_result(self, account, result: dict, *, exchange_fault: bool = True, **record) -> None:
+        """Store ``result`` and feed it to the circuit breakers."""
+        self._set_result(account, result, **record)
+        if self._breakers.record(
+            account.name, account.exchange, result, exchange_fault=exchange_fault
+        ):
+            self._log.error(
+                "[BREAKER] acct=%s keeps failing, pausing account", account.name
+            )
+            try:
+                self._accounts.update_account(account.name, status=AccountStatus.PAUSED)
+            except Exception:
+                self._log.exception("[BREAKER] failed to pause acct=%s", account.name)
+
+    async def _idem_call(self, fn, *args):
+        """Call the idempotency store; blocking stores run on their ``executor``."""
+        executor = getattr(self._idem, "executor", None)
+        if executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    async def _release(self, key, claimed: set) -> None:
+        claimed.discard(key)
+        await self._idem_call(self._idem.release, key)
+
     # 小工具：用于排查是否同一个实例（不影响业务）
     def get_instance_id(self) -> int:
         return id(self)
@@ -60,193 +194,517 @@ class CopyDispatcher:
     @staticmethod
     def _round_down(v: float, decimals: int) -> float:
         """向下截断到指定小数位（比四舍五入更安全，避免超额）。"""
-        if decimals <= 0:
-            return float(floor(v))
-        scale = 10 ** decimals
-        return floor(v * scale) / scale
+        return round_down(v, decimals)
 
-    async def dispatch(self, order_event: dict) -> None:
+    async def dispatch(
+        self,
+        order_event: FillEvent | dict,
+        staged: dict[str, "StagedOrder"] | None = None,
+    ) -> None:
         """Dispatch an order event to all followers.
         Real order results are recorded and any failures are captured so the UI
-        can surface them to the user.
+        can surface them to the user. Legacy dict events are converted to
+        :class:`FillEvent` once on entry. ``staged`` maps follower names to
+        orders pre-staged by :meth:`stage`; a staged order is used when its
+        side and amount match the dispatch sizing and discarded otherwise.
         """
-        if not self._enabled:
+        if not await self._check_enabled():
+            if staged:
+                await self.discard_staged(staged)
             return
 
-        event_id = order_event.get("event_id")
-        side = order_event.get("side")
-        leader_quote = float(order_event.get("quote_filled", 0.0))
-        leader_base = float(order_event.get("base_filled", 0.0))
-        free_usdt = float(
-            order_event.get("leader_pre_usdt")
-            or order_event.get("leader_free_usdt", 0.0)
-        )
-        free_btc = float(
-            order_event.get("leader_pre_btc")
-            or order_event.get("leader_free_btc", 0.0)
-        )
+        if not isinstance(order_event, FillEvent):
+            order_event = FillEvent.from_dict(order_event)
+
+        event_id = order_event.event_id
+        side = order_event.side
+        leader_quote = order_event.quote_filled
+        leader_base = order_event.base_filled
+        free_usdt = order_event.ref_usdt
+        free_btc = order_event.ref_btc
 
         # 计算比例（保持原逻辑）
         quote_ratio = max(0.0, min(leader_quote / free_usdt, 1.0)) if free_usdt else 0.0
         base_ratio = max(0.0, min(leader_base / free_btc, 1.0)) if free_btc else 0.0
 
+        claimed: set = set()
+        retries: list = []
+        staged = dict(staged or {})
+        try:
+            # 1) 过滤出需要下单的 follower，并读取缓存余额
+            candidates = list(self._candidates())
+            keys = [(event_id, account.name) for account, _ in candidates]
+            # 先一次性原子认领再下单：已完成或其它进程/协程正在处理的 key 直接跳过
+            won = await self._idem_call(self._idem.claim_many, keys) if keys else []
+            claimed.update(key for key, ok in zip(keys, won) if ok)
+            batch = []
+            for (account, connector_cls), key, ok in zip(candidates, keys, won):
+                if not ok:
+                    continue
+                with spans.span("balance", account.exchange):
+                    balance = await self._balances.get_balance(account.name)
+                batch.append((account, connector_cls, key, balance))
+
+            # 2) 一次性批量计算所有 follower 的下单金额、精度截断与最小金额过滤
+            with spans.span("sizing"):
+                table = FollowerTable.from_rows(
+                    (a.name, a.exchange, bal.get("USDT", 0.0), bal.get("BTC", 0.0))
+                    for a, _, _, bal in batch
+                )
+                sized = size_orders(table, side, quote_ratio, base_ratio, order_event.price)
+            with spans.span("log"):
+                self._log.info(
+                    "[ORDER-BATCH] inst=%s event=%s side=%s symbol=%s followers=%d "
+                    "q_ratio=%.6f b_ratio=%.6f leader_quote=%.10f leader_base=%.10f "
+                    "free_usdt=%.10f free_btc=%.10f",
+                    id(self), event_id, side, SYMBOL, len(batch), quote_ratio, base_ratio,
+                    leader_quote, leader_base, free_usdt, free_btc
+                )
+
+            # 3) 逐个 follower 发起下单 I/O
+            for i, (account, connector_cls, key, balance) in enumerate(batch):
+                amount = sized.amounts[i]
+                quote_amt = amount if side == "BUY" else 0.0
+                base_amt = amount if side != "BUY" else 0.0
+                ex = account.exchange
+                with spans.span("log", ex):
+                    self._log.info(
+                        "[ORDER] -> inst=%s acct=%s ex=%s env=%s side=%s symbol=%s "
+                        "raw_amt=%.10f amt=%.10f balance=%s",
+                        id(self), account.name, ex, getattr(account, "env", ""),
+                        side, SYMBOL, sized.raw[i], amount, balance
+                    )
+
+                # 金额为 0 / 低于最小金额的早退
+                record = {"event_id": event_id, "side": side, "amount": amount}
+                reason = sized.skip[i]
+                if reason is not None:
+                    await self._release(key, claimed)
+                    self._set_result(account, {"success": False, "error": reason}, **record)
+                    self._log.warning(
+                        "[ORDER-SKIP] %s inst=%s acct=%s", reason, id(self), account.name
+                    )
+                    continue
+
+                # 熔断：账户或交易所连续失败时直接跳过，避免拖慢后续 follower
+                allowed, reason = self._breakers.allow(account.name, account.exchange)
+                if not allowed:
+                    await self._release(key, claimed)
+                    self._set_result(account, {"success": False, "error": reason}, **record)
+                    self._log.warning(
+                        "[ORDER-SKIP] %s inst=%s acct=%s", reason, id(self), account.name
+                    )
+                    continue
+
+                # === 下单逻辑（保持原调用方式与连接器用法不变）===
+                # 由 (event_id, account) 生成确定性的 client order id，超时后可按 id 查单
+                order = _PendingOrder(
+                    account, connector_cls, key, side, quote_amt, base_amt,
+                    client_order_id(event_id, account.name), record,
+                    time.perf_counter(), time.monotonic() + self._retry_policy.budget,
+                )
+                pre = staged.pop(account.name, None)
+                if pre is not None and pre.side == side and pre.amount == amount:
+                    # 预先构造好的连接器与预留令牌直接复用；请求在此用 event_id 派生的
+                    # client order id 签名，与重放 / 重启后的普通路径一致
+                    order.connector, order.reserved = pre.connector, True
+                    try:
+                        order.prepared = self._prepare(
+                            account, pre.connector, side, quote_amt, base_amt, order.cid
+                        )
+                    except Exception:
+                        self._log.exception("[PRESTAGE] acct=%s signing failed", account.name)
+                elif pre is not None:
+                    staged[account.name] = pre
+                await self._first_attempt(order, claimed, retries)
+
+            # 4) 可重试的失败在所有 follower 首次下单之后并发重试，不拖慢健康的 follower
+            if retries:
+                await asyncio.gather(*(self._retry(o, exc, claimed) for o, exc in retries))
+
+        finally:
+            # 未完成的认领（异常/取消）全部释放
+            if claimed:
+                await self._idem_call(self._idem.release_many, list(claimed))
+            if staged:
+                await self.discard_staged(staged)
+
+    def _candidates(self):
+        """Active followers with a connector, as ``(account, connector_cls)``."""
         for account in self._accounts.list_accounts():
             if account.status != AccountStatus.ACTIVE:
                 continue
-            key = (event_id, account.name)
-            if self._idem.is_processed(key):
-                continue
-
             connector_cls = self._connectors.get(account.exchange)
-            if connector_cls is None:
-                continue
+            if connector_cls is not None:
+                yield account, connector_cls
 
-            # 读取余额并按比例换算金额（保持原逻辑）
-            balance = await self._balances.get_balance(account.name)
-            quote_amt = max(0.0, balance.get("USDT", 0.0) * quote_ratio)
-            base_amt = max(0.0, balance.get("BTC", 0.0) * base_ratio)
+    async def stage(self, side: str, quote_ratio: float,
+                    base_ratio: float) -> dict[str, "StagedOrder"]:
+        """Pre-stage follower orders for a leader order that has not filled yet.
 
-            # 原有的计算日志（保留）
+        Sizes every follower with the expected ratios, reserves a rate-limit
+        token and builds the connector. Nothing is claimed, signed or sent;
+        pass the result to :meth:`dispatch` (which signs each request with
+        the client order id of the fill's event id, like any other order) or
+        to :meth:`discard_staged`.
+        """
+        batch = []
+        for account, connector_cls in self._candidates():
+            balance = await self._balances.get_balance(account.name)
+            batch.append((account, connector_cls, balance))
+        table = FollowerTable.from_rows(
+            (a.name, a.exchange, bal.get("USDT", 0.0), bal.get("BTC", 0.0)) for a, _, bal in batch
+        )
+        sized = size_orders(table, side, quote_ratio, base_ratio)
+        staged: dict[str, StagedOrder] = {}
+        for i, (account, connector_cls, _) in enumerate(batch):
+            ex = account.exchange
+            # 只检查熔断状态，半开的试探名额留给真正下单时占用
+            if sized.skip[i] is not None or self._breakers.check(account.name, ex) is not None:
+                continue
+            if not self._limiter.try_take(account.name, ex):
+                continue
+            pre = StagedOrder(account.name, ex, side, sized.amounts[i])
             try:
-                print(
-                    f"[DISPATCH] {event_id=} {side=} {leader_quote=} {free_usdt=} "
-                    f"{quote_ratio=} {leader_base=} {free_btc=} {base_ratio=} "
-                    f"{account.name=} {balance=} {quote_amt=} {base_amt=}"
-                )
+                with spans.span("connector_init", ex):
+                    pre.connector = self._connect(account, connector_cls)
             except Exception:
-                pass
+                self._log.exception("[PRESTAGE] acct=%s staging failed", account.name)
+                await self.discard_staged({account.name: pre})
+                continue
+            staged[account.name] = pre
+        return staged
 
-            # 下单前日志（新增）
-            self._log.info(
-                "[ORDER] -> inst=%s acct=%s ex=%s env=%s side=%s symbol=%s "
-                "quote_amt=%.10f base_amt=%.10f q_ratio=%.6f b_ratio=%.6f "
-                "leader_quote=%.10f leader_base=%.10f free_usdt=%.10f free_btc=%.10f",
-                id(self), account.name, account.exchange, getattr(account, "env", ""),
-                side, SYMBOL, quote_amt, base_amt, quote_ratio, base_ratio,
-                leader_quote, leader_base, free_usdt, free_btc
+    async def discard_staged(self, staged: dict[str, "StagedOrder"]) -> None:
+        """Refund the tokens and close the connectors of unused staged orders."""
+        for pre in staged.values():
+            self._limiter.refund(pre.account, pre.exchange)
+            if pre.connector is not None:
+                try:
+                    await pre.connector.close()
+                except Exception:
+                    pass
+        staged.clear()
+
+    async def _place(self, account, connector, side: str, quote_amt: float,
+                     base_amt: float, cid: str) -> dict:
+        """Submit the market order through ``connector`` tagged with ``cid``."""
+        if account.exchange == "binance":
+            if side == "BUY":
+                # BUY 用 quote 数量
+                return await connector.order_market_buy(SYMBOL, quote_amt, client_order_id=cid)
+            # SELL 用 base 数量
+            return await connector.order_market_sell(SYMBOL, base_amt, client_order_id=cid)
+        amounts = {"quote_amount": quote_amt} if side == "BUY" else {"base_amount": base_amt}
+        if account.exchange == "bitget":
+            return await connector.create_market_order(
+                account.api_key,
+                account.api_secret,
+                getattr(account, "passphrase", "") or "",
+                side,
+                client_oid=cid,
+                **amounts,
             )
+        return await connector.create_market_order(
+            account.api_key, account.api_secret, side, client_order_id=cid, **amounts
+        )
 
-            # === 仅新增：按交易所规则向下截断小数位，避免精度拒单 ===
-            if account.exchange == "binance":
-                if side == "BUY":
-                    # Binance BUY 用 quoteOrderQty（USDT），一般按 2 位处理
-                    quote_amt = self._round_down(quote_amt, 2)
-                else:
-                    # Binance SELL 用 quantity（BTC），常见 6 位足够
-                    base_amt = self._round_down(base_amt, 6)
-            elif account.exchange == "bitget":
-                # Bitget 错误明确提示 checkScale=8
-                if side == "BUY":
-                    quote_amt = self._round_down(quote_amt, 8)
-                else:
-                    base_amt = self._round_down(base_amt, 8)
-
-            # 记录对齐后的金额（新增）
-            self._log.info(
-                "[ORDER-SANITIZED] inst=%s acct=%s ex=%s side=%s quote_amt=%.10f base_amt=%.10f",
-                id(self), account.name, account.exchange, side, quote_amt, base_amt
+    async def _lookup(self, account, connector, cid: str) -> dict | None:
+        """Find a previously submitted order by client order id."""
+        if account.exchange == "binance":
+            return await connector.get_order(SYMBOL, cid)
+        if account.exchange == "bitget":
+            return await connector.get_order(
+                account.api_key,
+                account.api_secret,
+                getattr(account, "passphrase", "") or "",
+                cid,
             )
+        return await connector.get_order(account.api_key, account.api_secret, cid)
 
-            # 金额为 0 的早退（保持原语义，仅加一条提示日志）
-            if side == "BUY" and quote_amt <= 0:
-                self._last_results[account.name] = {
-                    "success": False,
-                    "error": "zero quote_amt",
-                }
-                self._log.warning(
-                    "[ORDER-SKIP] zero quote_amt inst=%s acct=%s", id(self), account.name
-                )
-                continue
-            if side == "SELL" and base_amt <= 0:
-                self._last_results[account.name] = {
-                    "success": False,
-                    "error": "zero base_amt",
-                }
-                self._log.warning(
-                    "[ORDER-SKIP] zero base_amt inst=%s acct=%s", id(self), account.name
-                )
-                continue
+    def _prepare(self, account, connector, side: str, quote_amt: float,
+                 base_amt: float, cid: str):
+        """Pre-signed order request, or ``None`` if the connector cannot prepare one."""
+        prepare = getattr(connector, "prepare_market_order", None)
+        if prepare is None:
+            return None
+        if account.exchange == "binance":
+            return prepare(SYMBOL, side, quote_amt if side == "BUY" else base_amt, client_order_id=cid)
+        amounts = {"quote_amount": quote_amt} if side == "BUY" else {"base_amount": base_amt}
+        if account.exchange == "bitget":
+            return prepare(
+                account.api_key,
+                account.api_secret,
+                getattr(account, "passphrase", "") or "",
+                side,
+                client_oid=cid,
+                **amounts,
+            )
+        return None
 
-            # === 下单逻辑（保持原调用方式与连接器用法不变）===
+    @staticmethod
+    def _connect(account, connector_cls):
+        if account.exchange == "binance":
+            return connector_cls(
+                api_key=account.api_key,
+                api_secret=account.api_secret,
+                testnet=getattr(account, "env", "") == "test",
+            )
+        # 兼容 bitget / 其它 HTTP 连接器的构造参数（保持原有判断）
+        kwargs = (
+            {"demo": getattr(account, "env", "") == "demo"}
+            if account.exchange == "bitget"
+            else {"testnet": getattr(account, "env", "") == "test"}
+        )
+        return connector_cls(**kwargs)
+
+    async def _attempt(self, order: "_PendingOrder") -> dict:
+        """One order attempt, including connector setup, within the budget."""
+        account = order.account
+        ex = account.exchange
+        order.attempts += 1
+        timeout = min(self._retry_policy.attempt_timeout, order.deadline - time.monotonic())
+        if timeout <= 0:
+            raise asyncio.TimeoutError("order latency budget exhausted")
+        if order.reserved:
+            order.reserved = False
+        else:
+            wait = self._limiter.take(account.name, ex)
+            if wait >= timeout:
+                self._limiter.refund(account.name, ex)
+                raise RateLimited(wait)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                timeout -= wait
+        # 预暂存的连接器只用于首次尝试
+        connector, order.connector = order.connector, None
+        if connector is None:
+            with spans.span("connector_init", ex):
+                connector = self._connect(account, order.connector_cls)
+        if ex == "binance":
             try:
-                if account.exchange == "binance":
-                    connector = connector_cls(
-                        api_key=account.api_key,
-                        api_secret=account.api_secret,
-                        testnet=getattr(account, "env", "") == "test",
-                    )
-                    try:
-                        if side == "BUY":
-                            # BUY 用 quote 数量
-                            result = await connector.order_market_buy(SYMBOL, quote_amt)
-                        else:
-                            # SELL 用 base 数量
-                            result = await connector.order_market_sell(SYMBOL, base_amt)
-                    finally:
-                        await connector.close()
-                else:
-                    # 兼容 bitget / 其它 HTTP 连接器的构造参数（保持原有判断）
-                    kwargs = (
-                        {"demo": getattr(account, "env", "") == "demo"}
-                        if account.exchange == "bitget"
-                        else {"testnet": getattr(account, "env", "") == "test"}
-                    )
-                    async with connector_cls(**kwargs) as connector:
-                        if account.exchange == "bitget":
-                            if side == "BUY":
-                                result = await connector.create_market_order(
-                                    account.api_key,
-                                    account.api_secret,
-                                    getattr(account, "passphrase", "") or "",
-                                    side,
-                                    quote_amount=quote_amt,
-                                )
-                            else:
-                                result = await connector.create_market_order(
-                                    account.api_key,
-                                    account.api_secret,
-                                    getattr(account, "passphrase", "") or "",
-                                    side,
-                                    base_amount=base_amt,
-                                )
-                        else:
-                            if side == "BUY":
-                                result = await connector.create_market_order(
-                                    account.api_key,
-                                    account.api_secret,
-                                    side,
-                                    quote_amount=quote_amt,
-                                )
-                            else:
-                                result = await connector.create_market_order(
-                                    account.api_key,
-                                    account.api_secret,
-                                    side,
-                                    base_amount=base_amt,
-                                )
-
-                # 成功：触发余额刷新、标记幂等、记录结果（保持原逻辑）
-                self._balances.trigger_update(account.name)
-                self._idem.mark_processed(key)
-                self._last_results[account.name] = {"success": True, "data": result}
-                self._log.info(
-                    "[ORDER-OK] <- acct=%s inst=%s ex=%s",
-                    account.name, id(self), account.exchange
-                )
-            except Exception as exc:
-                # 失败：提取 reason 并落地（保持原逻辑）
-                reason = str(exc)
-                if hasattr(exc, "response"):
-                    try:
-                        reason = exc.response.text
-                    except Exception:
-                        pass
-                self._last_results[account.name] = {"success": False, "error": reason}
-                self._log.error(
-                    "[ORDER-FAIL] <- acct=%s inst=%s ex=%s reason=%s",
-                    account.name, id(self), account.exchange, reason
-                )
-                continue
+                return await self._submit(order, connector, timeout)
+            finally:
+                await connector.close()
+        async with connector:
+            return await self._submit(order, connector, timeout)
+
+    async def _submit(self, order: "_PendingOrder", connector, timeout: float) -> dict:
+        """Place the order; if its outcome is unknown resolve it by lookup.
+
+        Returns the exchange order (from the ack or the lookup). The request
+        may still be in flight when the call ends, so a lookup miss only
+        counts once the exchange's acceptance window (``ACCEPT_WINDOW``) has
+        passed; then the original error is re-raised (safe to retry). Raises
+        :class:`OrderOutcomeUnknown` when the lookup fails, the exchange has
+        no such window or waiting for it would exceed the order's budget.
+        """
+        account = order.account
+        ex = account.exchange
+        cid = order.cid
+        prepared, order.prepared = order.prepared, None
+        if prepared is not None:
+            call = connector.send_prepared(prepared)
+        else:
+            call = self._place(account, connector, order.side, order.quote_amt, order.base_amt, cid)
+        try:
+            with spans.span("order", ex):
+                return await asyncio.wait_for(call, timeout)
+        except Exception as exc:
+            if not needs_lookup(exc, ex):
+                raise
+            window = ACCEPT_WINDOW.get(ex)
+            settled = None if window is None else time.monotonic() + window
+            self._log.warning(
+                "[ORDER-UNKNOWN] acct=%s ex=%s cid=%s err=%r, looking up order",
+                account.name, ex, cid, exc
+            )
+
+            async def lookup():
+                try:
+                    with spans.span("lookup", ex):
+                        return await asyncio.wait_for(
+                            self._lookup(account, connector, cid), self._retry_policy.attempt_timeout
+                        )
+                except Exception as lookup_exc:
+                    raise OrderOutcomeUnknown(cid, lookup_exc) from exc
+
+            found = await lookup()
+            if found is None and settled is not None:
+                wait = settled - time.monotonic()
+                if wait > 0 and time.monotonic() + wait >= order.deadline:
+                    settled = None
+                elif wait > 0:
+                    # 原请求可能仍在途中：等交易所不再接受它之后再确认一次
+                    await asyncio.sleep(wait)
+                    found = await lookup()
+            if found is None:
+                if settled is None:
+                    raise OrderOutcomeUnknown(cid, exc) from exc
+                raise
+            self._log.info("[ORDER-RESOLVED] acct=%s cid=%s found after error", account.name, cid)
+            return found
+
+    async def _first_attempt(self, order: "_PendingOrder", claimed: set, retries: list) -> None:
+        try:
+            result = await self._attempt(order)
+        except Exception as exc:
+            if self._should_retry(order, exc):
+                retries.append((order, exc))
+            else:
+                await self._fail(order, exc, claimed)
+            return
+        await self._succeed(order, result, claimed)
+
+    def _should_retry(self, order: "_PendingOrder", exc: Exception) -> bool:
+        return (
+            is_retryable(exc, order.account.exchange)
+            and order.attempts < self._retry_policy.max_attempts
+            and time.monotonic() < order.deadline
+        )
+
+    async def _retry(self, order: "_PendingOrder", exc: Exception, claimed: set) -> None:
+        """Retry with jittered backoff until success, a fatal error or the budget runs out."""
+        while True:
+            delay = self._retry_policy.backoff(order.attempts)
+            if time.monotonic() + delay >= order.deadline:
+                break
+            self._log.warning(
+                "[ORDER-RETRY] acct=%s attempt=%d in %.3fs after %r",
+                order.account.name, order.attempts + 1, delay, exc
+            )
+            await asyncio.sleep(delay)
+            try:
+                result = await self._attempt(order)
+            except Exception as next_exc:
+                exc = next_exc
+                if self._should_retry(order, exc):
+                    continue
+                break
+            await self._succeed(order, result, claimed)
+            return
+        await self._fail(order, exc, claimed)
+
+    async def _succeed(self, order: "_PendingOrder", result: dict, claimed: set) -> None:
+        # 成功：先按回报乐观更新本地余额（REST 刷新延后批量执行）、标记幂等、记录结果
+        account = order.account
+        ex = account.exchange
+        latency_ms = (time.perf_counter() - order.started) * 1000
+        with spans.span("ledger", ex):
+            self._balances.apply_fill(account.name, order.side, result)
+        with spans.span("idempotency", ex):
+            await self._idem_call(self._idem.complete, order.key)
+            claimed.discard(order.key)
+        with spans.span("result", ex):
+            self._record_result(
+                account,
+                {"success": True, "data": result},
+                latency_ms=latency_ms,
+                **order.record,
+            )
+        with spans.span("log", ex):
+            self._log.info(
+                "[ORDER-OK] <- acct=%s inst=%s ex=%s attempts=%d",
+                account.name, id(self), ex, order.attempts
+            )
+
+    async def _fail(self, order: "_PendingOrder", exc: Exception, claimed: set) -> None:
+        # 失败：释放认领以便重试，提取 reason 并落地（保持原逻辑）
+        account = order.account
+        if isinstance(exc, OrderOutcomeUnknown):
+            # 结果未知：标记为 unknown，不会被自动重新认领，避免盲目重试造成重复下单
+            claimed.discard(order.key)
+            await self._idem_call(self._idem.mark_unknown, order.key)
+        else:
+            await self._release(order.key, claimed)
+        reason = str(exc)
+        if hasattr(exc, "response"):
+            try:
+                reason = exc.response.text
+            except Exception:
+                pass
+        self._record_result(
+            account,
+            {"success": False, "error": reason},
+            exchange_fault=is_exchange_fault(exc, account.exchange),
+            latency_ms=(time.perf_counter() - order.started) * 1000,
+            **order.record,
+        )
+        self._log.error(
+            "[ORDER-FAIL] <- acct=%s inst=%s ex=%s attempts=%d reason=%s",
+            account.name, id(self), account.exchange, order.attempts, reason
+        )
+
+
+@dataclass(slots=True)
+class _PendingOrder:
+    """State of one follower order across attempts."""
+
+    account: Any
+    connector_cls: Any
+    key: tuple
+    side: str
+    quote_amt: float
+    base_amt: float
+    cid: str
+    record: dict
+    started: float
+    deadline: float
+    attempts: int = 0
+    # 预暂存：首次尝试复用的连接器、签名请求，以及是否已预留令牌
+    connector: Any = None
+    prepared: Any = None
+    reserved: bool = False
+
+
+@dataclass(slots=True)
+class StagedOrder:
+    """A follower order prepared ahead of the leader fill (see ``CopyDispatcher.stage``)."""
+
+    account: str
+    exchange: str
+    side: str
+    amount: float
+    connector: Any = None
+
+
+def _order_id(data) -> str | None:
+    """Extract the exchange order id from a Binance or Bitget order response."""
+    if not isinstance(data, dict):
+        return None
+    if data.get("orderId") is not None:
+        return data["orderId"]
+    inner = data.get("data")
+    if isinstance(inner, dict):
+        return inner.get("orderId")
+    return None
+
+
+def create_copy_dispatcher() -> CopyDispatcher:
+    """Build the dispatcher configured by the environment."""
+    history = ResultHistory(spill_path=os.getenv("RESULT_HISTORY_FILE") or None)
+    shards = int(os.getenv("DISPATCH_SHARDS", "1") or 1)
+    if shards > 1:
+        # 多进程分片：follower 按哈希分配到 N 个 worker 进程
+        from .sharding import ShardedDispatcher
+
+        return ShardedDispatcher(shards, account_service, balance_service, history=history)
+    return CopyDispatcher(account_service, balance_service, open_idempotency_store(), history=history)
+
+
+_instance: CopyDispatcher | None = None
+
+
+def get_copy_dispatcher() -> CopyDispatcher:
+    """Return the process-wide dispatcher, creating it on first use."""
+    global _instance
+    if _instance is None:
+        _instance = create_copy_dispatcher()
+    return _instance
 
 
-copy_dispatcher = CopyDispatcher(account_service, balance_service, IdempotencyStore())
+def __getattr__(name: str) -> Any:
+    # ``copy_dispatcher`` 延迟创建：.sharding 导入本模块，模块体内不能反向导入它
+    if name == "copy_dispatcher":
+        return get_copy_dispatcher()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
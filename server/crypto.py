@@ -0,0 +1,140 @@
+"""Authenticated encryption for files at rest.
+
+Sealed files start with a versioned header that is authenticated together
+with the ciphertext::
+
+    b"BSENC" <u8 version=2> <u8 cipher> <16-byte salt> <12-byte nonce>
+    <ciphertext + tag>
+
+``cipher`` 1 is AES-256-GCM from the ``cryptography`` package, which is
+required whenever ``STORAGE_SECRET`` is set (see :mod:`server.storage`).
+Cipher 2 is a stdlib fallback used only when explicitly allowed: a
+SHAKE-256 keystream applied to the whole buffer in one XOR, with an
+HMAC-SHA256 tag over header and ciphertext (encrypt-then-MAC). Both run
+over whole buffers, so sealing hundreds of credentials costs microseconds.
+Files sealed with cipher 2 are re-sealed with AES-GCM on their next load
+once ``cryptography`` is installed.
+
+Keys are derived from the secret with scrypt, once per ``(secret, salt)``;
+a file keeps its salt across saves, so later saves reuse the cached key.
+
+Files without the header are the legacy format (base64 of the JSON XORed
+with ``sha256(secret)``); :func:`open_legacy` decodes them for migration.
+"""
+
+from __future__ import annotations
+
+import base64
+import functools
+import hashlib
+import hmac
+import os
+import struct
+
+try:  # Listed in requirements.txt; storage refuses to start without it
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except Exception:  # pragma: no cover - stdlib cipher only if explicitly allowed
+    AESGCM = None
+
+MAGIC = b"BSENC"
+VERSION = 2  # version 1 is the headerless XOR format
+AES_GCM = 1
+SHAKE_HMAC = 2
+SALT_SIZE = 16
+NONCE_SIZE = 12
+HMAC_SIZE = 32
+_HEADER = struct.Struct(f"<5sBB{SALT_SIZE}s{NONCE_SIZE}s")
+HEADER_SIZE = _HEADER.size
+
+# scrypt cost: ~50 ms once per process and salt
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2**14, 8, 1
+
+DEFAULT_CIPHER = AES_GCM if AESGCM is not None else SHAKE_HMAC
+
+
+class DecryptionError(ValueError):
+    """The file was tampered with, truncated or sealed with another secret."""
+
+
+@functools.lru_cache(maxsize=32)
+def derive_key(secret: bytes, salt: bytes) -> bytes:
+    """64 bytes of key material for ``secret`` and ``salt`` (cached)."""
+    return hashlib.scrypt(secret, salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=64)
+
+
+def _xor(data: bytes, stream: bytes) -> bytes:
+    # 整块异或：大整数运算在 C 中完成，避免逐字节的 Python 循环
+    n = len(data)
+    return (int.from_bytes(data, "little") ^ int.from_bytes(stream[:n], "little")).to_bytes(n, "little")
+
+
+def _shake_stream(key: bytes, nonce: bytes, size: int) -> bytes:
+    return hashlib.shake_256(key + nonce).digest(size) if size else b""
+
+
+def is_sealed(raw: bytes) -> bool:
+    return raw[: len(MAGIC)] == MAGIC
+
+
+def header_salt(raw: bytes) -> bytes | None:
+    """Salt of a sealed file, to keep it across saves."""
+    if not is_sealed(raw) or len(raw) < HEADER_SIZE:
+        return None
+    return _HEADER.unpack_from(raw)[3]
+
+
+def header_cipher(raw: bytes) -> int | None:
+    if not is_sealed(raw) or len(raw) < HEADER_SIZE:
+        return None
+    return _HEADER.unpack_from(raw)[2]
+
+
+def seal(plaintext: bytes, secret: bytes, *, salt: bytes | None = None, cipher: int = DEFAULT_CIPHER) -> bytes:
+    """Encrypt and authenticate ``plaintext`` into a sealed file body."""
+    salt = salt or os.urandom(SALT_SIZE)
+    nonce = os.urandom(NONCE_SIZE)
+    header = _HEADER.pack(MAGIC, VERSION, cipher, salt, nonce)
+    key = derive_key(secret, salt)
+    if cipher == AES_GCM:
+        if AESGCM is None:
+            raise RuntimeError("AES-GCM requires the cryptography package")
+        return header + AESGCM(key[:32]).encrypt(nonce, plaintext, header)
+    if cipher == SHAKE_HMAC:
+        body = _xor(plaintext, _shake_stream(key[:32], nonce, len(plaintext)))
+        tag = hmac.new(key[32:], header + body, hashlib.sha256).digest()
+        return header + body + tag
+    raise ValueError(f"unknown cipher {cipher}")
+
+
+def open_sealed(raw: bytes, secret: bytes) -> bytes:
+    """Verify and decrypt a sealed file body."""
+    if len(raw) < HEADER_SIZE or not is_sealed(raw):
+        raise DecryptionError("not a sealed file")
+    magic, version, cipher, salt, nonce = _HEADER.unpack_from(raw)
+    if version != VERSION:
+        raise DecryptionError(f"unsupported sealed file version {version}")
+    header, body = raw[:HEADER_SIZE], raw[HEADER_SIZE:]
+    key = derive_key(secret, salt)
+    if cipher == AES_GCM:
+        if AESGCM is None:
+            raise RuntimeError("file is AES-GCM sealed; install the cryptography package")
+        try:
+            return AESGCM(key[:32]).decrypt(nonce, body, header)
+        except Exception as exc:
+            raise DecryptionError("authentication failed") from exc
+    if cipher == SHAKE_HMAC:
+        if len(body) < HMAC_SIZE:
+            raise DecryptionError("truncated file")
+        body, tag = body[:-HMAC_SIZE], body[-HMAC_SIZE:]
+        expected = hmac.new(key[32:], header + body, hashlib.sha256).digest()
+        if not hmac.compare_digest(tag, expected):
+            raise DecryptionError("authentication failed")
+        return _xor(body, _shake_stream(key[:32], nonce, len(body)))
+    raise DecryptionError(f"unknown cipher {cipher}")
+
+
+def open_legacy(raw: bytes, secret: bytes) -> bytes:
+    """Decode the legacy base64 + XOR(sha256(secret)) format."""
+    data = base64.b64decode(raw)
+    key = hashlib.sha256(secret).digest()
+    return _xor(data, key * (len(data) // len(key) + 1))
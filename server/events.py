@@ -0,0 +1,107 @@
+"""Typed event records passed from the leader watcher to the dispatcher."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Mapping
+
+
+@dataclass(slots=True)
+class FillEvent:
+    """A filled leader market order, decoded once from the user-data stream.
+
+    Numeric fields are converted to ``float`` at construction time so the
+    dispatcher can use them directly. ``leader_pre_*`` hold the leader's
+    balances before the fill when known; otherwise the dispatcher falls back
+    to ``leader_free_*`` (the balances reported alongside the fill).
+    """
+
+    event_id: str
+    side: str
+    symbol: str | None = None
+    base_filled: float = 0.0
+    quote_filled: float = 0.0
+    leader_free_usdt: float = 0.0
+    leader_free_btc: float = 0.0
+    leader_pre_usdt: float = 0.0
+    leader_pre_btc: float = 0.0
+    order: Dict[str, Any] = field(default_factory=dict, compare=False, repr=False)
+    type: str = "order_fill"
+
+    @property
+    def balances(self) -> Dict[str, float]:
+        """Leader free balances reported with the fill."""
+        return {"USDT": self.leader_free_usdt, "BTC": self.leader_free_btc}
+
+    @property
+    def ref_usdt(self) -> float:
+        """Leader USDT balance used as the denominator for BUY ratios."""
+        return self.leader_pre_usdt or self.leader_free_usdt
+
+    @property
+    def ref_btc(self) -> float:
+        """Leader BTC balance used as the denominator for SELL ratios."""
+        return self.leader_pre_btc or self.leader_free_btc
+
+    @property
+    def price(self) -> float:
+        """Leader's average fill price (quote per base), ``0.0`` when unknown."""
+        return self.quote_filled / self.base_filled if self.base_filled else 0.0
+
+    @classmethod
+    def from_execution_report(
+        cls,
+        report: Mapping[str, Any],
+        *,
+        free_usdt: float,
+        free_btc: float,
+    ) -> "FillEvent":
+        """Build an event from a Binance ``executionReport`` frame."""
+        # 幂等事件ID：订单ID + 事件时间 + 累计成交额（位置参数构造，热路径）
+        get = report.get
+        return cls(
+            f"{get('i')}-{get('E')}-{get('Z')}",
+            get("S"),
+            get("s"),
+            float(get("z", 0.0)),
+            float(get("Z", 0.0)),
+            free_usdt,
+            free_btc,
+            0.0,
+            0.0,
+            report,  # type: ignore[arg-type]
+        )
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "FillEvent":
+        """Build an event from the legacy dict representation."""
+        return cls(
+            event_id=data.get("event_id"),
+            side=data.get("side"),
+            symbol=data.get("symbol"),
+            base_filled=float(data.get("base_filled", 0.0)),
+            quote_filled=float(data.get("quote_filled", 0.0)),
+            leader_free_usdt=float(data.get("leader_free_usdt") or 0.0),
+            leader_free_btc=float(data.get("leader_free_btc") or 0.0),
+            leader_pre_usdt=float(data.get("leader_pre_usdt") or 0.0),
+            leader_pre_btc=float(data.get("leader_pre_btc") or 0.0),
+            order=data.get("order") or {},
+            type=data.get("type", "order_fill"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the legacy dict representation (for logging/serialization)."""
+        return {
+            "type": self.type,
+            "event_id": self.event_id,
+            "side": self.side,
+            "symbol": self.symbol,
+            "base_filled": self.base_filled,
+            "quote_filled": self.quote_filled,
+            "leader_free_usdt": self.leader_free_usdt,
+            "leader_free_btc": self.leader_free_btc,
+            "leader_pre_usdt": self.leader_pre_usdt,
+            "leader_pre_btc": self.leader_pre_btc,
+            "balances": self.balances,
+            "order": self.order,
+        }
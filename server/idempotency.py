@@ -1,10 +1,65 @@
-"""Idempotency utilities for safe order replication."""
+"""Idempotency utilities for safe order replication.
+
+Dispatch follows a claim-before-submit protocol for every
+``(event_id, account_name)`` key::
+
+    claim(key)        -> True only for the one caller allowed to submit
+    complete(key)     after the order was accepted (state ``done``)
+    release(key)      after a failure or skip (state ``failed``, claimable again)
+    mark_unknown(key) when the order may exist but could not be confirmed
+                      (state ``unknown``, never claimed again until resolved)
+
+:class:`IdempotencyStore` keeps claims in memory and persists completed keys
+to a JSON file (atomically and off the event loop via :mod:`server.persist`,
+without the debounce the other stores use); it is safe within one process.
+:class:`SQLiteIdempotencyStore` keeps all states in a SQLite file shared by
+several processes, so claims are atomic across workers.
+"""
 
 from __future__ import annotations
 
 import json
+import logging
 import os
-from typing import Set, Tuple
+import socket
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Set, Tuple
+
+from . import persist
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, str]
+
+INFLIGHT = "inflight"
+DONE = "done"
+FAILED = "failed"
+UNKNOWN = "unknown"
+
+
+def _owner_alive(owner: str | None) -> bool:
+    """Whether the process behind a claim owner id may still be running.
+
+    Owner ids are ``host:pid:nonce`` (a bare pid in older databases). Only a
+    process on this host can be checked; others are presumed alive.
+    """
+    if not owner:
+        return False
+    parts = owner.split(":")
+    host, pid = (socket.gethostname(), parts[0]) if len(parts) == 1 else (parts[0], parts[1])
+    # Windows 上 os.kill 会结束目标进程，无法用来探测
+    if host != socket.gethostname() or not pid.isdigit() or os.name == "nt":
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
 
 
 class IdempotencyStore:
@@ -12,37 +67,286 @@ class IdempotencyStore:
 
     The store persists processed keys to a JSON file so that restarts do not
     result in duplicate orders being submitted. Each key is a tuple of
-    ``(event_id, account_name)``.
+    ``(event_id, account_name)``. Inside an event loop a completion is
+    written at once in a worker thread, so the "done" mark reaches disk right
+    after the order; completions made during that write are coalesced into
+    the next one. A ``save_delay`` above zero debounces saves instead.
     """
 
-    def __init__(self, path: str = "idempotency.json") -> None:
+    def __init__(self, path: str = "idempotency.json", *, save_delay: float = 0.0) -> None:
         self._path = path
-        self._processed: Set[Tuple[str, str]] = set()
+        self._processed: Set[Key] = set()
+        self._inflight: Set[Key] = set()
+        # 结果未知的 key 只保存在内存中，重启后需人工核对
+        self._unknown: Set[Key] = set()
+        self._writer = persist.writer_for(path, save_delay)
         self._load()
 
+    @property
+    def path(self) -> str:
+        return self._path
+
     def _load(self) -> None:
-        if not os.path.exists(self._path):
+        raw = persist.read_bytes(self._path)
+        if raw is None:
             return
         try:
-            with open(self._path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = json.loads(raw.decode("utf-8"))
             for item in data:
                 if isinstance(item, list) and len(item) == 2:
                     self._processed.add((item[0], item[1]))
         except Exception:
-            # Corrupt files are ignored; start with empty store
+            # Corrupt files start an empty store; keep the file for inspection
             self._processed = set()
+            backup = f"{self._path}.corrupt-{int(time.time())}"
+            logger.error("idempotency store %s is corrupt, moved to %s", self._path, backup)
+            try:
+                os.replace(self._path, backup)
+            except OSError:
+                pass
+
+    def _render(self) -> bytes:
+        return json.dumps([list(k) for k in self._processed]).encode("utf-8")
 
     def _save(self) -> None:
         try:
-            with open(self._path, "w", encoding="utf-8") as f:
-                json.dump([list(k) for k in self._processed], f)
+            self._writer.submit(self._render)
         except Exception:
-            pass
+            logger.exception("saving idempotency store %s failed", self._path)
+
+    def flush(self) -> None:
+        """Write a pending save now."""
+        self._writer.flush()
 
-    def is_processed(self, key: Tuple[str, str]) -> bool:
+    def is_processed(self, key: Key) -> bool:
         return key in self._processed
 
-    def mark_processed(self, key: Tuple[str, str]) -> None:
+    def mark_processed(self, key: Key) -> None:
+        self._inflight.discard(key)
         self._processed.add(key)
         self._save()
+
+    def mark_many(self, keys: Iterable[Key]) -> None:
+        """Mark several keys processed with a single save."""
+        self._processed.update(keys)
+        self._save()
+
+    def processed_keys(self) -> Set[Key]:
+        return set(self._processed)
+
+    def claim(self, key: Key) -> bool:
+        """Reserve ``key`` for submission; ``False`` if done or already in flight."""
+        if key in self._processed or key in self._inflight or key in self._unknown:
+            return False
+        self._inflight.add(key)
+        return True
+
+    def claim_many(self, keys: Iterable[Key]) -> List[bool]:
+        """Claim several keys; ``True`` for each key won."""
+        return [self.claim(key) for key in keys]
+
+    def complete(self, key: Key) -> None:
+        """Mark a claimed key done."""
+        self.mark_processed(key)
+
+    def release(self, key: Key) -> None:
+        """Drop a claim after a failure so the key can be claimed again."""
+        self._inflight.discard(key)
+
+    def release_many(self, keys: Iterable[Key]) -> None:
+        self._inflight.difference_update(keys)
+
+    def mark_unknown(self, key: Key) -> None:
+        """Park a claimed key whose order outcome is unknown (kept in memory only)."""
+        self._inflight.discard(key)
+        if key not in self._processed:
+            self._unknown.add(key)
+
+    def unknown_keys(self) -> Set[Key]:
+        return set(self._unknown)
+
+    def resolve(self, key: Key, placed: bool) -> None:
+        """Settle an unknown key once the order was looked up: done or claimable."""
+        if key in self._unknown:
+            self._unknown.discard(key)
+            if placed:
+                self.mark_processed(key)
+
+    def state(self, key: Key) -> str | None:
+        if key in self._processed:
+            return DONE
+        if key in self._inflight:
+            return INFLIGHT
+        if key in self._unknown:
+            return UNKNOWN
+        return None
+
+
+class SQLiteIdempotencyStore:
+    """Idempotency states in a SQLite file shared across processes.
+
+    ``claim`` runs in one ``BEGIN IMMEDIATE`` transaction, so exactly one
+    process wins a key. A claim left ``inflight`` is only taken over once
+    its owner process is gone (see :func:`_owner_alive`); a slow owner keeps
+    its claims however long it takes. Keys parked with :meth:`mark_unknown`
+    are never taken over: they stay ``unknown`` until :meth:`resolve` is
+    called after the order was looked up. When the database is created,
+    keys from an existing JSON store at ``import_json`` are imported as
+    ``done``.
+
+    Calls may wait up to 10 s for the database lock while other processes
+    write, so the dispatcher runs them on :attr:`executor` (one thread per
+    store, which also serializes use of the connection) instead of the
+    event loop, and claims all followers of a fill in one transaction.
+    """
+
+    def __init__(
+        self,
+        path: str = "idempotency.db",
+        *,
+        owner: str | None = None,
+        import_json: str | None = "idempotency.json",
+    ) -> None:
+        self._path = path
+        self._owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="idempotency")
+        self._conn = sqlite3.connect(path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        created = self._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='idempotency'"
+        ).fetchone() is None
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency ("
+            "event_id TEXT NOT NULL, account TEXT NOT NULL, state TEXT NOT NULL, "
+            "owner TEXT, updated_at REAL NOT NULL, PRIMARY KEY (event_id, account))"
+        )
+        if created and import_json and os.path.exists(import_json):
+            self.mark_many(IdempotencyStore(import_json).processed_keys())
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+        self._conn.close()
+
+    def claim(self, key: Key) -> bool:
+        return self.claim_many([key])[0]
+
+    def claim_many(self, keys: Iterable[Key]) -> List[bool]:
+        """Claim several keys in one transaction; ``True`` for each key won."""
+        conn = self._conn
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            won = [self._claim(key, now) for key in keys]
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return won
+
+    def _claim(self, key: Key, now: float) -> bool:
+        event_id, account = str(key[0]), key[1]
+        cur = self._conn.execute(
+            "INSERT INTO idempotency (event_id, account, state, owner, updated_at) "
+            "VALUES (?, ?, 'inflight', ?, ?) "
+            "ON CONFLICT (event_id, account) DO UPDATE SET "
+            "state = 'inflight', owner = excluded.owner, updated_at = excluded.updated_at "
+            "WHERE idempotency.state = 'failed'",
+            (event_id, account, self._owner, now),
+        )
+        if cur.rowcount == 1:
+            return True
+        row = self._conn.execute(
+            "SELECT state, owner FROM idempotency WHERE event_id = ? AND account = ?",
+            (event_id, account),
+        ).fetchone()
+        if row is None or row[0] != INFLIGHT or row[1] == self._owner or _owner_alive(row[1]):
+            return False
+        # 认领者进程已退出：接管（仍在同一事务内，其它进程无法同时接管）
+        logger.warning("taking over claim %s from dead owner %s", key, row[1])
+        self._conn.execute(
+            "UPDATE idempotency SET owner = ?, updated_at = ? "
+            "WHERE event_id = ? AND account = ? AND state = 'inflight'",
+            (self._owner, now, event_id, account),
+        )
+        return True
+
+    def _set(self, key: Key, state: str, allowed: str) -> None:
+        self._conn.execute(
+            "UPDATE idempotency SET state = ?, updated_at = ? "
+            f"WHERE event_id = ? AND account = ? AND state IN ({allowed})",
+            (state, time.time(), str(key[0]), key[1]),
+        )
+
+    def complete(self, key: Key) -> None:
+        self._set(key, DONE, "'inflight', 'failed', 'unknown'")
+
+    def release(self, key: Key) -> None:
+        self._set(key, FAILED, "'inflight'")
+
+    def release_many(self, keys: Iterable[Key]) -> None:
+        now = time.time()
+        self._conn.executemany(
+            "UPDATE idempotency SET state = 'failed', updated_at = ? "
+            "WHERE event_id = ? AND account = ? AND state = 'inflight'",
+            [(now, str(k[0]), k[1]) for k in keys],
+        )
+
+    def mark_unknown(self, key: Key) -> None:
+        """Park ``key``: its order may exist, so it is never claimed again automatically."""
+        self._set(key, UNKNOWN, "'inflight'")
+
+    def unknown_keys(self) -> Set[Key]:
+        return {
+            (row[0], row[1])
+            for row in self._conn.execute(
+                "SELECT event_id, account FROM idempotency WHERE state = 'unknown'"
+            )
+        }
+
+    def resolve(self, key: Key, placed: bool) -> None:
+        """Settle an unknown key once the order was looked up: done or claimable."""
+        self._set(key, DONE if placed else FAILED, "'unknown'")
+
+    def state(self, key: Key) -> str | None:
+        row = self._conn.execute(
+            "SELECT state FROM idempotency WHERE event_id = ? AND account = ?",
+            (str(key[0]), key[1]),
+        ).fetchone()
+        return row[0] if row else None
+
+    def is_processed(self, key: Key) -> bool:
+        return self.state(key) == DONE
+
+    def mark_processed(self, key: Key) -> None:
+        self.mark_many([key])
+
+    def mark_many(self, keys: Iterable[Key]) -> None:
+        now = time.time()
+        self._conn.executemany(
+            "INSERT INTO idempotency (event_id, account, state, owner, updated_at) "
+            "VALUES (?, ?, 'done', ?, ?) "
+            "ON CONFLICT (event_id, account) DO UPDATE SET state = 'done', updated_at = excluded.updated_at",
+            [(str(k[0]), k[1], self._owner, now) for k in keys],
+        )
+
+    def processed_keys(self) -> Set[Key]:
+        return {
+            (row[0], row[1])
+            for row in self._conn.execute(
+                "SELECT event_id, account FROM idempotency WHERE state = 'done'"
+            )
+        }
+
+
+def open_idempotency_store(default_path: str = "idempotency.json"):
+    """Return the shared SQLite store when ``IDEMPOTENCY_DB`` is set, else a JSON store."""
+    db = os.getenv("IDEMPOTENCY_DB")
+    if db:
+        return SQLiteIdempotencyStore(db)
+    return IdempotencyStore(default_path)
@@ -0,0 +1,154 @@
+"""Append-only, memory-mapped journal of leader frames and fill events.
+
+The file starts with an 8-byte magic header followed by records::
+
+    <u32 payload length> <f64 unix timestamp> <u8 kind> <payload JSON>
+
+A zero length marks the end of written data; the file is grown in
+``chunk_size`` steps and the unused tail stays zero-filled. Writes go
+straight into the mapped pages, so records survive a process crash without
+an explicit ``fsync`` per event.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator
+
+from .json_codec import dumps_bytes, loads
+
+MAGIC = b"BSJRNL1\n"
+_HEADER = struct.Struct("<IdB")
+
+KIND_FRAME = 1
+KIND_FILL = 2
+
+
+@dataclass(slots=True)
+class JournalEntry:
+    """One journal record."""
+
+    ts: float
+    kind: int
+    payload: Dict[str, Any]
+
+
+class EventJournal:
+    """Memory-mapped append-only journal.
+
+    Re-opening an existing journal continues after its last record.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 1 << 20) -> None:
+        self._path = path
+        self._chunk = chunk_size
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = os.fstat(self._fd).st_size
+        if size < len(MAGIC) + self._chunk:
+            size = len(MAGIC) + self._chunk
+            os.ftruncate(self._fd, size)
+        self._mm = mmap.mmap(self._fd, size)
+        if exists:
+            if self._mm[: len(MAGIC)] != MAGIC:
+                self.close()
+                raise ValueError(f"{path} is not an event journal")
+            self._offset = _scan_end(self._mm)
+        else:
+            self._mm[: len(MAGIC)] = MAGIC
+            self._offset = len(MAGIC)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def append(self, kind: int, payload: Dict[str, Any], ts: float | None = None) -> None:
+        """Append ``payload`` as a record of ``kind``."""
+        body = dumps_bytes(payload)
+        need = self._offset + _HEADER.size + len(body) + _HEADER.size
+        if need > len(self._mm):
+            self._grow(need)
+        start = self._offset + _HEADER.size
+        end = start + len(body)
+        # Payload and end marker first, header last: a crash mid-write leaves
+        # a zero length where this record would start.
+        self._mm[start:end] = body
+        self._mm[end : end + _HEADER.size] = bytes(_HEADER.size)
+        _HEADER.pack_into(
+            self._mm, self._offset, len(body), time.time() if ts is None else ts, kind
+        )
+        self._offset = end
+
+    def record_frame(self, frame: Dict[str, Any], ts: float | None = None) -> None:
+        """Record a raw user-data stream frame."""
+        self.append(KIND_FRAME, frame, ts)
+
+    def record_fill(self, event: Any, ts: float | None = None) -> None:
+        """Record a derived :class:`~server.events.FillEvent` (without its raw order)."""
+        data = event.to_dict()
+        data.pop("order", None)
+        data.pop("balances", None)
+        self.append(KIND_FILL, data, ts)
+
+    def _grow(self, need: int) -> None:
+        size = len(self._mm)
+        while size < need:
+            size += self._chunk
+        self._mm.flush()
+        self._mm.close()
+        os.ftruncate(self._fd, size)
+        self._mm = mmap.mmap(self._fd, size)
+
+    def flush(self) -> None:
+        """Flush mapped pages to disk."""
+        self._mm.flush()
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm.close()
+            self._mm = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "EventJournal":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def _iter_records(buf: Any) -> Iterator[tuple[int, float, int, int, int]]:
+    """Yield ``(offset, ts, kind, start, end)`` for each complete record."""
+    offset = len(MAGIC)
+    limit = len(buf)
+    while offset + _HEADER.size <= limit:
+        length, ts, kind = _HEADER.unpack_from(buf, offset)
+        start = offset + _HEADER.size
+        if length == 0 or start + length > limit:
+            return
+        yield offset, ts, kind, start, start + length
+        offset = start + length
+
+
+def _scan_end(buf: Any) -> int:
+    end = len(MAGIC)
+    for _, _, _, _, stop in _iter_records(buf):
+        end = stop
+    return end
+
+
+def read_journal(path: str, kind: int | None = None) -> Iterator[JournalEntry]:
+    """Iterate journal records in write order, optionally only of ``kind``."""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not an event journal")
+            for _, ts, k, start, end in _iter_records(mm):
+                if kind is None or k == kind:
+                    yield JournalEntry(ts, k, loads(mm[start:end]))
@@ -0,0 +1,76 @@
+"""JSON encoding helpers with optional fast backends.
+
+``orjson`` is preferred when installed, then ``msgspec``; the standard
+library :mod:`json` module is used as a fallback so the service keeps working
+without either package. All helpers accept ``bytes`` or ``str`` input.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:  # Optional dependency
+    import orjson
+except Exception:  # pragma: no cover - degraded to stdlib
+    orjson = None
+
+try:  # Optional dependency
+    import msgspec
+except Exception:  # pragma: no cover - degraded to stdlib
+    msgspec = None
+
+
+if orjson is not None:
+    BACKEND = "orjson"
+
+    def loads(data: bytes | bytearray | memoryview | str) -> Any:
+        """Decode a JSON document."""
+        return orjson.loads(data)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        """Encode ``obj`` as compact UTF-8 JSON."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+elif msgspec is not None:  # pragma: no cover - depends on installed packages
+    BACKEND = "msgspec"
+    _decoder = msgspec.json.Decoder()
+    _encoder = msgspec.json.Encoder()
+
+    def loads(data: bytes | bytearray | memoryview | str) -> Any:
+        """Decode a JSON document."""
+        return _decoder.decode(data)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        """Encode ``obj`` as compact UTF-8 JSON."""
+        return _encoder.encode(obj)
+
+else:  # pragma: no cover - depends on installed packages
+    BACKEND = "json"
+
+    def loads(data: bytes | bytearray | memoryview | str) -> Any:
+        """Decode a JSON document."""
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        """Encode ``obj`` as compact UTF-8 JSON."""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(obj: Any) -> str:
+    """Encode ``obj`` as a compact JSON string."""
+    return dumps_bytes(obj).decode("utf-8")
+
+
+def response_json(resp: Any) -> Any:
+    """Decode the body of an HTTP response with the fast backend.
+
+    Falls back to ``resp.json()`` for response-like objects that do not
+    expose raw ``content`` bytes (e.g. test doubles).
+    """
+    content = getattr(resp, "content", None)
+    if isinstance(content, (bytes, bytearray)):
+        return loads(content)
+    return resp.json()
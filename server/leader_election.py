@@ -0,0 +1,237 @@
+"""Leader election between server processes sharing a host.
+
+Each process runs a :class:`LeaderElector` against the same SQLite lease
+file. The process holding the lease owns the leader watcher (and therefore
+dispatch and the idempotency store); the others only serve the API. The
+holder renews the lease every ``renew_interval`` seconds. If it exits
+cleanly it releases the lease and a standby takes over on its next poll;
+if it dies the lease expires after ``ttl`` seconds.
+
+Every change of owner bumps the lease ``epoch``, which acts as a fencing
+token in logs and in the election status endpoint.
+
+The lease file also holds settings shared by all processes (the copy
+on/off switch), since a request may land on any of them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+Callback = Callable[[], Awaitable[None]]
+
+
+@dataclass
+class LeaseState:
+    """Lease row as seen by the last acquire attempt."""
+
+    owner: str | None = None
+    epoch: int = 0
+    expires_at: float = 0.0
+
+
+class SQLiteLease:
+    """A named lease stored as a single SQLite row.
+
+    ``BEGIN IMMEDIATE`` serializes acquire attempts across processes, so the
+    check-and-take is atomic without any OS specific file locking.
+    """
+
+    def __init__(self, path: str, name: str = "leader", owner: str | None = None) -> None:
+        self.path = path
+        self.name = name
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS lease ("
+                "name TEXT PRIMARY KEY, owner TEXT, epoch INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS setting (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+
+    def try_acquire(self, ttl: float, now: float | None = None) -> tuple[bool, LeaseState]:
+        """Take or renew the lease; return ``(held, state)``."""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT owner, epoch, expires_at FROM lease WHERE name = ?", (self.name,)
+            ).fetchone()
+            if row is None:
+                state = LeaseState(self.owner, 1, now + ttl)
+                conn.execute(
+                    "INSERT INTO lease (name, owner, epoch, expires_at) VALUES (?, ?, ?, ?)",
+                    (self.name, state.owner, state.epoch, state.expires_at),
+                )
+            elif row[0] == self.owner or row[0] is None or row[2] <= now:
+                epoch = row[1] if row[0] == self.owner else row[1] + 1
+                state = LeaseState(self.owner, epoch, now + ttl)
+                conn.execute(
+                    "UPDATE lease SET owner = ?, epoch = ?, expires_at = ? WHERE name = ?",
+                    (state.owner, state.epoch, state.expires_at, self.name),
+                )
+            else:
+                conn.execute("COMMIT")
+                return False, LeaseState(row[0], row[1], row[2])
+            conn.execute("COMMIT")
+            return True, state
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def get_setting(self, name: str) -> str | None:
+        """Read a setting shared by every process using this lease file."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM setting WHERE name = ?", (name,)).fetchone()
+        finally:
+            conn.close()
+        return None if row is None else row[0]
+
+    def set_setting(self, name: str, value: str) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO setting (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                (name, value),
+            )
+        finally:
+            conn.close()
+
+    def release(self) -> None:
+        """Give up the lease if held so a standby can take over immediately."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE lease SET owner = NULL, expires_at = 0 WHERE name = ? AND owner = ?",
+                (self.name, self.owner),
+            )
+        finally:
+            conn.close()
+
+
+class LeaderElector:
+    """Keep trying to hold a :class:`SQLiteLease` and report transitions.
+
+    ``on_elected`` and ``on_demoted`` are awaited when leadership is gained
+    or lost; ``on_renew`` is awaited after every successful renewal.
+    Leadership is considered lost locally once ``ttl - renew_interval`` has
+    passed since the last successful renewal, before any other process can
+    take over.
+    """
+
+    def __init__(
+        self,
+        lease: SQLiteLease,
+        *,
+        ttl: float = 5.0,
+        renew_interval: float = 1.0,
+        on_elected: Optional[Callback] = None,
+        on_demoted: Optional[Callback] = None,
+        on_renew: Optional[Callback] = None,
+    ) -> None:
+        if renew_interval >= ttl:
+            raise ValueError("renew_interval must be shorter than ttl")
+        self._lease = lease
+        self._ttl = ttl
+        self._renew = renew_interval
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._on_renew = on_renew
+        self._leader = False
+        self._valid_until = 0.0
+        self._state = LeaseState()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader and time.monotonic() < self._valid_until
+
+    @property
+    def owner(self) -> str:
+        return self._lease.owner
+
+    @property
+    def lease(self) -> SQLiteLease:
+        return self._lease
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "is_leader": self.is_leader,
+            "owner": self._lease.owner,
+            "holder": self._state.owner,
+            "epoch": self._state.epoch,
+            "expires_in": round(max(0.0, self._state.expires_at - time.time()), 3),
+        }
+
+    async def step(self) -> bool:
+        """Run one acquire/renew attempt and fire transition callbacks."""
+        started = time.monotonic()
+        try:
+            held, self._state = await asyncio.to_thread(self._lease.try_acquire, self._ttl)
+        except Exception:
+            logger.exception("[ELECTION] lease check failed")
+            held = self._leader and time.monotonic() < self._valid_until
+        else:
+            if held:
+                self._valid_until = started + self._ttl - self._renew
+
+        if held and not self._leader:
+            self._leader = True
+            logger.info("[ELECTION] elected leader owner=%s epoch=%d", self.owner, self._state.epoch)
+            if self._on_elected is not None:
+                await self._on_elected()
+        elif not held and self._leader:
+            await self._demote()
+        elif held and self._on_renew is not None:
+            await self._on_renew()
+        return held
+
+    async def _demote(self) -> None:
+        self._leader = False
+        logger.warning("[ELECTION] lost leadership owner=%s", self.owner)
+        if self._on_demoted is not None:
+            await self._on_demoted()
+
+    async def _run(self) -> None:
+        while True:
+            await self.step()
+            await asyncio.sleep(self._renew)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop campaigning, step down and release the lease."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._leader:
+            await self._demote()
+        try:
+            await asyncio.to_thread(self._lease.release)
+        except Exception:
+            logger.exception("[ELECTION] failed to release lease")
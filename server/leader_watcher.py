@@ -6,19 +6,82 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from typing import AsyncIterator, Dict
+from typing import AsyncIterator, Callable, Dict
 
 from .connectors.binance_sdk_connector import BinanceSDKConnector
+from .events import FillEvent
+from .journal import EventJournal
+from .prestage import PreStager
 
 logger = logging.getLogger(__name__)
 
+# Frames buffered between the websocket consumer and the event generator
+QUEUE_SIZE = 1024
+
+# Connector of the running watcher, for :func:`stream_status`
+_active: BinanceSDKConnector | None = None
+
+
+def stream_status() -> Dict | None:
+    """Liveness and connection metrics of the running leader stream."""
+    connector = _active
+    return getattr(connector, "stream_status", None) if connector is not None else None
+
+
+class FillTracker:
+    """Turn user-data stream frames into :class:`FillEvent` records.
+
+    A FILLED market ``executionReport`` is held until the following
+    ``outboundAccountPosition`` frame, whose balances are attached to the
+    emitted event. The tracker is deterministic, so journal replays produce
+    the same events as the live stream.
+    """
+
+    __slots__ = ("free_usdt", "free_btc", "_pending_fill")
+
+    def __init__(self, free_usdt: float = 0.0, free_btc: float = 0.0) -> None:
+        self.free_usdt = free_usdt
+        self.free_btc = free_btc
+        self._pending_fill: Dict | None = None
+
+    def feed(self, payload: Dict) -> FillEvent | None:
+        """Process one frame and return a fill event when one completes."""
+        etype = payload.get("e")
+
+        if etype == "outboundAccountPosition":
+            for b in payload.get("B", ()):
+                asset = b.get("a")
+                if asset == "USDT":
+                    self.free_usdt = float(b["f"])
+                elif asset == "BTC":
+                    self.free_btc = float(b["f"])
+            fill = self._pending_fill
+            if fill:
+                self._pending_fill = None
+                return FillEvent.from_execution_report(
+                    fill, free_usdt=self.free_usdt, free_btc=self.free_btc
+                )
+            return None
+
+        if etype != "executionReport":
+            return None
+        if payload.get("X") != "FILLED" or payload.get("o") != "MARKET":
+            return None
+
+        self._pending_fill = payload
+        return None
+
 
 async def watch_leader_orders(
     api_key: str,
     api_secret: str,
     *,
     testnet: bool = False,
-) -> AsyncIterator[dict]:
+    journal: EventJournal | None = None,
+    ws_url: str | None = None,
+    on_activity: Callable[[str], None] | None = None,
+    stager: PreStager | None = None,
+) -> AsyncIterator[FillEvent]:
     logger.info(f"👀 Entered watch_leader_orders with testnet={testnet}")
     """Yield leader account trade events from Binance user data stream.
 
@@ -26,61 +89,59 @@ async def watch_leader_orders(
     and websocket connection manually through HTTP requests and the
     ``websockets`` library rather than relying on the SDK's ``AsyncClient``.
     This coroutine bridges the connector's callback-based stream into an async
-    iterator.
+    iterator. When ``journal`` is given every raw frame and derived fill event
+    is recorded to it. ``ws_url`` overrides the user-data stream endpoint,
+    e.g. with a :mod:`server.ws_capture` playback server. ``on_activity`` is
+    called with ``"leader_reconnect"`` whenever the stream (re)connects and
+    with ``"leader_new"`` for every NEW ``executionReport``, ahead of the
+    fill, so followers can warm their connections. With a ``stager`` every
+    frame is also fed to :class:`~server.prestage.PreStager`, and fills it
+    has already dispatched are journaled but not yielded.
     """
 
     logger.info("Starting leader order watcher: testnet=%s", testnet)
 
-    queue: asyncio.Queue[Dict] = asyncio.Queue()
+    # 有界队列：消费落后时 supervisor 暂停读取 websocket，而不是无限堆积
+    queue: asyncio.Queue[Dict] = asyncio.Queue(maxsize=QUEUE_SIZE)
 
+    global _active
     async with BinanceSDKConnector(api_key, api_secret, testnet=testnet) as connector:
-        # The connector handles listen-key refresh and websocket management
-        # itself via HTTP and ``websockets``.
-        # Push websocket messages into an asyncio queue for processing.
-        def _handle_message(msg: Dict) -> None:  # pragma: no cover - simple callback
-            queue.put_nowait(msg)
-
-        await connector.start_user_socket(_handle_message)
+        # The connector's stream supervisor handles listen-key refresh and
+        # websocket management via HTTP and ``websockets`` and awaits this
+        # consumer for every frame.
+        async def _handle_message(msg: Dict) -> None:
+            if journal is not None:
+                journal.record_frame(msg)
+            if on_activity is not None and msg.get("e") == "executionReport" and msg.get("X") == "NEW":
+                on_activity("leader_new")
+            await queue.put(msg)
+
+        socket_kwargs: Dict = {}
+        if ws_url is not None:
+            socket_kwargs["ws_url"] = ws_url
+        if on_activity is not None:
+            socket_kwargs["on_connect"] = lambda: on_activity("leader_reconnect")
+        await connector.start_user_socket(_handle_message, **socket_kwargs)
+        _active = connector
 
         # Seed balances so the first trade has meaningful ratios.
         balances = await connector.get_balance()
-        free_usdt = float(balances.get("USDT", 0.0))
-        free_btc = float(balances.get("BTC", 0.0))
-
-        pending_fill: Dict | None = None
-
-        while True:
-            payload = await queue.get()
-            etype = payload.get("e")
-
-            if etype == "outboundAccountPosition":
-                balances = {b["a"]: float(b["f"]) for b in payload.get("B", [])}
-                free_usdt = balances.get("USDT", free_usdt)
-                free_btc = balances.get("BTC", free_btc)
-                if pending_fill:
-                    fill = pending_fill
-                    # === 新增：稳妥的幂等事件ID（订单ID + 事件时间 + 累计成交额）===
-                    event_id = f"{fill.get('i')}-{fill.get('E')}-{fill.get('Z')}"
-                    yield {
-                        "type": "order_fill",
-                        "order": fill,  # the original pending_fill executionReport
-                        "balances": {"USDT": free_usdt, "BTC": free_btc},
-                         # 新增几个关键字段，供 copy_dispatcher 使用：
-                        "side": fill.get("S"),
-                        "base_filled": float(fill.get("z", 0.0)),
-                        "quote_filled": float(fill.get("Z", 0.0)),
-                        "leader_free_usdt": free_usdt,
-                        "leader_free_btc": free_btc,
-                        # === 新增：幂等键 + 交易对 ===
-                        "event_id": event_id,
-                        "symbol": fill.get("s"),
-                    }
-                    pending_fill = None
-                continue
-
-            if etype != "executionReport":
-                continue
-            if payload.get("X") != "FILLED" or payload.get("o") != "MARKET":
-                continue
-
-            pending_fill = payload
+        tracker = FillTracker(
+            float(balances.get("USDT", 0.0)), float(balances.get("BTC", 0.0))
+        )
+
+        try:
+            while True:
+                frame = await queue.get()
+                if stager is not None:
+                    stager.observe(frame, tracker.free_usdt, tracker.free_btc)
+                event = tracker.feed(frame)
+                if event is not None:
+                    if journal is not None:
+                        journal.record_fill(event)
+                    if stager is not None and stager.consume(event.event_id):
+                        continue
+                    yield event
+        finally:
+            if _active is connector:
+                _active = None
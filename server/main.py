@@ -71,72 +71,102 @@ _setup_app_logging()
 # -----------------------------------------------------------------------------
 # Import routers AFTER logging is configured so their module loggers are wired.
 # -----------------------------------------------------------------------------
-from .api import public_router, protected_router, verify_token  # noqa: E402
-
-# -----------------------------------------------------------------------------
-# FastAPI app
-# -----------------------------------------------------------------------------
-app = FastAPI(
-    title="BitSyS Copy Trading API",
-    version="3.0.0",
-    docs_url="/docs",
-    redoc_url="/redoc",
+from .api import (  # noqa: E402
+    protected_router,
+    public_router,
+    start_leader_election,
+    stop_leader_election,
+    verify_token,
 )
-
-# CORS (adjust origins as you need)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],          # or specify front-end origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Routers
-app.include_router(public_router, prefix="/api")
-app.include_router(protected_router, prefix="/api", dependencies=[Depends(verify_token)])
+from .connectors.binance_ws_api import ws_api_sessions  # noqa: E402
+from .connectors.http import close_shared_transports  # noqa: E402
+from .copy_dispatcher import copy_dispatcher  # noqa: E402
+from . import persist  # noqa: E402
+from .responses import FastJSONResponse  # noqa: E402
 
 # -----------------------------------------------------------------------------
-# Root & health
-# -----------------------------------------------------------------------------
-@app.get("/", include_in_schema=False)
-async def root() -> RedirectResponse:
-    # Quick jump to Swagger UI
-    return RedirectResponse(url="/docs")
-
-@app.get("/health", include_in_schema=False)
-async def health() -> dict[str, str]:
-    return {"status": "ok"}
-
-# -----------------------------------------------------------------------------
-# Exception handlers (make errors easy to see while debugging)
-# -----------------------------------------------------------------------------
-@app.exception_handler(HTTPException)
-async def http_exception_handler(_: Request, exc: HTTPException) -> JSONResponse:
-    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
-
-@app.exception_handler(Exception)
-async def unhandled_exception_handler(_: Request, exc: Exception) -> JSONResponse:
-    logging.getLogger("server").exception("Unhandled exception")
-    return JSONResponse(status_code=500, content={"detail": str(exc)})
-
-# -----------------------------------------------------------------------------
-# Lifespan logs (optional)
+# FastAPI app
 # -----------------------------------------------------------------------------
-@app.on_event("startup")
-async def on_startup() -> None:
-    logging.getLogger("server").info("🚀 Application startup complete")
-    await balance_service.start()  # 启动并立即拉取一次余额，然后进入轮询
-
-@app.on_event("shutdown")
-async def on_shutdown() -> None:
-    logging.getLogger("server").info("🛑 Application shutdown")
-    _quiet_lib_logs()
-    await balance_service.start()
+def create_app() -> FastAPI:
+    """Build the FastAPI application with routers, handlers and lifespan hooks."""
+    app = FastAPI(
+        title="BitSyS Copy Trading API",
+        version="3.0.0",
+        docs_url="/docs",
+        redoc_url="/redoc",
+        default_response_class=FastJSONResponse,
+    )
+
+    # CORS (adjust origins as you need)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],          # or specify front-end origins
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Routers
+    app.include_router(public_router, prefix="/api")
+    app.include_router(protected_router, prefix="/api", dependencies=[Depends(verify_token)])
+
+    # -------------------------------------------------------------------------
+    # Root & health
+    # -------------------------------------------------------------------------
+    @app.get("/", include_in_schema=False)
+    async def root() -> RedirectResponse:
+        # Quick jump to Swagger UI
+        return RedirectResponse(url="/docs")
+
+    @app.get("/health", include_in_schema=False)
+    async def health() -> dict[str, str]:
+        return {"status": "ok"}
+
+    # -------------------------------------------------------------------------
+    # Exception handlers (make errors easy to see while debugging)
+    # -------------------------------------------------------------------------
+    @app.exception_handler(HTTPException)
+    async def http_exception_handler(_: Request, exc: HTTPException) -> JSONResponse:
+        return FastJSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+
+    @app.exception_handler(Exception)
+    async def unhandled_exception_handler(_: Request, exc: Exception) -> JSONResponse:
+        logging.getLogger("server").exception("Unhandled exception")
+        return FastJSONResponse(status_code=500, content={"detail": str(exc)})
+
+    # -------------------------------------------------------------------------
+    # Lifespan logs (optional)
+    # -------------------------------------------------------------------------
+    @app.on_event("startup")
+    async def on_startup() -> None:
+        logging.getLogger("server").info("🚀 Application startup complete")
+        await copy_dispatcher.startup()  # 分片模式下启动 worker 进程（余额由 worker 轮询）
+        await balance_service.start()  # 启动并立即拉取一次余额，然后进入轮询
+        await start_leader_election()  # 多 worker 部署时竞选 watcher 租约
+
+    @app.on_event("shutdown")
+    async def on_shutdown() -> None:
+        logging.getLogger("server").info("🛑 Application shutdown")
+        _quiet_lib_logs()
+        await stop_leader_election()
+        await copy_dispatcher.shutdown()
+        await copy_dispatcher.get_history().aflush()  # 写出未满一块的溢出记录
+        await balance_service.start()
+        await ws_api_sessions.aclose()
+        await close_shared_transports()  # 关闭共享的交易所连接池
+        persist.flush_all()  # 写出尚未落盘的防抖保存
+
+    return app
+
+
+app = create_app()
 
 # -----------------------------------------------------------------------------
 # Local runner (optional)
 # -----------------------------------------------------------------------------
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run("server.main:app", host="0.0.0.0", port=8000, reload=True, log_level="debug")
+    # 分片模式下由本进程管理 worker 进程，不使用自动重载
+    sharded = int(os.getenv("DISPATCH_SHARDS", "1") or 1) > 1
+    uvicorn.run("server.main:app", host="0.0.0.0", port=8000, reload=not sharded, log_level="debug")
@@ -10,6 +10,7 @@ class LeaderConfig(BaseModel):
     env: str
     api_key: str
     api_secret: str
+    passphrase: str | None = None  # Bitget only
 
 
 class StatusResponse(BaseModel):
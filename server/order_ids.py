@@ -0,0 +1,19 @@
+"""Deterministic client order ids for exactly-once order submission.
+
+The id for a ``(event_id, account)`` pair is the same on every attempt, so
+after a timeout the order can be looked up on the exchange by that id
+(``origClientOrderId`` on Binance, ``clientOid`` on Bitget) instead of
+guessing from balances whether it went through.
+"""
+
+from __future__ import annotations
+
+import hashlib
+
+PREFIX = "bs"
+
+
+def client_order_id(event_id, account: str) -> str:
+    """Return a 32 character id valid for both Binance and Bitget."""
+    digest = hashlib.sha256(f"{event_id}|{account}".encode("utf-8")).hexdigest()
+    return PREFIX + digest[:30]
@@ -0,0 +1,190 @@
+"""Atomic, debounced file persistence off the event loop.
+
+:func:`atomic_write` replaces a file in one step: the data goes to a
+temporary file in the same directory, is ``fsync``\\ ed and renamed over
+the target, so readers (and a restart after a crash) see either the old or
+the new contents, never a truncated file.
+
+:class:`AtomicFileWriter` sits in front of it for files that are saved
+often. Inside a running event loop :meth:`~AtomicFileWriter.submit` only
+records the new contents and schedules a flush ``delay`` seconds later;
+saves arriving in the meantime are coalesced into that one write, which
+runs in a worker thread. With ``delay=0`` the write starts at once and only
+saves made while it runs are coalesced into the next one. Outside an event
+loop the write happens at once.
+Contents can be given as a callable, rendered on the caller's thread at
+flush time, so a store that changes many times between flushes is
+serialized once.
+
+Writers are shared per path (:func:`writer_for`) and :func:`read_bytes`
+flushes a pending write first, so a process always reads its own saves.
+Pending writes are flushed by :func:`flush_all` at shutdown and at exit.
+A crash loses at most the last ``delay`` seconds of saves, never the file.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import contextlib
+import logging
+import os
+import stat
+import tempfile
+import threading
+from typing import Callable, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for further saves before writing (``PERSIST_DEBOUNCE``)
+SAVE_DELAY = float(os.getenv("PERSIST_DEBOUNCE", "0.05"))
+
+Contents = Union[bytes, Callable[[], bytes]]
+
+
+def _fsync_dir(directory: str) -> None:
+    # 目录项也要落盘，rename 才算持久化（Windows 不支持打开目录）
+    with contextlib.suppress(OSError):
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Replace ``path`` with ``data`` via temp file + ``fsync`` + rename.
+
+    An existing file keeps its permission bits; new files are created
+    readable by the owner only.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        with contextlib.suppress(OSError):
+            os.chmod(tmp, stat.S_IMODE(os.stat(path).st_mode))
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+    _fsync_dir(directory)
+
+
+class AtomicFileWriter:
+    """Coalescing writer for one file; see the module docstring."""
+
+    def __init__(self, path: str, delay: float = SAVE_DELAY) -> None:
+        self.path = path
+        self.delay = delay
+        self._pending: Optional[Contents] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._seq = 0
+        self._written_seq = 0
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "writes": 0, "errors": 0}
+
+    @property
+    def pending(self) -> bool:
+        return self._pending is not None
+
+    def submit(self, contents: Contents) -> None:
+        """Save ``contents``: deferred and coalesced inside an event loop."""
+        self.stats["submitted"] += 1
+        self._pending = contents
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._loop is loop:
+            return  # 已有待执行的写入，合并
+        self._loop = loop
+        if self.delay <= 0:
+            self._start(loop)  # 不防抖：立即在线程中写，写入期间的保存合并到下一次
+        else:
+            loop.call_later(self.delay, self._start, loop)
+
+    def _start(self, loop: asyncio.AbstractEventLoop) -> None:
+        loop.create_task(self._drain(loop))
+
+    async def _drain(self, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            while self._pending is not None:
+                seq, data = self._take()
+                try:
+                    await asyncio.to_thread(self._write, seq, data)
+                except Exception:
+                    logger.exception("[PERSIST] writing %s failed", self.path)
+        finally:
+            if self._loop is loop:
+                self._loop = None
+
+    def _take(self) -> tuple[int, bytes]:
+        contents, self._pending = self._pending, None
+        self._seq += 1
+        return self._seq, contents() if callable(contents) else contents
+
+    def _write(self, seq: int, data: bytes) -> None:
+        with self._lock:
+            if seq <= self._written_seq:
+                return  # 已有更新的内容写入
+            try:
+                atomic_write(self.path, data)
+            except Exception:
+                self.stats["errors"] += 1
+                raise
+            self._written_seq = seq
+            self.stats["writes"] += 1
+
+    def flush(self) -> None:
+        """Write pending contents now, on the calling thread."""
+        if self._pending is not None:
+            self._write(*self._take())
+
+    async def aflush(self) -> None:
+        """Write pending contents now, in a worker thread."""
+        if self._pending is not None:
+            await asyncio.to_thread(self._write, *self._take())
+
+
+_writers: Dict[str, AtomicFileWriter] = {}
+_registry_lock = threading.Lock()
+
+
+def writer_for(path: str, delay: float = SAVE_DELAY) -> AtomicFileWriter:
+    """The shared writer for ``path`` (created with ``delay`` on first use)."""
+    key = os.path.abspath(path)
+    with _registry_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = AtomicFileWriter(path, delay)
+        return writer
+
+
+def read_bytes(path: str) -> Optional[bytes]:
+    """Contents of ``path`` including any pending save; ``None`` if missing."""
+    writer = _writers.get(os.path.abspath(path))
+    if writer is not None:
+        writer.flush()
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def flush_all() -> None:
+    """Write every pending save now (shutdown / interpreter exit)."""
+    for writer in list(_writers.values()):
+        try:
+            writer.flush()
+        except Exception:
+            logger.exception("[PERSIST] flushing %s failed", writer.path)
+
+
+atexit.register(flush_all)
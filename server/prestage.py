@@ -0,0 +1,176 @@
+"""Speculative pre-staging of follower orders on the leader's NEW report.
+
+For market orders Binance sends an ``executionReport`` with ``X == "NEW"``
+before the FILLED one. :class:`PreStager` uses that gap:
+
+* **NEW** (market order with ``quoteOrderQty`` for BUY or ``quantity`` for
+  SELL): the expected ratio is computed from the requested amount and the
+  leader's pre-trade balance, and :meth:`CopyDispatcher.stage` sizes every
+  follower, reserves rate-limit tokens and builds the connectors in the
+  background.
+* **PARTIALLY_FILLED**: the stage is kept; the order is executing.
+* **FILLED**: the fill is dispatched immediately, with the leader's
+  post-trade balance derived from the pre-trade balance and the filled
+  amount (exact unless fees are paid in the sold asset), instead of waiting
+  for the following ``outboundAccountPosition`` frame. Followers whose
+  staged order matches the final sizing reuse its connector and token; the
+  rest are sized as usual. Requests are signed at this point with the
+  client order id derived from the fill's event id, the same id a replay
+  of the fill would use, so lookups and exchange-side dedup still match.
+* **CANCELED / REJECTED / EXPIRED**: the staged orders are discarded and
+  their tokens refunded.
+
+The regular :class:`~server.events.FillEvent` for a fill dispatched here is
+swallowed by the watcher (:meth:`PreStager.consume`), so each fill is
+dispatched once; unclaimed entries expire after ``STAGE_TTL`` seconds.
+Pre-staging is enabled with ``PRESTAGE=1``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict
+
+from .events import FillEvent
+from .push import push_hub
+
+logger = logging.getLogger(__name__)
+
+PRESTAGE_ENABLED = os.getenv("PRESTAGE", "").lower() in ("1", "true", "yes")
+# Stages without a final report, and fired events the watcher never
+# reported, are dropped after this many seconds
+STAGE_TTL = 30.0
+DISCARD_STATUSES = frozenset({"CANCELED", "REJECTED", "EXPIRED", "EXPIRED_IN_MATCH"})
+
+
+@dataclass
+class _Stage:
+    side: str
+    requested: float
+    pre_usdt: float
+    pre_btc: float
+    created: float
+    task: asyncio.Task
+
+
+class PreStager:
+    """Track leader market orders from NEW to their final report."""
+
+    def __init__(
+        self,
+        dispatcher,
+        *,
+        allow: Callable[[], bool] | None = None,
+    ) -> None:
+        self._dispatcher = dispatcher
+        self._allow = allow or (lambda: True)
+        self._stages: Dict[Any, _Stage] = {}
+        # event_id -> 触发时间；由 consume() 取走，或在 _expire() 中过期
+        self._fired: Dict[str, float] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.stats = {"staged": 0, "fired": 0, "discarded": 0}
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def observe(self, frame: Dict, free_usdt: float, free_btc: float) -> None:
+        """Feed one user-data frame; ``free_*`` are the leader's current balances."""
+        if frame.get("e") != "executionReport" or frame.get("o") != "MARKET":
+            return
+        self._expire()
+        oid = frame.get("i")
+        status = frame.get("X")
+        if status == "NEW":
+            self._on_new(oid, frame, free_usdt, free_btc)
+            return
+        stage = self._stages.get(oid)
+        if stage is None:
+            return
+        if status == "FILLED":
+            del self._stages[oid]
+            self._on_filled(stage, frame)
+        elif status in DISCARD_STATUSES:
+            del self._stages[oid]
+            logger.info("[PRESTAGE] leader order %s %s, discarding", oid, status)
+            self._spawn(self._discard(stage))
+
+    def consume(self, event_id: str) -> bool:
+        """True once for a fill already dispatched by the pre-staging path."""
+        return self._fired.pop(event_id, None) is not None
+
+    def _on_new(self, oid, frame: Dict, free_usdt: float, free_btc: float) -> None:
+        if oid in self._stages or not self._allow():
+            return
+        side = frame.get("S")
+        requested = float(frame.get("Q" if side == "BUY" else "q") or 0.0)
+        ref = free_usdt if side == "BUY" else free_btc
+        # 按数量下的市价买单无法预知成交额；余额不足以得出比例时也不暂存
+        if requested <= 0 or ref - requested <= 0:
+            return
+        ratio = min(requested / (ref - requested), 1.0)
+        quote_ratio, base_ratio = (ratio, 0.0) if side == "BUY" else (0.0, ratio)
+        task = self._spawn(self._dispatcher.stage(side, quote_ratio, base_ratio))
+        self._stages[oid] = _Stage(side, requested, free_usdt, free_btc, time.monotonic(), task)
+        self.stats["staged"] += 1
+
+    def _on_filled(self, stage: _Stage, frame: Dict) -> None:
+        quote = float(frame.get("Z") or 0.0)
+        base = float(frame.get("z") or 0.0)
+        if stage.side == "BUY":
+            free_usdt, free_btc = stage.pre_usdt - quote, stage.pre_btc + base
+        else:
+            free_usdt, free_btc = stage.pre_usdt + quote, stage.pre_btc - base
+        event = FillEvent.from_execution_report(frame, free_usdt=free_usdt, free_btc=free_btc)
+        self._fired[event.event_id] = time.monotonic()
+        self._spawn(self._fire(stage, event))
+
+    async def _fire(self, stage: _Stage, event: FillEvent) -> None:
+        try:
+            staged = await stage.task
+        except Exception:
+            logger.exception("[PRESTAGE] staging failed, dispatching unstaged")
+            staged = {}
+        if not self._allow():
+            logger.warning("[PRESTAGE] lease lost, dropping event %s", event.event_id)
+            await self._dispatcher.discard_staged(staged)
+            return
+        self.stats["fired"] += 1
+        push_hub.publish("watcher", state="fill", event_id=event.event_id, side=event.side, staged=True)
+        logger.info("[PRESTAGE] firing event %s with %d staged orders", event.event_id, len(staged))
+        try:
+            await self._dispatcher.dispatch(event, staged=staged)
+        except Exception:
+            logger.exception("[PRESTAGE] dispatch failed")
+
+    async def _discard(self, stage: _Stage) -> None:
+        self.stats["discarded"] += 1
+        try:
+            staged = await stage.task
+        except Exception:
+            return
+        await self._dispatcher.discard_staged(staged)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for oid, stage in list(self._stages.items()):
+            if now - stage.created > STAGE_TTL:
+                del self._stages[oid]
+                self._spawn(self._discard(stage))
+        for event_id, fired_at in list(self._fired.items()):
+            if now - fired_at > STAGE_TTL:
+                del self._fired[event_id]
+
+    async def close(self) -> None:
+        """Discard all open stages and wait for in-flight work."""
+        for stage in self._stages.values():
+            self._spawn(self._discard(stage))
+        self._stages.clear()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
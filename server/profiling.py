@@ -0,0 +1,195 @@
+"""Runtime profiling of the copy dispatch path.
+
+:data:`spans` records per-stage timing spans for each exchange into coarse
+histograms. Stages used by :class:`~server.copy_dispatcher.CopyDispatcher`:
+
+``balance``         cached balance lookup per follower
+``sizing``          batch order sizing (exchange ``*``)
+``connector_init``  connector construction (SDK ``Client`` init, HTTP client)
+``sign``            request signing (HTTP connectors only)
+``order``           order placement incl. HTTP round trip
+``lookup``          order status lookup by client order id after a timeout
+``ledger``          optimistic balance update from the order ack
+``idempotency``     marking the event processed and saving the store
+``result``          result history, push and circuit breakers
+``log``             dispatch log lines
+
+Spans are disabled by default (``DISPATCH_SPANS=1`` enables them at start)
+and cost a single attribute check when off. :class:`Profiler` takes an
+on-demand cProfile or pyinstrument capture of the event loop thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Any, Dict, Tuple
+
+try:  # optional
+    import pyinstrument
+except Exception:  # pragma: no cover
+    pyinstrument = None
+
+# Bucket upper bounds in milliseconds; the last bucket is open ended.
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 4) if self.count else 0.0,
+            "max_ms": round(self.max, 4),
+            "p50_ms": self.quantile(0.5),
+            "p90_ms": self.quantile(0.9),
+            "p99_ms": self.quantile(0.99),
+            "buckets": {
+                ("+inf" if i == len(BUCKETS_MS) else str(BUCKETS_MS[i])): n
+                for i, n in enumerate(self.counts)
+                if n
+            },
+        }
+
+
+class _Span:
+    __slots__ = ("_recorder", "_key", "_start")
+
+    def __init__(self, recorder: "SpanRecorder", key: Tuple[str, str]) -> None:
+        self._recorder = recorder
+        self._key = key
+
+    def __enter__(self) -> "_Span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        exchange, stage = self._key
+        self._recorder.observe(stage, exchange, (time.perf_counter() - self._start) * 1000)
+
+
+_NOOP = nullcontext()
+
+
+class SpanRecorder:
+    """Aggregate timing spans into per-exchange, per-stage histograms."""
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self._hist: Dict[Tuple[str, str], Histogram] = {}
+        # SDK 连接器在线程池中运行，observe 需要加锁
+        self._lock = threading.Lock()
+
+    def span(self, stage: str, exchange: str = "*"):
+        """Context manager timing ``stage``; a shared no-op when disabled."""
+        if not self.enabled:
+            return _NOOP
+        return _Span(self, (exchange, stage))
+
+    def observe(self, stage: str, exchange: str, ms: float) -> None:
+        key = (exchange, stage)
+        with self._lock:
+            hist = self._hist.get(key)
+            if hist is None:
+                hist = self._hist[key] = Histogram()
+            hist.observe(ms)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hist.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Return ``{exchange: {stage: histogram}}``."""
+        out: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        with self._lock:
+            for (exchange, stage), hist in sorted(self._hist.items()):
+                out.setdefault(exchange, {})[stage] = hist.to_dict()
+        return out
+
+
+class Profiler:
+    """On-demand sampling (pyinstrument) or deterministic (cProfile) capture.
+
+    Only one capture runs at a time. The profile covers everything executed
+    on the event loop thread while the capture window is open.
+    """
+
+    MODES = ("cprofile", "pyinstrument")
+
+    def __init__(self) -> None:
+        self._busy = False
+
+    @property
+    def busy(self) -> bool:
+        return self._busy
+
+    async def capture(self, seconds: float, mode: str = "cprofile", limit: int = 40) -> str:
+        """Profile for ``seconds`` and return a text report."""
+        if mode not in self.MODES:
+            raise ValueError(f"unknown profiler mode: {mode}")
+        if mode == "pyinstrument" and pyinstrument is None:
+            raise RuntimeError("pyinstrument package is required")
+        if self._busy:
+            raise RuntimeError("a profile capture is already running")
+        self._busy = True
+        try:
+            if mode == "pyinstrument":
+                profiler = pyinstrument.Profiler(async_mode="disabled")
+                profiler.start()
+                try:
+                    await asyncio.sleep(seconds)
+                finally:
+                    profiler.stop()
+                return profiler.output_text(unicode=False, color=False)
+
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+            out = io.StringIO()
+            pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(limit)
+            return out.getvalue()
+        finally:
+            self._busy = False
+
+
+# Singletons shared by the dispatcher, connectors and API
+spans = SpanRecorder(enabled=os.getenv("DISPATCH_SPANS", "").lower() in ("1", "true", "yes"))
+profiler = Profiler()
@@ -0,0 +1,84 @@
+"""Push feed of dispatch results, balance changes and watcher state.
+
+Producers call :meth:`PushHub.publish`, which never blocks: each subscriber
+has a bounded queue, and a subscriber that falls behind has its backlog
+dropped and replaced by a single ``resync`` message telling it to re-fetch
+the full state over REST. A slow UI therefore can never stall the
+dispatcher.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Set
+
+from .json_codec import dumps
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """A single client's bounded message queue."""
+
+    __slots__ = ("queue", "dropped")
+
+    def __init__(self, maxsize: int) -> None:
+        self.queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def offer(self, message: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync", "ts": message["ts"]})
+
+
+class PushHub:
+    """Fan out small delta messages to connected clients."""
+
+    def __init__(self, queue_size: int = 256, heartbeat: float = 15.0) -> None:
+        self._queue_size = queue_size
+        self._heartbeat = heartbeat
+        self._subs: Set[Subscription] = set()
+
+    def subscribe(self) -> Subscription:
+        sub = Subscription(self._queue_size)
+        self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self._subs.discard(sub)
+
+    def subscriber_count(self) -> int:
+        return len(self._subs)
+
+    def publish(self, msg_type: str, **data: Any) -> None:
+        """Queue ``{"type": msg_type, "ts": ..., **data}`` for every subscriber."""
+        if not self._subs:
+            return
+        message = {"type": msg_type, "ts": time.time(), **data}
+        for sub in self._subs:
+            sub.offer(message)
+
+    async def sse_stream(self, sub: Subscription) -> AsyncIterator[str]:
+        """Yield Server-Sent Events for ``sub`` until the client goes away."""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(sub.queue.get(), self._heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {message['type']}\ndata: {dumps(message)}\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+
+# Singleton instance shared by the dispatcher, balance service and API
+push_hub = PushHub()
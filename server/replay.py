@@ -0,0 +1,242 @@
+"""Deterministic replay of a leader event journal through ``CopyDispatcher``.
+
+Journaled frames are fed through the same :class:`FillTracker` the live
+watcher uses (or the recorded fill events are used directly) and dispatched
+to followers backed by in-memory mock connectors. Events can be paced at the
+recorded speed, accelerated, or run as fast as possible, which makes the
+driver usable both for reproducing incidents and for performance regression
+tests.
+
+Usage::
+
+    python -m server.replay leader_journal.bin --speed 0 --followers 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List
+
+from .accounts import Account, AccountStatus
+from .balances import fill_delta
+from .copy_dispatcher import CopyDispatcher
+from .events import FillEvent
+from .idempotency import IdempotencyStore
+from .journal import KIND_FILL, KIND_FRAME, read_journal
+from .leader_watcher import FillTracker
+
+
+class MockConnector:
+    """In-memory stand-in for the Binance SDK and HTTP connectors.
+
+    Every order is appended to ``orders`` and acknowledged with a Binance
+    style FULL response so the optimistic balance ledger is exercised.
+    """
+
+    orders: List[Dict[str, Any]] = []
+    latency: float = 0.0
+    price: float = 60_000.0
+    balance: Dict[str, float] = {"USDT": 1_000.0, "BTC": 0.1}
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self._api_key = kwargs.get("api_key") or (args[0] if args else None)
+
+    async def _fill(
+        self, side: str, quote: float | None, base: float | None, cid: str | None = None
+    ) -> Dict:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if quote is not None:
+            base = quote / self.price
+        else:
+            quote = (base or 0.0) * self.price
+        order = {
+            "orderId": len(MockConnector.orders) + 1,
+            "clientOrderId": cid,
+            "side": side,
+            "executedQty": f"{base:.8f}",
+            "cummulativeQuoteQty": f"{quote:.8f}",
+            "fills": [],
+        }
+        MockConnector.orders.append(order)
+        return order
+
+    async def get_balance(self, *args: Any) -> Dict[str, float]:
+        return dict(self.balance)
+
+    async def order_market_buy(self, symbol: str, quote_amount: float, client_order_id=None) -> Dict:
+        return await self._fill("BUY", quote_amount, None, client_order_id)
+
+    async def order_market_sell(self, symbol: str, quantity: float, client_order_id=None) -> Dict:
+        return await self._fill("SELL", None, quantity, client_order_id)
+
+    async def create_market_order(self, *args: Any, quote_amount=None, base_amount=None, **kwargs) -> Dict:
+        side = next(a for a in args if isinstance(a, str) and a.upper() in ("BUY", "SELL"))
+        cid = kwargs.get("client_order_id") or kwargs.get("client_oid")
+        return await self._fill(side.upper(), quote_amount, base_amount, cid)
+
+    async def get_order(self, *args: Any) -> Dict | None:
+        # The client order id is the last positional argument for every exchange.
+        return next((o for o in MockConnector.orders if o["clientOrderId"] == args[-1]), None)
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "MockConnector":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+class StaticAccounts:
+    """Fixed follower list with the ``AccountService`` interface used by dispatch."""
+
+    def __init__(self, accounts: Iterable[Account]) -> None:
+        self._accounts = {a.name: a for a in accounts}
+
+    def list_accounts(self) -> List[Account]:
+        return list(self._accounts.values())
+
+    def update_account(self, name: str, **updates: Any) -> None:
+        acct = self._accounts[name]
+        for key, value in updates.items():
+            setattr(acct, key, AccountStatus(value) if key == "status" else value)
+
+
+class LedgerBalances:
+    """In-memory balances updated from order acknowledgements only."""
+
+    def __init__(self, balances: Dict[str, Dict[str, float]]) -> None:
+        self._cache = {k: dict(v) for k, v in balances.items()}
+
+    async def get_balance(self, name: str) -> Dict[str, float]:
+        return self._cache.get(name, {"BTC": 0.0, "USDT": 0.0})
+
+    def apply_fill(self, name: str, side: str, result: Dict) -> None:
+        bal = self._cache.setdefault(name, {"BTC": 0.0, "USDT": 0.0})
+        for asset, change in fill_delta(side, result).items():
+            bal[asset] = max(0.0, bal.get(asset, 0.0) + change)
+
+
+@dataclass
+class ReplayStats:
+    """Summary of a replay run."""
+
+    events: int = 0
+    orders: int = 0
+    elapsed: float = 0.0
+    dispatch_ms: List[float] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, float]:
+        ms = sorted(self.dispatch_ms) or [0.0]
+        return {
+            "events": self.events,
+            "orders": self.orders,
+            "elapsed_s": round(self.elapsed, 4),
+            "dispatch_ms_mean": round(statistics.fmean(ms), 3),
+            "dispatch_ms_p50": round(ms[len(ms) // 2], 3),
+            "dispatch_ms_p99": round(ms[min(len(ms) - 1, int(len(ms) * 0.99))], 3),
+        }
+
+
+def build_replay_dispatcher(
+    followers: int = 10,
+    *,
+    usdt: float = 1_000.0,
+    btc: float = 0.1,
+    exchange: str = "binance",
+    latency: float = 0.0,
+) -> CopyDispatcher:
+    """Return a dispatcher wired to ``followers`` mock accounts."""
+    accounts = [
+        Account(name=f"replay{i}", exchange=exchange, env="test", api_key=f"k{i}", api_secret="s")
+        for i in range(followers)
+    ]
+    balances = LedgerBalances({a.name: {"USDT": usdt, "BTC": btc} for a in accounts})
+    idem_dir = tempfile.mkdtemp(prefix="replay-idem-")
+    dispatcher = CopyDispatcher(
+        StaticAccounts(accounts),
+        balances,
+        IdempotencyStore(os.path.join(idem_dir, "idempotency.json")),
+    )
+    MockConnector.orders = []
+    MockConnector.latency = latency
+    dispatcher._connectors = {exchange: MockConnector}
+    return dispatcher
+
+
+def load_events(path: str, source: str = "frames") -> List[tuple[float, FillEvent]]:
+    """Return ``(timestamp, event)`` pairs from a journal.
+
+    ``source="frames"`` re-derives events from raw frames with
+    :class:`FillTracker`; ``source="fills"`` uses the recorded fill events.
+    """
+    events: List[tuple[float, FillEvent]] = []
+    if source == "fills":
+        for entry in read_journal(path, KIND_FILL):
+            events.append((entry.ts, FillEvent.from_dict(entry.payload)))
+        return events
+    tracker = FillTracker()
+    for entry in read_journal(path, KIND_FRAME):
+        event = tracker.feed(entry.payload)
+        if event is not None:
+            events.append((entry.ts, event))
+    return events
+
+
+async def replay(
+    path: str,
+    dispatcher: CopyDispatcher,
+    *,
+    speed: float = 1.0,
+    source: str = "frames",
+) -> ReplayStats:
+    """Feed a journal through ``dispatcher``.
+
+    ``speed`` scales the recorded inter-event gaps: ``1`` replays in real
+    time, ``10`` ten times faster and ``0`` (or less) without any pacing.
+    """
+    stats = ReplayStats()
+    orders_before = len(MockConnector.orders)
+    started = time.perf_counter()
+    prev_ts: float | None = None
+    for ts, event in load_events(path, source):
+        if speed > 0 and prev_ts is not None and ts > prev_ts:
+            await asyncio.sleep((ts - prev_ts) / speed)
+        prev_ts = ts
+        t0 = time.perf_counter()
+        await dispatcher.dispatch(event)
+        stats.dispatch_ms.append((time.perf_counter() - t0) * 1000)
+        stats.events += 1
+    stats.elapsed = time.perf_counter() - started
+    stats.orders = len(MockConnector.orders) - orders_before
+    return stats
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay a leader event journal")
+    parser.add_argument("journal")
+    parser.add_argument("--speed", type=float, default=1.0, help="0 = as fast as possible")
+    parser.add_argument("--source", choices=("frames", "fills"), default="frames")
+    parser.add_argument("--followers", type=int, default=10)
+    parser.add_argument("--exchange", default="binance")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock order latency (s)")
+    args = parser.parse_args(argv)
+
+    dispatcher = build_replay_dispatcher(
+        args.followers, exchange=args.exchange, latency=args.latency
+    )
+    stats = asyncio.run(replay(args.journal, dispatcher, speed=args.speed, source=args.source))
+    for key, value in stats.summary().items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
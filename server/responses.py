@@ -0,0 +1,18 @@
+"""Custom FastAPI response classes."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from .json_codec import dumps_bytes
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` rendered with the fast JSON backend."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
@@ -0,0 +1,212 @@
+"""Bounded history of per-event, per-account dispatch records.
+
+:class:`ResultHistory` keeps the most recent ``capacity`` records in a fixed
+ring with secondary indexes by account and by event id. When a spill path is
+configured, records evicted from the ring are appended to an on-disk
+columnar log: one JSON line per block, each block mapping field name to a
+column of values. Inside a running event loop full blocks are appended from
+a worker thread, in order, so dispatch never waits on the disk; call
+:meth:`ResultHistory.aflush` at shutdown to write the partial block.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+
+@dataclass(slots=True)
+class DispatchRecord:
+    """Outcome of copying one leader event to one follower account."""
+
+    seq: int
+    ts: float
+    event_id: str
+    account: str
+    exchange: str
+    side: str
+    amount: float
+    success: bool
+    latency_ms: float = 0.0
+    order_id: str | None = None
+    error: str | None = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+_FIELDS = [f.name for f in fields(DispatchRecord)]
+
+
+class ResultHistory:
+    """Fixed-capacity ring buffer of :class:`DispatchRecord` with indexes."""
+
+    def __init__(
+        self,
+        capacity: int = 10_000,
+        spill_path: str | None = None,
+        spill_block: int = 256,
+    ) -> None:
+        self._capacity = capacity
+        self._ring: List[Optional[DispatchRecord]] = [None] * capacity
+        self._next_seq = 0
+        self._by_account: Dict[str, Deque[int]] = {}
+        self._by_event: Dict[str, Deque[int]] = {}
+        self._spill_path = spill_path
+        self._spill_block = spill_block
+        self._spill_buf: List[DispatchRecord] = []
+        # 已编码、待追加的块；只在 _write_lock 内取出，保证写入顺序
+        self._spill_lines: List[str] = []
+        self._write_lock = threading.Lock()
+        self._spill_task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return min(self._next_seq, self._capacity)
+
+    def append(
+        self,
+        *,
+        event_id: Any,
+        account: str,
+        exchange: str,
+        side: str,
+        amount: float,
+        success: bool,
+        latency_ms: float = 0.0,
+        order_id: Any = None,
+        error: str | None = None,
+        ts: float | None = None,
+    ) -> DispatchRecord:
+        """Record a dispatch outcome, evicting the oldest record when full."""
+        seq = self._next_seq
+        self._next_seq += 1
+        slot = seq % self._capacity
+        evicted = self._ring[slot]
+        if evicted is not None:
+            self._evict(evicted)
+        record = DispatchRecord(
+            seq,
+            time.time() if ts is None else ts,
+            str(event_id),
+            account,
+            exchange,
+            side,
+            amount,
+            success,
+            latency_ms,
+            None if order_id is None else str(order_id),
+            error,
+        )
+        self._ring[slot] = record
+        self._by_account.setdefault(account, deque()).append(seq)
+        self._by_event.setdefault(record.event_id, deque()).append(seq)
+        return record
+
+    def _evict(self, record: DispatchRecord) -> None:
+        for index, key in ((self._by_account, record.account), (self._by_event, record.event_id)):
+            seqs = index.get(key)
+            if seqs:
+                seqs.popleft()
+                if not seqs:
+                    del index[key]
+        if self._spill_path:
+            self._spill_buf.append(record)
+            if len(self._spill_buf) >= self._spill_block:
+                self._seal_block()
+                try:
+                    asyncio.get_running_loop()
+                except RuntimeError:
+                    self._write_lines()
+                    return
+                if self._spill_task is None or self._spill_task.done():
+                    self._spill_task = asyncio.create_task(self._drain())
+
+    def _get(self, seq: int) -> DispatchRecord | None:
+        record = self._ring[seq % self._capacity]
+        return record if record is not None and record.seq == seq else None
+
+    def query(
+        self,
+        *,
+        account: str | None = None,
+        event_id: str | None = None,
+        start: float | None = None,
+        end: float | None = None,
+        limit: int = 100,
+    ) -> List[DispatchRecord]:
+        """Return matching records, newest first."""
+        if event_id is not None:
+            seqs: Iterator[int] = reversed(self._by_event.get(str(event_id), ()))
+        elif account is not None:
+            seqs = reversed(self._by_account.get(account, ()))
+        else:
+            seqs = iter(range(self._next_seq - 1, self._next_seq - 1 - len(self), -1))
+
+        out: List[DispatchRecord] = []
+        for seq in seqs:
+            record = self._get(seq)
+            if record is None:
+                continue
+            if end is not None and record.ts > end:
+                continue
+            if start is not None and record.ts < start:
+                break
+            if account is not None and record.account != account:
+                continue
+            out.append(record)
+            if len(out) >= limit:
+                break
+        return out
+
+    def _seal_block(self) -> None:
+        if not self._spill_buf:
+            return
+        block = {name: [getattr(r, name) for r in self._spill_buf] for name in _FIELDS}
+        self._spill_buf = []
+        self._spill_lines.append(json.dumps(block, separators=(",", ":")) + "\n")
+
+    def _write_lines(self) -> None:
+        with self._write_lock:
+            lines, self._spill_lines = self._spill_lines, []
+            if not lines:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self._spill_path)), exist_ok=True)
+            with open(self._spill_path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+
+    async def _drain(self) -> None:
+        while self._spill_lines:
+            await asyncio.to_thread(self._write_lines)
+
+    def flush(self) -> None:
+        """Append buffered evicted records to the spill log, blocking until written."""
+        if not self._spill_path:
+            return
+        self._seal_block()
+        self._write_lines()
+
+    async def aflush(self) -> None:
+        """Like :meth:`flush`, but write from a worker thread."""
+        if not self._spill_path:
+            return
+        self._seal_block()
+        await asyncio.to_thread(self._write_lines)
+
+
+def read_spill(path: str) -> Iterator[DispatchRecord]:
+    """Iterate the records stored in a spill log, oldest first."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            block = json.loads(line)
+            for row in zip(*(block[name] for name in _FIELDS)):
+                yield DispatchRecord(*row)
@@ -0,0 +1,183 @@
+"""Error classification and retry policy for follower orders.
+
+Errors are sorted into three groups:
+
+* **unknown outcome**: the request may have reached the exchange (timeouts,
+  dropped connections, 5xx, Binance ``-1006``/``-1007``). The order is
+  looked up by client order id before anything else is done.
+* **retryable**: transient and known not to have placed an order (connect
+  failures, rate limits, clock skew), or an unknown outcome whose lookup
+  found no order once the exchange could no longer accept the request
+  (see :data:`ACCEPT_WINDOW`).
+* **fatal**: everything else (rejections, bad keys, filters); never retried.
+
+Independently, :func:`is_exchange_fault` tells failures of the exchange
+itself apart from rejections of one account, for the exchange breaker.
+
+:class:`RetryPolicy` bounds retries by attempt count and by a per-order
+latency budget, sleeping with full-jitter exponential backoff between
+attempts.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+from dataclasses import dataclass
+from typing import Any
+
+try:
+    import httpx
+except Exception:  # pragma: no cover
+    httpx = None
+
+try:
+    import requests
+except Exception:  # pragma: no cover
+    requests = None
+
+
+# Exceptions meaning "no response in time": the order may or may not exist
+TIMEOUT_ERRORS: tuple = (asyncio.TimeoutError, TimeoutError)
+if httpx is not None:
+    TIMEOUT_ERRORS += (httpx.TimeoutException,)
+if requests is not None:
+    TIMEOUT_ERRORS += (requests.exceptions.Timeout,)
+
+# The request never left the client, so no order can exist
+_NOT_SENT: tuple = ()
+if httpx is not None:
+    _NOT_SENT += (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# The connection broke after sending; the order may exist
+_BROKEN: tuple = (ConnectionError,)
+if httpx is not None:
+    _BROKEN += (httpx.TransportError,)
+if requests is not None:
+    _BROKEN += (requests.exceptions.ConnectionError,)
+
+# Exchange error codes, keyed by exchange
+LOOKUP_CODES = {
+    "binance": {-1006, -1007},  # unexpected response / backend timeout: status unknown
+}
+RETRYABLE_CODES = {
+    # disconnected, too many requests, too many orders, timestamp outside recvWindow
+    "binance": {-1001, -1003, -1015, -1021},
+    # too many requests, request timed out
+    "bitget": {"429", "40010"},
+}
+RETRYABLE_STATUS = {429}
+FATAL_STATUS = {418}  # Binance IP ban: retrying only extends it
+# Failures of the exchange as a whole rather than of one account: transport
+# errors, backend timeouts and rate limits
+EXCHANGE_FAULT_CODES = {
+    "binance": {-1001, -1003, -1006, -1007, -1015},
+    "bitget": {"429", "40010"},
+}
+
+# recvWindow sent with every Binance order: older requests are rejected
+RECV_WINDOW_MS = int(os.getenv("BINANCE_RECV_WINDOW_MS", "3000"))
+# Seconds after a request ended during which the exchange may still accept
+# it, e.g. a request still queued in an abandoned SDK thread or at the
+# exchange. Binance honours recvWindow plus up to 1 s of client clock lead;
+# exchanges missing here give no such bound, so a lookup miss stays unknown.
+ACCEPT_WINDOW = {"binance": RECV_WINDOW_MS / 1000 + 1.0}
+
+
+class OrderOutcomeUnknown(Exception):
+    """An order timed out and a lookup could not confirm whether it exists."""
+
+    def __init__(self, cid: str, cause: Exception) -> None:
+        super().__init__(f"order outcome unknown (client order id {cid}): {cause}")
+        self.cid = cid
+
+
+def error_status(exc: BaseException) -> int | None:
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None:
+        status = getattr(exc, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def error_code(exc: BaseException) -> Any:
+    """Exchange error code from an SDK exception or an HTTP error body."""
+    code = getattr(exc, "code", None)
+    if code is not None:
+        return code
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    try:
+        body = response.json()
+    except Exception:
+        return None
+    return body.get("code") if isinstance(body, dict) else None
+
+
+def _code_in(exc: BaseException, exchange: str, table: dict) -> bool:
+    code = error_code(exc)
+    if code is None:
+        return False
+    codes = table.get(exchange, ())
+    return code in codes or str(code) in {str(c) for c in codes}
+
+
+def needs_lookup(exc: BaseException, exchange: str) -> bool:
+    """True when ``exc`` leaves it unknown whether the order was placed."""
+    if isinstance(exc, _NOT_SENT):
+        return False
+    if isinstance(exc, TIMEOUT_ERRORS) or isinstance(exc, _BROKEN):
+        return True
+    status = error_status(exc)
+    if status is not None and status >= 500:
+        return True
+    return _code_in(exc, exchange, LOOKUP_CODES)
+
+
+def is_retryable(exc: BaseException, exchange: str) -> bool:
+    """True when resubmitting cannot create a duplicate and may succeed."""
+    if isinstance(exc, OrderOutcomeUnknown):
+        return False
+    status = error_status(exc)
+    if status in FATAL_STATUS:
+        return False
+    if isinstance(exc, _NOT_SENT) or status in RETRYABLE_STATUS:
+        return True
+    if _code_in(exc, exchange, RETRYABLE_CODES):
+        return True
+    # Unknown-outcome errors only reach here after a lookup found no order
+    # past the exchange's acceptance window.
+    return needs_lookup(exc, exchange)
+
+
+def is_exchange_fault(exc: BaseException, exchange: str) -> bool:
+    """True when ``exc`` says the exchange is unhealthy, not just this account.
+
+    Transport errors, timeouts, 5xx and rate limits count; rejections of the
+    account's request (bad key, insufficient balance, filters) do not.
+    """
+    if isinstance(exc, OrderOutcomeUnknown):
+        return True
+    if isinstance(exc, TIMEOUT_ERRORS) or isinstance(exc, _BROKEN) or isinstance(exc, _NOT_SENT):
+        return True
+    status = error_status(exc)
+    if status is not None and (status >= 500 or status in RETRYABLE_STATUS or status in FATAL_STATUS):
+        return True
+    return _code_in(exc, exchange, EXCHANGE_FAULT_CODES)
+
+
+@dataclass
+class RetryPolicy:
+    """Bounded retries inside a per-order latency budget (seconds)."""
+
+    max_attempts: int = 3
+    base_delay: float = 0.2
+    max_delay: float = 2.0
+    budget: float = 8.0
+    attempt_timeout: float = 5.0
+
+    def backoff(self, retry: int) -> float:
+        """Full-jitter exponential delay before retry number ``retry`` (1-based)."""
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
@@ -0,0 +1,591 @@
+"""Sharded multi-process copy dispatch.
+
+With ``DISPATCH_SHARDS=N`` (N > 1) followers are partitioned by a stable
+hash of the account name across N worker processes, each running its own
+:class:`~server.copy_dispatcher.CopyDispatcher` on its own event loop and
+core. The API process keeps the leader watcher and publishes every fill
+once over a local IPC channel (a Unix socket, or loopback TCP where Unix
+sockets are unavailable). Messages are length-prefixed JSON::
+
+    <u32 length> <JSON body>
+
+Workers stream per-account results back as they happen and finish every
+fill with a ``done`` message carrying timings and breaker state, so
+results, history, push updates and metrics stay in the API process. Each
+worker polls the balances of its own followers (it sizes orders from them)
+and forwards every change, including optimistic fills, so the API process
+serves them without polling the exchanges itself.
+
+A fill waits at most ``dispatch_timeout`` seconds for the shards, sending
+included, so one hung worker cannot stall the leader stream; shutdown
+terminates (and if needed kills) workers that do not exit in time. Crashed
+workers are restarted with capped exponential backoff.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import socket
+import struct
+import tempfile
+import time
+import zlib
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Tuple
+
+from .accounts import AccountService, AccountStatus
+from .copy_dispatcher import CopyDispatcher
+from .events import FillEvent
+from .idempotency import IdempotencyStore, open_idempotency_store
+from .json_codec import dumps_bytes, loads
+from .profiling import spans
+from .result_history import ResultHistory
+
+logger = logging.getLogger(__name__)
+
+_LEN = struct.Struct("<I")
+
+# Lightweight stand-in for ``Account`` when storing results reported by workers
+_AccountRef = namedtuple("_AccountRef", "name exchange")
+
+_STATE_RANK = {"closed": 0, "half_open": 1, "open": 2}
+
+# Extra time a fill may take in the workers beyond the order retry budget
+DISPATCH_TIMEOUT_MARGIN = 5.0
+# Worker restarts back off exponentially while they keep crashing; a worker
+# that stayed up this long counts as healthy again.
+RESTART_BACKOFF_BASE = 0.5
+RESTART_BACKOFF_MAX = 30.0
+RESTART_HEALTHY_AFTER = 60.0
+# Seconds shutdown waits for a worker to accept the shutdown message and to
+# exit before it is terminated
+SHUTDOWN_DRAIN_TIMEOUT = 1.0
+SHUTDOWN_JOIN_TIMEOUT = 5.0
+
+
+def shard_of(name: str, shards: int) -> int:
+    """Return the shard index owning account ``name`` (stable across runs)."""
+    return zlib.crc32(name.encode("utf-8")) % shards
+
+
+def _frame(message: Dict[str, Any]) -> bytes:
+    body = dumps_bytes(message)
+    return _LEN.pack(len(body)) + body
+
+
+async def _recv(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    (length,) = _LEN.unpack(await reader.readexactly(_LEN.size))
+    return loads(await reader.readexactly(length))
+
+
+def _load_object(path: str) -> Any:
+    module, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+class ShardAccounts:
+    """The accounts owned by one shard.
+
+    The accounts file is owned by the API process; it is re-read whenever it
+    changes on disk. Status updates made by the worker (circuit breaker
+    pauses) are applied locally and forwarded to the API process, which
+    persists them.
+    """
+
+    def __init__(self, service: AccountService, index: int, shards: int, notify=None) -> None:
+        from . import storage
+
+        self._service = service
+        self._index = index
+        self._shards = shards
+        self._notify = notify
+        self._path = storage._accounts_file
+        self._mtime = self._stat()
+
+    def _stat(self) -> float:
+        try:
+            return os.stat(self._path).st_mtime_ns
+        except OSError:
+            return 0
+
+    def list_accounts(self):
+        mtime = self._stat()
+        if mtime != self._mtime:
+            self._mtime = mtime
+            # 重新读取账户文件（由 API 进程写入）
+            self._service._accounts = AccountService()._accounts
+        return [
+            a for a in self._service.list_accounts()
+            if shard_of(a.name, self._shards) == self._index
+        ]
+
+    def update_account(self, name: str, **updates: Any) -> None:
+        acct = next((a for a in self._service.list_accounts() if a.name == name), None)
+        if acct is None:
+            raise KeyError(f"Account '{name}' not found")
+        for key, value in updates.items():
+            setattr(acct, key, AccountStatus(value) if key == "status" else value)
+        if self._notify is not None:
+            self._notify({"type": "account_update", "account": name, "updates": {
+                k: (v.value if isinstance(v, AccountStatus) else v) for k, v in updates.items()
+            }})
+
+
+class _WorkerDispatcher(CopyDispatcher):
+    """Dispatcher that forwards every result to the API process."""
+
+    def __init__(self, *args: Any, send, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._send = send
+
+    def _set_result(self, account, result: dict, *, event_id, side: str, amount: float,
+                    latency_ms: float = 0.0) -> None:
+        self._last_results[account.name] = result
+        self._send({
+            "type": "result",
+            "account": account.name,
+            "exchange": account.exchange,
+            "result": result,
+            "event_id": event_id,
+            "side": side,
+            "amount": amount,
+            "latency_ms": latency_ms,
+        })
+
+
+def _seed_idempotency(store: IdempotencyStore, idem_dir: str, index: int, shards: int) -> None:
+    """Import processed keys for this shard's accounts from other store files.
+
+    Covers switching from single-process mode and changing the shard count.
+    """
+    import glob
+
+    keys = set()
+    for path in glob.glob(os.path.join(idem_dir, "idempotency*.json")):
+        if os.path.abspath(path) == os.path.abspath(store.path):
+            continue
+        for key in IdempotencyStore(path).processed_keys():
+            if shard_of(key[1], shards) == index and not store.is_processed(key):
+                keys.add(key)
+    if keys:
+        store.mark_many(keys)
+
+
+async def _worker_loop(
+    index: int,
+    shards: int,
+    address: Tuple[Any, ...],
+    idem_dir: str,
+    connectors: Optional[str],
+) -> None:
+    from .accounts import account_service
+    from .balances import BalanceService
+
+    if address[0] == "unix":
+        reader, writer = await asyncio.open_unix_connection(address[1])
+    else:
+        reader, writer = await asyncio.open_connection(address[1], address[2])
+
+    def send(message: Dict[str, Any]) -> None:
+        writer.write(_frame(message))
+
+    accounts = ShardAccounts(account_service, index, shards, notify=send)
+    balances = BalanceService()
+    idem = open_idempotency_store(os.path.join(idem_dir, f"idempotency.shard{index}.json"))
+    if isinstance(idem, IdempotencyStore):
+        # 无共享 SQLite 存储时每个分片使用独立文件
+        _seed_idempotency(idem, idem_dir, index, shards)
+    dispatcher = _WorkerDispatcher(
+        accounts, balances, idem, history=ResultHistory(capacity=1), send=send
+    )
+    if connectors:
+        override = _load_object(connectors)
+        mapping = override if isinstance(override, dict) else {
+            ex: override for ex in ("binance", "bitget")
+        }
+        dispatcher._connectors = dict(mapping)
+        balances._connectors = dict(mapping)
+
+    owned = accounts.list_accounts()
+    await asyncio.gather(*(balances.update_balance(a.name) for a in owned))
+    for account in owned:
+        balances.register_account(account.name)
+
+    send({"type": "hello", "shard": index, "pid": os.getpid(), "accounts": len(owned)})
+    # 余额由本 worker 轮询，变化（含乐观成交）转发给 API 进程
+    for name, balance in balances.snapshot().items():
+        send({"type": "balance", "account": name, "balance": balance})
+    balances.on_change = lambda name, balance: send(
+        {"type": "balance", "account": name, "balance": balance}
+    )
+    await writer.drain()
+    await dispatcher.startup()
+
+    try:
+        while True:
+            try:
+                msg = await _recv(reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            kind = msg.get("type")
+            if kind == "fill":
+                for account in accounts.list_accounts():
+                    balances.register_account(account.name)
+                started = time.perf_counter()
+                try:
+                    await dispatcher.dispatch(FillEvent.from_dict(msg["event"]))
+                except Exception:
+                    logger.exception("[SHARD %d] dispatch failed", index)
+                send({
+                    "type": "done",
+                    "shard": index,
+                    "event_id": msg["event"].get("event_id"),
+                    "elapsed_ms": (time.perf_counter() - started) * 1000,
+                    "breakers": dispatcher.get_breaker_states(),
+                    "spans": spans.snapshot() if spans.enabled else None,
+                    "warmer": dispatcher.get_warmer_status(),
+                })
+            elif kind == "reset_breaker":
+                dispatcher.reset_breaker(msg["account"])
+            elif kind == "spans":
+                spans.enabled = bool(msg.get("enabled"))
+                if msg.get("reset"):
+                    spans.reset()
+            elif kind == "warm":
+                dispatcher.prewarm(msg.get("reason", "leader"))
+            elif kind == "shutdown":
+                return
+            await writer.drain()
+    finally:
+        await dispatcher.shutdown()
+        for task in balances._tasks.values():
+            task.cancel()
+        writer.close()
+
+
+def run_worker(
+    index: int,
+    shards: int,
+    address: Tuple[Any, ...],
+    idem_dir: str = ".",
+    connectors: Optional[str] = None,
+) -> None:
+    """Process entry point of one dispatch shard."""
+    logging.basicConfig(level=logging.INFO, format=f"%(levelname)s shard{index} %(name)s: %(message)s")
+    asyncio.run(_worker_loop(index, shards, tuple(address), idem_dir, connectors))
+
+
+# ---------------------------------------------------------------------------
+# API process side
+# ---------------------------------------------------------------------------
+
+class ShardedDispatcher(CopyDispatcher):
+    """Drop-in :class:`CopyDispatcher` that fans fills out to worker processes.
+
+    Call :meth:`startup` once an event loop is running to spawn the workers,
+    and :meth:`shutdown` on exit. ``connectors`` optionally names an
+    ``module:attr`` connector class (or ``{exchange: class}`` dict) used by
+    the workers instead of the real exchange connectors, for load tests.
+    """
+
+    def __init__(
+        self,
+        shards: int,
+        accounts,
+        balances,
+        *,
+        history: ResultHistory | None = None,
+        idem_dir: str = ".",
+        connectors: str | None = None,
+        start_timeout: float = 60.0,
+        dispatch_timeout: float | None = None,
+    ) -> None:
+        # 幂等存储与熔断器都在各 worker 进程内
+        super().__init__(accounts, balances, None, history=history)
+        self._shards = shards
+        self._idem_dir = idem_dir
+        self._connectors_path = connectors
+        self._start_timeout = start_timeout
+        self._dispatch_timeout = (
+            dispatch_timeout if dispatch_timeout is not None
+            else self._retry_policy.budget + DISPATCH_TIMEOUT_MARGIN
+        )
+        self._server: asyncio.AbstractServer | None = None
+        self._address: Tuple[Any, ...] | None = None
+        self._tmpdir: str | None = None
+        self._procs: Dict[int, Any] = {}
+        self._writers: Dict[int, asyncio.StreamWriter] = {}
+        self._ready: Dict[int, asyncio.Event] = {}
+        self._pending: Dict[str, Tuple[asyncio.Future, set]] = {}
+        self._metrics: Dict[int, Dict[str, Any]] = {}
+        self._crashes: Dict[int, int] = {}
+        self._respawns: Dict[int, asyncio.Task] = {}
+        self._closing = False
+
+    @property
+    def shards(self) -> int:
+        return self._shards
+
+    async def startup(self) -> None:
+        """Open the IPC channel, spawn the workers and wait for them to connect."""
+        if self._server is not None:
+            return
+        self._closing = False
+        # worker 负责轮询余额并转发，API 进程不再重复轮询
+        self._balances.use_remote()
+        if hasattr(socket, "AF_UNIX"):
+            self._tmpdir = tempfile.mkdtemp(prefix="bitsys-shards-")
+            path = os.path.join(self._tmpdir, "dispatch.sock")
+            self._server = await asyncio.start_unix_server(self._on_connect, path)
+            self._address = ("unix", path)
+        else:  # pragma: no cover - Windows
+            self._server = await asyncio.start_server(self._on_connect, "127.0.0.1", 0)
+            self._address = ("tcp", "127.0.0.1", self._server.sockets[0].getsockname()[1])
+        for index in range(self._shards):
+            self._ready[index] = asyncio.Event()
+            self._metrics[index] = {
+                "shard": index, "pid": None, "alive": False, "accounts": 0,
+                "events": 0, "last_ms": 0.0, "max_ms": 0.0, "timeouts": 0, "restarts": 0,
+                "spans": None, "warmer": None,
+            }
+            self._crashes[index] = 0
+            self._spawn(index)
+        await asyncio.wait_for(
+            asyncio.gather(*(e.wait() for e in self._ready.values())), self._start_timeout
+        )
+        self._log.info("[SHARD] %d dispatch workers ready", self._shards)
+
+    def _spawn(self, index: int) -> None:
+        ctx = multiprocessing.get_context("spawn")
+        proc = ctx.Process(
+            target=run_worker,
+            args=(index, self._shards, self._address, self._idem_dir, self._connectors_path),
+            name=f"dispatch-shard-{index}",
+            daemon=True,
+        )
+        proc.start()
+        self._procs[index] = proc
+
+    async def shutdown(self) -> None:
+        """Stop the workers and close the IPC channel."""
+        self._closing = True
+        for task in self._respawns.values():
+            task.cancel()
+        self._respawns.clear()
+        for writer in list(self._writers.values()):
+            try:
+                writer.write(_frame({"type": "shutdown"}))
+                # 卡住的 worker 不再读取，drain 不能无限等待
+                await asyncio.wait_for(writer.drain(), SHUTDOWN_DRAIN_TIMEOUT)
+            except Exception:
+                pass
+        for proc in self._procs.values():
+            await asyncio.to_thread(proc.join, SHUTDOWN_JOIN_TIMEOUT)
+            if proc.is_alive():
+                proc.terminate()
+                await asyncio.to_thread(proc.join, 1)
+            if proc.is_alive():
+                proc.kill()
+                await asyncio.to_thread(proc.join, 1)
+        self._procs.clear()
+        for writer in list(self._writers.values()):
+            writer.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._tmpdir:
+            try:
+                os.unlink(os.path.join(self._tmpdir, "dispatch.sock"))
+                os.rmdir(self._tmpdir)
+            except OSError:
+                pass
+            self._tmpdir = None
+
+    async def _on_connect(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            hello = await _recv(reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        index = hello["shard"]
+        connected = time.monotonic()
+        self._writers[index] = writer
+        self._metrics[index].update(pid=hello.get("pid"), alive=True, accounts=hello.get("accounts", 0))
+        self._ready[index].set()
+        try:
+            while True:
+                self._handle(index, await _recv(reader))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.pop(index, None)
+            self._metrics[index]["alive"] = False
+            for event_id in list(self._pending):
+                self._shard_done(event_id, index)
+            if not self._closing:
+                healthy = time.monotonic() - connected >= RESTART_HEALTHY_AFTER
+                self._crashes[index] = 0 if healthy else self._crashes[index] + 1
+                self._ready[index] = asyncio.Event()
+                self._respawns[index] = asyncio.create_task(self._respawn(index))
+
+    def restart_delay(self, crashes: int) -> float:
+        """Delay before restarting a worker after ``crashes`` quick crashes in a row."""
+        if crashes <= 0:
+            return 0.0
+        return min(RESTART_BACKOFF_MAX, RESTART_BACKOFF_BASE * 2 ** (crashes - 1))
+
+    async def _respawn(self, index: int) -> None:
+        """Restart worker ``index`` until it connects, backing off between crashes."""
+        while not self._closing:
+            delay = self.restart_delay(self._crashes[index])
+            self._log.error("[SHARD] worker %d exited, restarting in %.1fs", index, delay)
+            await asyncio.sleep(delay)
+            self._metrics[index]["restarts"] += 1
+            self._spawn(index)
+            proc = self._procs[index]
+            while not self._ready[index].is_set():
+                if not proc.is_alive():
+                    break
+                try:
+                    await asyncio.wait_for(self._ready[index].wait(), 0.5)
+                except asyncio.TimeoutError:
+                    pass
+            if self._ready[index].is_set():
+                return
+            # 启动阶段即退出：加大退避后重试
+            self._crashes[index] += 1
+
+    def _handle(self, index: int, msg: Dict[str, Any]) -> None:
+        kind = msg.get("type")
+        if kind == "result":
+            self._set_result(
+                _AccountRef(msg["account"], msg["exchange"]),
+                msg["result"],
+                event_id=msg["event_id"],
+                side=msg["side"],
+                amount=msg["amount"],
+                latency_ms=msg.get("latency_ms", 0.0),
+            )
+        elif kind == "done":
+            metrics = self._metrics[index]
+            metrics["events"] += 1
+            metrics["last_ms"] = round(msg["elapsed_ms"], 3)
+            metrics["max_ms"] = max(metrics["max_ms"], metrics["last_ms"])
+            metrics["breakers"] = msg.get("breakers") or {}
+            metrics["spans"] = msg.get("spans")
+            metrics["warmer"] = msg.get("warmer")
+            self._shard_done(msg["event_id"], index)
+        elif kind == "balance":
+            self._balances.apply_remote(msg["account"], msg["balance"])
+        elif kind == "account_update":
+            try:
+                self._accounts.update_account(msg["account"], **msg["updates"])
+            except Exception:
+                self._log.exception("[SHARD] failed to update acct=%s", msg["account"])
+
+    def _shard_done(self, event_id: str, index: int) -> None:
+        pending = self._pending.get(event_id)
+        if pending is None:
+            return
+        fut, waiting = pending
+        waiting.discard(index)
+        if not waiting:
+            del self._pending[event_id]
+            if not fut.done():
+                fut.set_result(None)
+
+    async def stage(self, side: str, quote_ratio: float, base_ratio: float) -> dict:
+        """Connectors live in the workers, so nothing is pre-staged here."""
+        return {}
+
+    async def dispatch(self, order_event: FillEvent | dict, staged: dict | None = None) -> None:
+        """Publish the fill to every live shard and wait until all are done.
+
+        Shards still busy after ``dispatch_timeout`` are counted in their
+        ``timeouts`` metric and no longer waited for.
+        """
+        if not await self._check_enabled():
+            return
+        if not isinstance(order_event, FillEvent):
+            order_event = FillEvent.from_dict(order_event)
+        live = dict(self._writers)
+        if not live:
+            self._log.error("[SHARD] no dispatch workers running, event=%s dropped",
+                            order_event.event_id)
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[order_event.event_id] = (fut, set(live))
+        # 只序列化一次，原样发给每个分片
+        frame = _frame({"type": "fill", "event": order_event.to_dict()})
+        for writer in live.values():
+            writer.write(frame)
+        try:
+            # 发送也计入超时：卡住的 worker 不读取时 drain 会一直阻塞
+            await asyncio.wait_for(self._deliver(live.values(), fut), self._dispatch_timeout)
+        except asyncio.TimeoutError:
+            # 某个 worker 卡住：记录后继续，不阻塞后续成交
+            _, waiting = self._pending.pop(order_event.event_id, (None, set()))
+            for index in waiting:
+                self._metrics[index]["timeouts"] += 1
+            self._log.error(
+                "[SHARD] event=%s not finished by shards %s after %.1fs",
+                order_event.event_id, sorted(waiting), self._dispatch_timeout,
+            )
+
+    @staticmethod
+    async def _deliver(writers, fut: asyncio.Future) -> None:
+        await asyncio.gather(*(w.drain() for w in writers), return_exceptions=True)
+        await fut
+
+    def _broadcast(self, message: Dict[str, Any]) -> None:
+        frame = _frame(message)
+        for writer in self._writers.values():
+            writer.write(frame)
+
+    def prewarm(self, reason: str) -> None:
+        """Ask every worker to re-warm its follower connections."""
+        self._broadcast({"type": "warm", "reason": reason})
+
+    def get_warmer_status(self) -> dict:
+        """Warmer status last reported by each worker."""
+        return {"shards": [m.get("warmer") for _, m in sorted(self._metrics.items())]}
+
+    def set_spans(self, enabled: bool, reset: bool = False) -> None:
+        """Toggle timing spans in every worker."""
+        self._broadcast({"type": "spans", "enabled": enabled, "reset": reset})
+
+    def reset_breaker(self, account_name: str) -> None:
+        writer = self._writers.get(shard_of(account_name, self._shards))
+        if writer is not None:
+            writer.write(_frame({"type": "reset_breaker", "account": account_name}))
+
+    def get_breaker_states(self) -> dict[str, dict]:
+        """Merge the breaker snapshots last reported by each worker.
+
+        Exchange breakers exist per worker; the worst state is reported.
+        """
+        merged: Dict[str, Dict[str, Any]] = {"accounts": {}, "exchanges": {}}
+        for metrics in self._metrics.values():
+            states = metrics.get("breakers") or {}
+            merged["accounts"].update(states.get("accounts", {}))
+            for exchange, state in states.get("exchanges", {}).items():
+                prev = merged["exchanges"].get(exchange)
+                if prev is None or _STATE_RANK.get(state["state"], 0) > _STATE_RANK.get(prev["state"], 0):
+                    merged["exchanges"][exchange] = state
+        return merged
+
+    def get_shard_metrics(self) -> List[Dict[str, Any]]:
+        return [
+            {k: v for k, v in m.items() if k != "breakers"}
+            for _, m in sorted(self._metrics.items())
+        ]
@@ -0,0 +1,198 @@
+"""Batch sizing of follower orders.
+
+Follower balances for one dispatch are held in a columnar
+:class:`FollowerTable`. :func:`size_orders` computes every follower's order
+amount, exchange precision rounding and minimum amount / min-notional
+filtering in a single pass, using NumPy when installed and a plain Python
+loop otherwise.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from math import floor
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+try:  # Optional dependency
+    import numpy as np
+except Exception:  # pragma: no cover - degraded to pure Python
+    np = None
+
+
+# Decimal places accepted per exchange and side. BUY orders are sized in the
+# quote asset (USDT), SELL orders in the base asset (BTC).
+# Binance: quoteOrderQty 2 位，quantity 6 位；Bitget 错误明确提示 checkScale=8
+AMOUNT_DECIMALS: Dict[str, Dict[str, int]] = {
+    "binance": {"BUY": 2, "SELL": 6},
+    "bitget": {"BUY": 8, "SELL": 8},
+}
+
+# Minimum order amount per exchange and side, in the same unit as above.
+# Binance BTCUSDT LOT_SIZE minQty is 0.00001 BTC.
+MIN_AMOUNT: Dict[str, Dict[str, float]] = {
+    "binance": {"BUY": 0.0, "SELL": 0.00001},
+    "bitget": {"BUY": 0.0, "SELL": 0.0},
+}
+
+# Minimum order value in the quote asset (USDT) per exchange: Binance
+# BTCUSDT NOTIONAL filter (applied to market orders), Bitget minTradeUSDT.
+# BUY orders are valued at their quote amount, SELL orders at the leader's
+# fill price when it is known. Smaller orders would be rejected.
+MIN_NOTIONAL: Dict[str, float] = {
+    "binance": 5.0,
+    "bitget": 1.0,
+}
+
+
+def round_down(v: float, decimals: int) -> float:
+    """向下截断到指定小数位（比四舍五入更安全，避免超额）。"""
+    if decimals <= 0:
+        return float(floor(v))
+    scale = 10 ** decimals
+    return floor(v * scale) / scale
+
+
+class FollowerTable:
+    """Columnar follower balances: one entry per follower in each column."""
+
+    __slots__ = ("names", "exchanges", "usdt", "btc")
+
+    def __init__(
+        self,
+        names: List[str],
+        exchanges: List[str],
+        usdt: Sequence[float],
+        btc: Sequence[float],
+    ) -> None:
+        self.names = names
+        self.exchanges = exchanges
+        self.usdt = usdt
+        self.btc = btc
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, str, float, float]]) -> "FollowerTable":
+        """Build a table from ``(name, exchange, usdt, btc)`` rows."""
+        names: List[str] = []
+        exchanges: List[str] = []
+        usdt: List[float] = []
+        btc: List[float] = []
+        for name, exchange, u, b in rows:
+            names.append(name)
+            exchanges.append(exchange)
+            usdt.append(float(u))
+            btc.append(float(b))
+        if np is not None:
+            return cls(
+                names,
+                exchanges,
+                np.asarray(usdt, dtype=np.float64),
+                np.asarray(btc, dtype=np.float64),
+            )
+        return cls(names, exchanges, usdt, btc)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+@dataclass(slots=True)
+class SizedOrders:
+    """Result of :func:`size_orders`, aligned with the table rows.
+
+    ``raw`` holds ``balance * ratio`` before rounding, ``amounts`` the rounded
+    order size (quote for BUY, base for SELL) and ``skip`` a reason string for
+    followers that must not be sent an order (``None`` otherwise).
+    """
+
+    raw: List[float]
+    amounts: List[float]
+    skip: List[str | None]
+
+
+def _skip_reason(
+    side: str, amount: float, minimum: float, notional: float, min_notional: float
+) -> str | None:
+    field = "quote_amt" if side == "BUY" else "base_amt"
+    if not amount > 0:
+        return f"zero {field}"
+    if amount < minimum:
+        return f"{field} below minimum {minimum}"
+    if notional < min_notional:
+        return f"notional {notional:.2f} below minimum {min_notional}"
+    return None
+
+
+def size_orders(
+    table: FollowerTable,
+    side: str,
+    quote_ratio: float,
+    base_ratio: float,
+    price: float = 0.0,
+) -> SizedOrders:
+    """Size every follower's order for one leader fill.
+
+    ``price`` (quote per base, e.g. the leader's average fill price) values
+    SELL orders for the min-notional check; SELL orders are not checked
+    against :data:`MIN_NOTIONAL` when it is ``0``.
+    """
+    ratio = quote_ratio if side == "BUY" else base_ratio
+    column = table.usdt if side == "BUY" else table.btc
+    if len(table) == 0:
+        return SizedOrders([], [], [])
+    if np is None:
+        return _size_orders_py(table, side, ratio, column, price)
+
+    raw = np.maximum(column * ratio, 0.0)
+    amounts = raw.copy()
+    minimum = np.zeros(len(table), dtype=np.float64)
+    min_notional = np.zeros(len(table), dtype=np.float64)
+    exchanges = np.asarray(table.exchanges, dtype=object)
+    for exchange in set(table.exchanges):
+        mask = exchanges == exchange
+        decimals = AMOUNT_DECIMALS.get(exchange, {}).get(side)
+        if decimals is not None:
+            if decimals <= 0:
+                amounts[mask] = np.floor(raw[mask])
+            else:
+                scale = 10 ** decimals
+                amounts[mask] = np.floor(raw[mask] * scale) / scale
+        minimum[mask] = MIN_AMOUNT.get(exchange, {}).get(side, 0.0)
+        min_notional[mask] = MIN_NOTIONAL.get(exchange, 0.0)
+
+    if side == "BUY":
+        notional = amounts
+    elif price > 0:
+        notional = amounts * price
+    else:
+        notional = np.full_like(amounts, np.inf)  # 价格未知：不做最小名义价值过滤
+    ok = (amounts > 0) & (amounts >= minimum) & (notional >= min_notional)
+    amounts_list = amounts.tolist()
+    skip: List[str | None] = [None] * len(table)
+    for i in np.flatnonzero(~ok).tolist():
+        skip[i] = _skip_reason(
+            side, amounts_list[i], float(minimum[i]), float(notional[i]), float(min_notional[i])
+        )
+    return SizedOrders(raw.tolist(), amounts_list, skip)
+
+
+def _size_orders_py(
+    table: FollowerTable, side: str, ratio: float, column: Sequence[float], price: float
+) -> SizedOrders:
+    raw: List[float] = []
+    amounts: List[float] = []
+    skip: List[str | None] = []
+    for exchange, balance in zip(table.exchanges, column):
+        value = max(0.0, balance * ratio)
+        decimals = AMOUNT_DECIMALS.get(exchange, {}).get(side)
+        amount = round_down(value, decimals) if decimals is not None else value
+        raw.append(value)
+        amounts.append(amount)
+        skip.append(
+            _skip_reason(
+                side,
+                amount,
+                MIN_AMOUNT.get(exchange, {}).get(side, 0.0),
+                amount if side == "BUY" else amount * price if price > 0 else float("inf"),
+                MIN_NOTIONAL.get(exchange, 0.0),
+            )
+        )
+    return SizedOrders(raw, amounts, skip)
@@ -1,13 +1,25 @@
-"""Storage layer abstractions."""
+"""Storage layer abstractions.
+
+With ``STORAGE_SECRET`` set, the leader credentials and the follower
+accounts are sealed with :class:`EncryptedJSONStorage`. On the first start
+after enabling it (or after upgrading a deployment that kept accounts.json
+in plain JSON) each existing plain or legacy file is migrated once, logged,
+and a ``<file>.sealed`` marker is left next to it. From then on an unsealed
+file is rejected; set ``STORAGE_MIGRATE=1`` for one start to accept it again
+(e.g. after restoring a plain backup).
+"""
 
 from __future__ import annotations
 
-import base64
-import hashlib
 import json
+import logging
 import os
 from typing import Any, Dict, List
 
+from . import crypto, persist
+
+logger = logging.getLogger(__name__)
+
 
 class InMemoryStorage:
     """Simple in-memory key-value store."""
@@ -23,62 +35,142 @@ class InMemoryStorage:
 
 
 class JSONStorage:
-    """Persist data to disk as plain JSON."""
-
-    def __init__(self, path: str) -> None:
-        self._path = path
-
-    def load(self) -> Dict[str, Any]:
-        if not os.path.exists(self._path):
-            return {}
-        with open(self._path, "r", encoding="utf-8") as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-
-    def save(self, data: Dict[str, Any]) -> None:
-        with open(self._path, "w", encoding="utf-8") as f:
-            json.dump(data, f)
-
+    """Persist data to disk as plain JSON.
 
-class EncryptedJSONStorage:
-    """Persist data to disk with a naive XOR-based encryption."""
+    Saves are atomic and, inside an event loop, debounced and written off
+    the loop (see :mod:`server.persist`); :meth:`asave` waits for the write.
+    """
 
-    def __init__(self, path: str, secret: str) -> None:
+    def __init__(self, path: str, *, save_delay: float = persist.SAVE_DELAY) -> None:
         self._path = path
-        self._secret = secret.encode()
+        self._writer = persist.writer_for(path, save_delay)
 
-    def _xor(self, data: bytes) -> bytes:
-        key = hashlib.sha256(self._secret).digest()
-        return bytes(b ^ key[i % len(key)] for i, b in enumerate(data))
+    def _encode(self, data: Dict[str, Any]) -> bytes:
+        return json.dumps(data).encode("utf-8")
 
-    def load(self) -> Dict[str, Any]:
-        if not os.path.exists(self._path):
+    def _decode(self, raw: bytes) -> Dict[str, Any]:
+        try:
+            return json.loads(raw.decode("utf-8"))
+        except (json.JSONDecodeError, UnicodeDecodeError):
             return {}
-        with open(self._path, "rb") as f:
-            raw = f.read()
+
+    def load(self) -> Dict[str, Any]:
+        raw = persist.read_bytes(self._path)
         if not raw:
             return {}
-        decrypted = self._xor(base64.b64decode(raw))
-        return json.loads(decrypted.decode("utf-8"))
+        return self._decode(raw)
+
+    def save(self, data: Dict[str, Any]) -> None:
+        self._writer.submit(self._encode(data))
+
+    async def asave(self, data: Dict[str, Any]) -> None:
+        """Save and wait until the file is on disk."""
+        self._writer.submit(self._encode(data))
+        await self._writer.aflush()
+
+
+class EncryptedJSONStorage(JSONStorage):
+    """Persist data to disk sealed with authenticated encryption.
+
+    The file format and ciphers are described in :mod:`server.crypto`. A
+    file keeps its key-derivation salt across saves, so the derived key is
+    computed once per process. A wrong secret or a tampered file raises
+    :class:`~server.crypto.DecryptionError` instead of loading as empty.
+
+    Unsealed files (the legacy XOR format, or plain JSON written before a
+    secret was configured) are migrated, i.e. read and re-saved sealed, only
+    as long as no sealed file has existed at this path: the first sealed
+    read or write leaves a ``<path>.sealed`` marker. With the marker present
+    they raise ``DecryptionError`` unless ``migrate=True``, so a sealed file
+    cannot later be swapped for plaintext accounts or keys.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        secret: str,
+        *,
+        migrate: bool = False,
+        save_delay: float = persist.SAVE_DELAY,
+    ) -> None:
+        super().__init__(path, save_delay=save_delay)
+        self._secret = secret.encode()
+        self._salt: bytes | None = None
+        self._migrate = migrate
+        self._marker = f"{path}.sealed"
+        self._marked = False
+
+    def _mark_sealed(self) -> None:
+        if self._marked:
+            return
+        if not os.path.exists(self._marker):
+            with open(self._marker, "w", encoding="utf-8") as f:
+                f.write("this file has been sealed; plain contents are rejected\n")
+        self._marked = True
 
     def save(self, data: Dict[str, Any]) -> None:
-        plaintext = json.dumps(data).encode("utf-8")
-        encrypted = base64.b64encode(self._xor(plaintext))
-        with open(self._path, "wb") as f:
-            f.write(encrypted)
+        self._mark_sealed()  # 先写标记：崩溃时宁可拒绝读取也不接受明文
+        super().save(data)
+
+    async def asave(self, data: Dict[str, Any]) -> None:
+        self._mark_sealed()
+        await super().asave(data)
+
+    def _encode(self, data: Dict[str, Any]) -> bytes:
+        if self._salt is None:
+            self._salt = os.urandom(crypto.SALT_SIZE)
+        return crypto.seal(json.dumps(data).encode("utf-8"), self._secret, salt=self._salt)
+
+    def _decode(self, raw: bytes) -> Dict[str, Any]:
+        if crypto.is_sealed(raw):
+            self._salt = crypto.header_salt(raw)
+            data = json.loads(crypto.open_sealed(raw, self._secret))
+            self._mark_sealed()
+            if crypto.header_cipher(raw) != crypto.DEFAULT_CIPHER:
+                self.save(data)  # 安装 cryptography 后升级为 AES-GCM
+            return data
+        if os.path.exists(self._marker) and not self._migrate:
+            raise crypto.DecryptionError(
+                f"{self._path} is not sealed although it was before ({self._marker} exists); "
+                "set STORAGE_MIGRATE=1 once to accept it"
+            )
+        # 迁移旧格式：XOR + base64，或配置密钥之前写入的明文 JSON
+        if raw.lstrip()[:1] in (b"{", b"["):
+            data = json.loads(raw.decode("utf-8"))
+        else:
+            data = json.loads(crypto.open_legacy(raw, self._secret).decode("utf-8"))
+        logger.warning("migrating %s to the sealed storage format (one-time upgrade)", self._path)
+        self.save(data)
+        return data
 
 
 _secret = os.getenv("STORAGE_SECRET")
+# 已加密过的文件再次出现明文时，只在显式设置 STORAGE_MIGRATE=1 时接受
+_migrate = os.getenv("STORAGE_MIGRATE") == "1"
+if _secret and crypto.AESGCM is None:
+    # 缺少 cryptography 时拒绝启动，除非显式允许标准库备用算法
+    if os.getenv("STORAGE_ALLOW_STDLIB_CIPHER") != "1":
+        raise RuntimeError(
+            "STORAGE_SECRET is set but the cryptography package is not installed "
+            "(pip install -r requirements.txt); set STORAGE_ALLOW_STDLIB_CIPHER=1 "
+            "to seal with the stdlib SHAKE-256 + HMAC cipher instead"
+        )
+    logger.warning(
+        "cryptography is not installed: sealing storage with the stdlib SHAKE-256 + HMAC "
+        "cipher instead of AES-GCM"
+    )
 _cred_file = os.getenv("LEADER_CRED_FILE", "leader_credentials.json")
 if _secret:
-    _leader_storage = EncryptedJSONStorage(_cred_file, _secret)
+    _leader_storage = EncryptedJSONStorage(_cred_file, _secret, migrate=_migrate)
 else:
     _leader_storage = JSONStorage(_cred_file)
 
 _accounts_file = os.getenv("ACCOUNTS_FILE", "accounts.json")
-_accounts_storage = JSONStorage(_accounts_file)
+# follower 的 API 密钥与 leader 凭证同样加密保存
+if _secret:
+    _accounts_storage = EncryptedJSONStorage(_accounts_file, _secret, migrate=_migrate)
+else:
+    _accounts_storage = JSONStorage(_accounts_file)
 
 
 def save_leader_credentials(creds: Dict[str, str]) -> None:
@@ -87,6 +179,12 @@ def save_leader_credentials(creds: Dict[str, str]) -> None:
     _leader_storage.save(creds)
 
 
+async def asave_leader_credentials(creds: Dict[str, str]) -> None:
+    """Persist leader credentials off the event loop and wait for the write."""
+
+    await _leader_storage.asave(creds)
+
+
 def load_leader_credentials() -> Dict[str, str]:
     """Load leader account credentials from storage."""
 
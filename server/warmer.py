@@ -0,0 +1,130 @@
+"""Keep follower exchange connections warm between copy bursts.
+
+After an idle stretch the pooled follower connections have expired, so the
+first orders of a burst pay DNS, TCP and TLS setup. :class:`ConnectionWarmer`
+calls each connector class's ``warm(accounts, env=..., parallel=...)``
+classmethod for every venue with active followers:
+
+* periodically, a little more often than the pools' keep-alive expiry;
+* on :meth:`~ConnectionWarmer.poke`, which the leader watcher calls when its
+  stream reconnects and when the leader shows pre-trade activity (a NEW
+  ``executionReport``), so the FILLED report finds every connection ready.
+
+``parallel`` is the number of connections to open per venue: one per
+follower, capped at the pool's keep-alive size. Connector classes without a
+``warm`` method are skipped.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Mapping
+
+from .accounts import AccountStatus
+from .connectors.http import POOL_LIMITS
+
+logger = logging.getLogger(__name__)
+
+WARM_INTERVAL = float(os.getenv("CONNECTION_WARM_INTERVAL", "20") or 0)
+# Pokes closer together than this reuse the previous warm-up
+WARM_MIN_GAP = 0.5
+
+
+class ConnectionWarmer:
+    """Periodic and on-demand warm-up of follower connection pools."""
+
+    def __init__(
+        self,
+        accounts,
+        connectors: Callable[[], Mapping[str, Any]],
+        *,
+        interval: float = WARM_INTERVAL,
+        min_gap: float = WARM_MIN_GAP,
+        timeout: float = 5.0,
+    ) -> None:
+        self._accounts = accounts
+        self._connectors = connectors
+        self.interval = interval
+        self.min_gap = min_gap
+        self.timeout = timeout
+        self._task: asyncio.Task | None = None
+        self._running: asyncio.Task | None = None
+        self._last_done = 0.0
+        self._stats: Dict[str, Any] = {
+            "runs": 0, "errors": 0, "last_reason": None, "last_at": None, "last_ms": 0.0,
+        }
+
+    def _groups(self) -> Dict[tuple, list]:
+        groups: Dict[tuple, list] = defaultdict(list)
+        for account in self._accounts.list_accounts():
+            if account.status == AccountStatus.ACTIVE:
+                groups[(account.exchange, getattr(account, "env", ""))].append(account)
+        return groups
+
+    async def warm(self, reason: str = "manual") -> None:
+        """Warm every venue with active followers once."""
+        connectors = self._connectors()
+        calls = []
+        for (exchange, env), accounts in self._groups().items():
+            warm = getattr(connectors.get(exchange), "warm", None)
+            if warm is None:
+                continue
+            parallel = min(len(accounts), POOL_LIMITS.max_keepalive_connections or len(accounts))
+            calls.append(asyncio.wait_for(warm(accounts, env=env, parallel=parallel), self.timeout))
+        started = time.perf_counter()
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        for err in errors:
+            logger.warning("[WARM] warm-up failed: %r", err)
+        self._last_done = time.monotonic()
+        self._stats.update(
+            runs=self._stats["runs"] + 1,
+            errors=self._stats["errors"] + len(errors),
+            last_reason=reason,
+            last_at=time.time(),
+            last_ms=round((time.perf_counter() - started) * 1000, 3),
+        )
+        logger.debug("[WARM] %s: %d venues in %.1f ms", reason, len(calls), self._stats["last_ms"])
+
+    def poke(self, reason: str) -> None:
+        """Warm now unless a warm-up is running or has just finished."""
+        if self._running is not None and not self._running.done():
+            return
+        if time.monotonic() - self._last_done < self.min_gap:
+            return
+        try:
+            self._running = asyncio.get_running_loop().create_task(self.warm(reason))
+        except RuntimeError:  # 无事件循环（同步调用方）时忽略
+            return
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._running is None or self._running.done():
+                self._running = asyncio.create_task(self.warm("periodic"))
+                await asyncio.gather(self._running, return_exceptions=True)
+
+    def start(self) -> None:
+        """Warm once now and then every ``interval`` seconds (0 disables)."""
+        if self.interval <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self.poke("startup")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        for task in (self._task, self._running):
+            if task is not None and not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._task = self._running = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            **self._stats,
+        }
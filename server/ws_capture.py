@@ -0,0 +1,332 @@
+"""Capture and playback of Binance user-data stream traffic.
+
+Capture files hold the raw websocket frames exactly as received, with the
+receive time::
+
+    b"BSWSCAP1" then per frame: <u32 length> <f64 unix timestamp> <UTF-8 text>
+
+A playback server replays a capture to any websocket client at recorded
+speed, N times faster, or as fast as possible. Point
+:meth:`BinanceSDKConnector.start_user_socket` at it with ``ws_url=`` or use
+:func:`stress` to drive the watcher's :class:`FillTracker` and a mock-backed
+:class:`CopyDispatcher` at realistic and extreme message rates.
+
+Usage::
+
+    python -m server.ws_capture convert frames.jsonl traffic.cap
+    python -m server.ws_capture serve traffic.cap --speed 10 --port 8765
+    python -m server.ws_capture stress traffic.cap --speed 0 --followers 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import struct
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+from .json_codec import dumps, loads
+
+MAGIC = b"BSWSCAP1"
+_FRAME = struct.Struct("<Id")
+
+
+class CaptureWriter:
+    """Append frames to a capture file."""
+
+    def __init__(self, path: str) -> None:
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._f = open(path, "ab")
+        if new:
+            self._f.write(MAGIC)
+
+    def write(self, frame: str | bytes, ts: float | None = None) -> None:
+        data = frame.encode("utf-8") if isinstance(frame, str) else bytes(frame)
+        self._f.write(_FRAME.pack(len(data), time.time() if ts is None else ts))
+        self._f.write(data)
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "CaptureWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def read_capture(path: str) -> Iterator[Tuple[float, str]]:
+    """Yield ``(timestamp, frame_text)`` pairs; a torn last frame is ignored."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a capture file")
+        while True:
+            head = f.read(_FRAME.size)
+            if len(head) < _FRAME.size:
+                return
+            length, ts = _FRAME.unpack(head)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield ts, data.decode("utf-8")
+
+
+def convert(src: str, dst: str, *, gap: float = 0.05) -> int:
+    """Build a capture from a leader journal or a JSON-lines frame file.
+
+    JSON-lines input has no timestamps, so frames are spaced ``gap`` seconds
+    apart. Returns the number of frames written.
+    """
+    from .journal import KIND_FRAME, MAGIC as JOURNAL_MAGIC, read_journal
+
+    with open(src, "rb") as f:
+        is_journal = f.read(len(JOURNAL_MAGIC)) == JOURNAL_MAGIC
+    count = 0
+    with CaptureWriter(dst) as writer:
+        if is_journal:
+            for entry in read_journal(src, KIND_FRAME):
+                writer.write(dumps(entry.payload), entry.ts)
+                count += 1
+        else:
+            start = time.time()
+            with open(src, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        writer.write(line.strip(), start + count * gap)
+                        count += 1
+    return count
+
+
+def _playback_frames(path: str, repeat: int) -> List[Tuple[float, str]]:
+    frames = list(read_capture(path))
+    if repeat <= 1 or not frames:
+        return frames
+    span = frames[-1][0] - frames[0][0] + 0.001
+    out = list(frames)
+    for k in range(1, repeat):
+        for ts, text in frames:
+            # Shift the event time so repeated fills get distinct event ids.
+            data = loads(text)
+            if "E" in data:
+                data["E"] = data["E"] + k
+            out.append((ts + k * span, dumps(data)))
+    return out
+
+
+async def serve_playback(
+    path: str,
+    *,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    speed: float = 1.0,
+    repeat: int = 1,
+):
+    """Start a websocket server replaying ``path`` to each connecting client.
+
+    ``speed`` scales recorded gaps (``0`` = no pacing). The connection is
+    closed once the capture has been sent ``repeat`` times. Returns the
+    ``websockets`` server; its URL is available via :func:`server_url`.
+    """
+    import websockets
+
+    frames = _playback_frames(path, repeat)
+
+    async def _handler(ws, _path: str = "/") -> None:
+        started = time.perf_counter()
+        first_ts = frames[0][0] if frames else 0.0
+        for ts, text in frames:
+            if speed > 0:
+                delay = (ts - first_ts) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await ws.send(text)
+        await ws.close()
+
+    return await websockets.serve(_handler, host, port, compression=None)
+
+
+def server_url(server: Any) -> str:
+    host, port = server.sockets[0].getsockname()[:2]
+    return f"ws://{host}:{port}/ws"
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def stress(
+    path: str,
+    *,
+    speed: float = 0.0,
+    followers: int = 100,
+    repeat: int = 1,
+    latency: float = 0.0,
+) -> Dict[str, float]:
+    """Play a capture through a local server into the watcher and dispatcher.
+
+    A reader task decodes frames into a queue while a consumer runs the
+    frames through :class:`FillTracker` and dispatches fills, mirroring the
+    live watcher. Reports throughput, queueing lag and dispatch latency.
+    """
+    import websockets
+
+    from .leader_watcher import FillTracker
+    from .replay import MockConnector, build_replay_dispatcher
+
+    dispatcher = build_replay_dispatcher(followers, latency=latency)
+    server = await serve_playback(path, speed=speed, repeat=repeat)
+    queue: asyncio.Queue = asyncio.Queue()
+    lag_ms: List[float] = []
+    dispatch_ms: List[float] = []
+    stats = {"frames": 0, "events": 0, "max_backlog": 0}
+
+    async def _reader() -> None:
+        async with websockets.connect(server_url(server), compression=None, max_queue=None) as ws:
+            async for message in ws:
+                queue.put_nowait((time.perf_counter(), loads(message)))
+                stats["frames"] += 1
+                stats["max_backlog"] = max(stats["max_backlog"], queue.qsize())
+        queue.put_nowait(None)
+
+    async def _consumer() -> None:
+        tracker = FillTracker()
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            received, frame = item
+            event = tracker.feed(frame)
+            if event is None:
+                continue
+            t0 = time.perf_counter()
+            lag_ms.append((t0 - received) * 1000)
+            await dispatcher.dispatch(event)
+            dispatch_ms.append((time.perf_counter() - t0) * 1000)
+            stats["events"] += 1
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(_reader(), _consumer())
+    finally:
+        server.close()
+        await server.wait_closed()
+    elapsed = time.perf_counter() - started
+    return {
+        "frames": stats["frames"],
+        "events": stats["events"],
+        "orders": len(MockConnector.orders),
+        "elapsed_s": round(elapsed, 4),
+        "frames_per_s": round(stats["frames"] / elapsed, 1) if elapsed else 0.0,
+        "max_backlog": stats["max_backlog"],
+        "lag_ms_p50": round(_pct(lag_ms, 0.5), 3),
+        "lag_ms_max": round(max(lag_ms, default=0.0), 3),
+        "dispatch_ms_mean": round(statistics.fmean(dispatch_ms), 3) if dispatch_ms else 0.0,
+        "dispatch_ms_p99": round(_pct(dispatch_ms, 0.99), 3),
+    }
+
+
+async def capture(
+    dst: str, api_key: str, api_secret: str, *, testnet: bool = False, duration: float = 60.0
+) -> int:
+    """Record the live user-data stream of an account for ``duration`` seconds."""
+    from .connectors.binance_sdk_connector import BinanceSDKConnector
+
+    count = 0
+    with CaptureWriter(dst) as writer:
+
+        def _tap(message: str | bytes) -> None:
+            nonlocal count
+            writer.write(message)
+            count += 1
+
+        async with BinanceSDKConnector(api_key, api_secret, testnet=testnet) as connector:
+            await connector.start_user_socket(lambda _msg: None, raw_tap=_tap)
+            await asyncio.sleep(duration)
+    return count
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="User-data stream capture/playback")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("convert", help="journal or JSON-lines -> capture file")
+    p.add_argument("src")
+    p.add_argument("dst")
+    p.add_argument("--gap", type=float, default=0.05)
+
+    p = sub.add_parser("info", help="summarize a capture file")
+    p.add_argument("path")
+
+    p = sub.add_parser("serve", help="run a playback websocket server")
+    p.add_argument("path")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--speed", type=float, default=1.0, help="0 = as fast as possible")
+    p.add_argument("--repeat", type=int, default=1)
+
+    p = sub.add_parser("stress", help="play through the watcher and dispatcher")
+    p.add_argument("path")
+    p.add_argument("--speed", type=float, default=0.0, help="0 = as fast as possible")
+    p.add_argument("--followers", type=int, default=100)
+    p.add_argument("--repeat", type=int, default=1)
+    p.add_argument("--latency", type=float, default=0.0, help="mock order latency (s)")
+
+    p = sub.add_parser("capture", help="record a live user-data stream")
+    p.add_argument("dst")
+    p.add_argument("--api-key", required=True)
+    p.add_argument("--api-secret", required=True)
+    p.add_argument("--testnet", action="store_true")
+    p.add_argument("--duration", type=float, default=60.0)
+
+    args = parser.parse_args(argv)
+    if args.cmd == "convert":
+        print(f"frames: {convert(args.src, args.dst, gap=args.gap)}")
+    elif args.cmd == "info":
+        frames = list(read_capture(args.path))
+        span = frames[-1][0] - frames[0][0] if frames else 0.0
+        print(f"frames: {len(frames)}  span_s: {span:.3f}  bytes: {os.path.getsize(args.path)}")
+    elif args.cmd == "serve":
+        async def _serve() -> None:
+            server = await serve_playback(
+                args.path, host=args.host, port=args.port, speed=args.speed, repeat=args.repeat
+            )
+            print(f"serving {args.path} on {server_url(server)}")
+            await server.serve_forever()
+
+        asyncio.run(_serve())
+    elif args.cmd == "stress":
+        result = asyncio.run(
+            stress(
+                args.path,
+                speed=args.speed,
+                followers=args.followers,
+                repeat=args.repeat,
+                latency=args.latency,
+            )
+        )
+        for key, value in result.items():
+            print(f"{key}: {value}")
+    elif args.cmd == "capture":
+        count = asyncio.run(
+            capture(
+                args.dst,
+                args.api_key,
+                args.api_secret,
+                testnet=args.testnet,
+                duration=args.duration,
+            )
+        )
+        print(f"frames: {count}")
+
+
+if __name__ == "__main__":
+    main()
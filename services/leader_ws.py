@@ -1,92 +1,437 @@
-"""Utilities for maintaining a websocket connection to watch leader orders.
+"""Supervisor for the leader's user-data websocket.
 
-This module intentionally keeps the implementation light-weight so that tests
-can inject their own coroutines for creating listen keys, keeping them alive
-and connecting to a websocket.  The ``watch_leader_orders`` coroutine manages
-these components and automatically restarts the connection when it is dropped.
+:class:`LeaderStreamSupervisor` owns the whole connection lifecycle so the
+exchange-specific code only supplies three coroutines: one creating a
+listen key, one keeping it alive and one connecting a websocket for a key
+and yielding its messages. The supervisor
+
+* reconnects with exponential backoff (immediately after a connection that
+  delivered data, doubling up to ``backoff_max`` while attempts keep failing),
+* rotates the listen key and connection before the exchange expires them
+  (Binance closes user-data connections after 24 hours) and whenever the
+  keepalive fails,
+* checks liveness actively: a ``ping`` coroutine measures the websocket
+  round trip every ``ping_interval`` seconds and a missing pong forces a
+  reconnect; a connection with neither messages nor pongs for
+  ``max_silence`` seconds is treated as half-open and replaced; a
+  ``probe_listen_key`` coroutine confirms over REST that the listen key is
+  still valid,
+* records per-connection latency metrics (:class:`ConnectionStats`), and
+* hands every message to an async ``consumer`` and waits for it, so a slow
+  consumer applies backpressure instead of growing an unbounded queue; a
+  consumer that raises is logged and counted, and reading continues.
+
+Connectors may yield :data:`OPEN` as the first item once the socket is
+established; it marks the connect time and is not delivered. The module
+stays free of exchange specifics so tests can inject their own coroutines.
 """
 
 from __future__ import annotations
 
 import asyncio
 import contextlib
-from typing import Awaitable, Callable, AsyncIterator, Any
+import inspect
+import logging
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
 
-ListenKeyFactory = Callable[[], Awaitable[str]]
+ListenKeyFactory = Callable[[], Awaitable[Optional[str]]]
 KeepAliveFunc = Callable[[str], Awaitable[None]]
-WsConnector = Callable[[str], AsyncIterator[Any]]
+WsConnector = Callable[[Optional[str]], AsyncIterator[Any]]
+PingFunc = Callable[[], Awaitable[float]]
+ProbeFunc = Callable[[str], Awaitable[bool]]
+Consumer = Callable[[Any], Any]
 
+# Yielded by a connector once its socket is open (never delivered)
+OPEN = object()
 
-async def _keepalive_loop(
-    listen_key: str, keepalive: KeepAliveFunc, interval: float
-) -> None:
-    """Periodically invoke ``keepalive`` for ``listen_key``.
+# Binance: listen keys expire 60 min after the last keepalive and a
+# connection is closed after 24 h, so rotate a little before that.
+KEEPALIVE_INTERVAL = 30 * 60
+ROTATE_AFTER = 23 * 60 * 60
+PING_INTERVAL = 20.0
+PING_TIMEOUT = 10.0
+PROBE_INTERVAL = 5 * 60
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+# Weight of the newest sample in the moving averages
+EWMA_ALPHA = 0.2
+RECENT_CONNECTIONS = 10
+
+
+@dataclass
+class ConnectionStats:
+    """Latency metrics of one websocket connection."""
+
+    conn_id: int
+    listen_key: Optional[str]
+    started: float = field(default_factory=time.time)
+    connect_s: Optional[float] = None
+    messages: int = 0
+    last_message: Optional[float] = None
+    # 交易所事件时间（E 字段）到本地收到的延迟
+    event_lag_ms: Optional[float] = None
+    event_lag_avg_ms: Optional[float] = None
+    event_lag_max_ms: float = 0.0
+    consume_avg_ms: Optional[float] = None
+    # 主动探活：websocket ping 往返时延与 listen key 校验
+    pings: int = 0
+    ping_rtt_ms: Optional[float] = None
+    ping_rtt_avg_ms: Optional[float] = None
+    ping_rtt_max_ms: float = 0.0
+    last_pong: Optional[float] = None
+    probes: int = 0
+    probe_errors: int = 0
+    listen_key_valid: Optional[bool] = None
+    closed: Optional[float] = None
+    close_reason: Optional[str] = None
+
+    def observe(self, msg: Any, received: float) -> None:
+        self.messages += 1
+        self.last_message = received
+        ts = msg.get("E") if isinstance(msg, dict) else None
+        if isinstance(ts, (int, float)) and ts > 0:
+            lag = received * 1000 - ts
+            self.event_lag_ms = lag
+            self.event_lag_max_ms = max(self.event_lag_max_ms, lag)
+            self.event_lag_avg_ms = _ewma(self.event_lag_avg_ms, lag)
+
+    def record_pong(self, rtt: float, received: float) -> None:
+        rtt_ms = rtt * 1000
+        self.pings += 1
+        self.last_pong = received
+        self.ping_rtt_ms = rtt_ms
+        self.ping_rtt_max_ms = max(self.ping_rtt_max_ms, rtt_ms)
+        self.ping_rtt_avg_ms = _ewma(self.ping_rtt_avg_ms, rtt_ms)
+
+    @property
+    def last_alive(self) -> float:
+        """Wall time of the last sign of life (message, pong or connect)."""
+        return max(self.started, self.last_message or 0.0, self.last_pong or 0.0)
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        if self.listen_key:
+            data["listen_key"] = self.listen_key[:6] + "…"
+        return data
 
-    This loop sleeps for ``interval`` seconds between keepalive calls.  It is
-    cancelled when the websocket connection is closed or the watcher is
-    stopped.
+
+def _ewma(avg: Optional[float], sample: float) -> float:
+    return sample if avg is None else avg + EWMA_ALPHA * (sample - avg)
+
+
+class LeaderStreamSupervisor:
+    """Keep one leader websocket alive and feed its messages to ``consumer``.
+
+    ``create_listen_key`` may return ``None`` for streams without a listen
+    key (e.g. a fixed playback URL); keepalive and rotation are skipped then.
+    ``on_connect`` is called after every (re)connect. ``ping`` sends a
+    websocket ping on the current connection and returns the round trip in
+    seconds; ``probe_listen_key`` returns ``False`` when the exchange no
+    longer knows the key (errors reaching the exchange are only counted).
     """
 
-    try:
+    def __init__(
+        self,
+        create_listen_key: ListenKeyFactory,
+        connect_ws: WsConnector,
+        keepalive_listen_key: KeepAliveFunc | None = None,
+        consumer: Consumer | None = None,
+        *,
+        keepalive_interval: float = KEEPALIVE_INTERVAL,
+        rotate_after: float | None = ROTATE_AFTER,
+        max_silence: float | None = None,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_max: float = BACKOFF_MAX,
+        on_connect: Callable[[], None] | None = None,
+        ping: PingFunc | None = None,
+        ping_interval: float = PING_INTERVAL,
+        ping_timeout: float = PING_TIMEOUT,
+        probe_listen_key: ProbeFunc | None = None,
+        probe_interval: float = PROBE_INTERVAL,
+    ) -> None:
+        self._create_listen_key = create_listen_key
+        self._connect_ws = connect_ws
+        self._keepalive = keepalive_listen_key
+        self._consumer = consumer
+        self.keepalive_interval = keepalive_interval
+        self.rotate_after = rotate_after
+        self.max_silence = max_silence
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._on_connect = on_connect
+        self._ping = ping
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self._probe = probe_listen_key
+        self.probe_interval = probe_interval
+        self.state = "idle"
+        self.failures = 0
+        self.counters = {
+            "connects": 0,
+            "reconnects": 0,
+            "rotations": 0,
+            "keepalive_failures": 0,
+            "stale": 0,
+            "ping_timeouts": 0,
+            "invalid_listen_keys": 0,
+            "errors": 0,
+        }
+        self.current: ConnectionStats | None = None
+        self.recent: deque[ConnectionStats] = deque(maxlen=RECENT_CONNECTIONS)
+        self._ids = 0
+        self._stop: asyncio.Event | None = None
+        self._stop_reason = ""
+
+    def backoff(self, failures: int) -> float:
+        """Delay before the next attempt after ``failures`` failed ones."""
+        if failures <= 0:
+            return 0.0
+        return min(self.backoff_max, self.backoff_base * 2 ** (failures - 1))
+
+    def request_reconnect(self, reason: str) -> None:
+        """Close the current connection and open a new one."""
+        if self._stop is not None and not self._stop.is_set():
+            self._stop_reason = reason
+            self._stop.set()
+
+    def liveness(self) -> Dict[str, Any]:
+        """Current liveness summary (also part of :meth:`status`)."""
+        conn = self.current
+        if conn is None or conn.connect_s is None:
+            return {"alive": False, "silence_s": None, "ping_rtt_ms": None, "listen_key_valid": None}
+        silence = time.time() - conn.last_alive
+        return {
+            "alive": self.max_silence is None or silence < self.max_silence,
+            "silence_s": round(silence, 3),
+            "ping_rtt_ms": conn.ping_rtt_ms,
+            "listen_key_valid": conn.listen_key_valid,
+        }
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "liveness": self.liveness(),
+            **self.counters,
+            "current": self.current.as_dict() if self.current else None,
+            "recent": [s.as_dict() for s in self.recent],
+        }
+
+    async def run(self) -> None:
+        """Run until cancelled."""
+        try:
+            while True:
+                self.state = "connecting"
+                try:
+                    listen_key = await self._create_listen_key()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    self.failures += 1
+                    self.counters["errors"] += 1
+                    delay = self.backoff(self.failures)
+                    logger.error("listen key request failed: %r, retrying in %.1fs", exc, delay)
+                    self.state = "backoff"
+                    await asyncio.sleep(delay)
+                    continue
+
+                reason, healthy = await self._session(listen_key)
+                self.failures = 0 if healthy else self.failures + 1
+                self.counters["reconnects"] += 1
+                if reason == "rotate":
+                    self.counters["rotations"] += 1
+                    continue
+                delay = self.backoff(self.failures)
+                if delay:
+                    self.state = "backoff"
+                    logger.info("websocket %s, reconnecting in %.1fs", reason, delay)
+                    await asyncio.sleep(delay)
+        finally:
+            self.state = "stopped"
+
+    async def _session(self, listen_key: Optional[str]) -> tuple[str, bool]:
+        """Run one connection; return why it ended and whether it was healthy."""
+        self._ids += 1
+        stats = self.current = ConnectionStats(self._ids, listen_key)
+        self._stop = asyncio.Event()
+        self._stop_reason = ""
+        timers = []
+        if self._ping is not None:
+            timers.append(asyncio.create_task(self._ping_loop(stats)))
+        if listen_key is not None and self._keepalive is not None:
+            timers.append(asyncio.create_task(self._keepalive_loop(listen_key)))
+            if self.rotate_after:
+                timers.append(asyncio.create_task(self._rotate_timer(self.rotate_after)))
+        if listen_key is not None and self._probe is not None:
+            timers.append(asyncio.create_task(self._probe_loop(listen_key, stats)))
+        try:
+            reason = await self._read(self._connect_ws(listen_key), stats)
+        finally:
+            for task in timers:
+                task.cancel()
+            for task in timers:
+                with contextlib.suppress(BaseException):
+                    await task
+            stats.closed = time.time()
+            stats.close_reason = stats.close_reason or "cancelled"
+            self.recent.append(stats)
+            self.current = None
+            self._stop = None
+        stats.close_reason = reason
+        logger.info(
+            "websocket #%d closed (%s) after %d messages, connect=%.3fs lag_avg=%sms",
+            stats.conn_id, reason, stats.messages, stats.connect_s or 0.0,
+            None if stats.event_lag_avg_ms is None else round(stats.event_lag_avg_ms, 1),
+        )
+        return reason, stats.connect_s is not None
+
+    async def _read(self, stream: AsyncIterator[Any], stats: ConnectionStats) -> str:
+        attempt = time.monotonic()
+        stopper = asyncio.ensure_future(self._stop.wait())
+        nxt: asyncio.Future | None = None
+        try:
+            while True:
+                # 读取放在独立任务里：只取消读取，绝不取消正在处理消息的 consumer
+                if nxt is None:
+                    nxt = asyncio.ensure_future(stream.__anext__())
+                timeout = None
+                if self.max_silence is not None:
+                    # 消息与 pong 都算存活信号
+                    timeout = max(0.0, stats.last_alive + self.max_silence - time.time())
+                done, _ = await asyncio.wait(
+                    (nxt, stopper), timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if nxt not in done:
+                    if stopper in done:
+                        return self._stop_reason
+                    if time.time() - stats.last_alive < self.max_silence:
+                        continue
+                    self.counters["stale"] += 1
+                    logger.warning("no websocket data for %.1fs, reconnecting", self.max_silence)
+                    return "stale"
+                try:
+                    msg = nxt.result()
+                    nxt = None
+                except StopAsyncIteration:
+                    return "closed"
+                except Exception as exc:
+                    self.counters["errors"] += 1
+                    logger.warning("websocket error: %r", exc)
+                    return "error"
+                if stats.connect_s is None:
+                    stats.connect_s = time.monotonic() - attempt
+                    self.counters["connects"] += 1
+                    self.state = "connected"
+                    if self._on_connect is not None:
+                        try:
+                            self._on_connect()
+                        except Exception:
+                            self.counters["errors"] += 1
+                            logger.exception("on_connect callback failed")
+                if msg is OPEN:
+                    continue
+                received = time.time()
+                stats.observe(msg, received)
+                if self._consumer is not None:
+                    # 单条消息处理失败只记录，不能终止整条 leader 数据流
+                    try:
+                        res = self._consumer(msg)
+                        if inspect.isawaitable(res):
+                            await res
+                    except Exception:
+                        self.counters["errors"] += 1
+                        logger.exception("consumer failed on websocket message")
+                    stats.consume_avg_ms = _ewma(
+                        stats.consume_avg_ms, (time.time() - received) * 1000
+                    )
+        finally:
+            stopper.cancel()
+            if nxt is not None and not nxt.done():
+                nxt.cancel()
+                with contextlib.suppress(BaseException):
+                    await nxt
+            with contextlib.suppress(BaseException):
+                await stream.aclose()
+
+    async def _keepalive_loop(self, listen_key: str) -> None:
+        """Periodically invoke the keepalive; a failure forces a new listen key."""
         while True:
-            await asyncio.sleep(interval)
-            await keepalive(listen_key)
-    except asyncio.CancelledError:
-        # Normal shutdown of the keepalive task.
-        pass
+            await asyncio.sleep(self.keepalive_interval)
+            try:
+                await self._keepalive(listen_key)
+            except Exception as exc:
+                self.counters["keepalive_failures"] += 1
+                logger.warning("listen key keepalive failed: %r", exc)
+                self.request_reconnect("keepalive_failed")
+                return
+
+    async def _ping_loop(self, stats: ConnectionStats) -> None:
+        """Ping the connection; a missing pong means the socket is dead."""
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            if stats.connect_s is None:
+                continue
+            try:
+                rtt = await asyncio.wait_for(self._ping(), self.ping_timeout)
+            except Exception as exc:
+                self.counters["ping_timeouts"] += 1
+                logger.warning("websocket ping failed: %r", exc)
+                self.request_reconnect("ping_timeout")
+                return
+            stats.record_pong(rtt, time.time())
+
+    async def _probe_loop(self, listen_key: str, stats: ConnectionStats) -> None:
+        """Confirm over REST that ``listen_key`` is still known to the exchange."""
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                valid = await self._probe(listen_key)
+            except Exception as exc:
+                stats.probe_errors += 1
+                logger.warning("listen key probe failed: %r", exc)
+                continue
+            stats.probes += 1
+            stats.listen_key_valid = valid
+            if not valid:
+                self.counters["invalid_listen_keys"] += 1
+                logger.warning("listen key no longer valid, reconnecting")
+                self.request_reconnect("listen_key_invalid")
+                return
+
+    async def _rotate_timer(self, after: float) -> None:
+        await asyncio.sleep(after)
+        logger.info("rotating listen key after %.0fs", after)
+        self.request_reconnect("rotate")
 
 
 async def watch_leader_orders(
     create_listen_key: ListenKeyFactory,
     connect_ws: WsConnector,
     keepalive_listen_key: KeepAliveFunc,
-    keepalive_interval: float = 30 * 60,
+    keepalive_interval: float = KEEPALIVE_INTERVAL,
+    *,
+    consumer: Consumer | None = None,
+    **options: Any,
 ) -> None:
-    """Watch leader orders via websocket.
-
-    The coroutine obtains an initial listen key, starts a background task to
-    keep it alive and then consumes messages from the websocket connection
-    provided by ``connect_ws``.  If the connection ends or raises an
-    exception it will attempt to fetch a new listen key and resume watching.
-
-    Parameters
-    ----------
-    create_listen_key:
-        Coroutine returning a new listen key.
-    connect_ws:
-        Callable receiving a listen key and returning an asynchronous iterator
-        yielding websocket messages.
-    keepalive_listen_key:
-        Coroutine used to keep the listen key alive.
-    keepalive_interval:
-        Interval in seconds between keepalive calls.  Defaults to thirty
-        minutes which mirrors Binance's listen key policy.  Tests can reduce
-        this for faster execution.
-    """
+    """Watch leader orders via websocket until cancelled.
 
-    listen_key = await create_listen_key()
-
-    while True:
-        keepalive_task = asyncio.create_task(
-            _keepalive_loop(listen_key, keepalive_listen_key, keepalive_interval)
-        )
-        try:
-            async for _ in connect_ws(listen_key):
-                # The actual message processing is not implemented here.  The
-                # caller can wrap ``connect_ws`` to process messages as needed.
-                await asyncio.sleep(0)  # allow cancellation between messages
-        except asyncio.CancelledError:
-            keepalive_task.cancel()
-            with contextlib.suppress(Exception):
-                await keepalive_task
-            raise
-        except Exception:
-            # Connection dropped.  Fall through to obtain a new listen key.
-            pass
-        finally:
-            keepalive_task.cancel()
-            with contextlib.suppress(Exception):
-                await keepalive_task
+    Thin wrapper around :class:`LeaderStreamSupervisor`; ``options`` are
+    passed through (``rotate_after``, ``max_silence``, ``backoff_base``,
+    ``backoff_max``, ``on_connect``, ``ping``, ``probe_listen_key`` and
+    their intervals). Without a ``consumer`` messages are
+    read and discarded.
+    """
 
-        # Obtain a new listen key and retry the connection.
-        listen_key = await create_listen_key()
+    await LeaderStreamSupervisor(
+        create_listen_key,
+        connect_ws,
+        keepalive_listen_key,
+        consumer,
+        keepalive_interval=keepalive_interval,
+        **options,
+    ).run()
@@ -1,3 +1,4 @@
+import inspect
 import sys
 from pathlib import Path
 import pytest
@@ -32,9 +33,13 @@ def dummy_binance_sdk(monkeypatch):
         async def get_balance(self):
             return {"USDT": 100.0, "BTC": 1.0}
 
-        async def start_user_socket(self, callback):
+        async def start_user_socket(self, callback, *, on_connect=None):
+            if on_connect is not None:
+                on_connect()
             for ev in self.events:
-                callback(ev)
+                res = callback(ev)
+                if inspect.isawaitable(res):
+                    await res
 
         async def __aenter__(self):  # pragma: no cover - simple passthrough
             return self
@@ -42,11 +47,11 @@ def dummy_binance_sdk(monkeypatch):
         async def __aexit__(self, exc_type, exc, tb):  # pragma: no cover
             return None
 
-        async def order_market_buy(self, symbol, quote_amount):
+        async def order_market_buy(self, symbol, quote_amount, client_order_id=None):
             self.order_calls.append(("BUY", quote_amount))
             return {"symbol": symbol, "quote": quote_amount}
 
-        async def order_market_sell(self, symbol, quantity):
+        async def order_market_sell(self, symbol, quantity, client_order_id=None):
             self.order_calls.append(("SELL", quantity))
             return {"symbol": symbol, "base": quantity}
 
@@ -94,3 +94,59 @@ async def test_update_failure_retains_previous_balance(monkeypatch):
     svc._cache["acc1"] = {"BTC": 0.5, "USDT": 10.0, "stale": False}
     await svc.update_balance("acc1")
     assert svc._cache["acc1"] == {"BTC": 0.5, "USDT": 10.0, "stale": True}
+
+
+@pytest.mark.asyncio
+async def test_apply_fill_updates_cache_and_defers_refresh(monkeypatch):
+    svc = BalanceService(refresh_delay=0.01)
+    svc._cache["acc1"] = {"BTC": 1.0, "USDT": 100.0, "stale": False}
+    refreshed = []
+
+    async def fake_update(name):
+        refreshed.append(name)
+
+    monkeypatch.setattr(svc, "update_balance", fake_update)
+
+    svc.apply_fill(
+        "acc1",
+        "BUY",
+        {
+            "executedQty": "0.001",
+            "cummulativeQuoteQty": "60.0",
+            "fills": [{"commission": "0.000001", "commissionAsset": "BTC"}],
+        },
+    )
+    svc.apply_fill("acc2", "SELL", {"code": "00000", "data": {"orderId": "1"}})
+
+    balance = await svc.get_balance("acc1")
+    assert balance["USDT"] == pytest.approx(40.0)
+    assert balance["BTC"] == pytest.approx(1.000999)
+    assert refreshed == []
+
+    await svc._refresh_task
+    assert sorted(refreshed) == ["acc1", "acc2"]
+
+
+@pytest.mark.asyncio
+async def test_refresh_started_before_fill_is_discarded(monkeypatch):
+    svc = BalanceService()
+    account = SimpleNamespace(
+        name="acc1", exchange="binance", env="test", api_key="k", api_secret="s"
+    )
+    monkeypatch.setattr(
+        balances, "account_service", SimpleNamespace(list_accounts=lambda: [account])
+    )
+
+    class SlowConnector:
+        def __init__(self, api_key, api_secret, testnet=False):
+            pass
+
+        async def get_balance(self):
+            svc.apply_fill("acc1", "SELL", {"executedQty": "0.5", "cummulativeQuoteQty": "30"})
+            return {"BTC": 1.0, "USDT": 0.0}
+
+    monkeypatch.setattr(svc, "schedule_refresh", lambda name: None)
+    svc._connectors["binance"] = SlowConnector
+    svc._cache["acc1"] = {"BTC": 1.0, "USDT": 0.0, "stale": False}
+    await svc.update_balance("acc1")
+    assert svc._cache["acc1"] == {"BTC": 0.5, "USDT": 30.0, "stale": False}
@@ -0,0 +1,128 @@
+import asyncio
+import hmac
+import json
+from hashlib import sha256
+from urllib.parse import urlencode
+
+import pytest
+import websockets
+
+from server.connectors import binance_ws_api
+from server.connectors.binance import BinanceConnector
+from server.connectors.binance_ws_api import (
+    BinanceWsApiConnector,
+    WsApiDisconnected,
+    WsApiError,
+    WsApiSessionPool,
+)
+from server.retry import is_retryable, needs_lookup
+
+SECRET = "secret"
+
+
+def _signed(params):
+    params = dict(params)
+    signature = params.pop("signature")
+    payload = urlencode(sorted(params.items()))
+    return signature == hmac.new(SECRET.encode(), payload.encode(), sha256).hexdigest()
+
+
+async def _handler(ws):
+    async for raw in ws:
+        req = json.loads(raw)
+        params = req["params"]
+        if not _signed(params):
+            reply = {"id": req["id"], "status": 401, "error": {"code": -1022, "msg": "bad signature"}}
+        elif req["method"] == "order.status":
+            reply = {"id": req["id"], "status": 400, "error": {"code": -2013, "msg": "missing"}}
+        elif params.get("quoteOrderQty") == "666":
+            reply = {"id": req["id"], "status": 400, "error": {"code": -2010, "msg": "rejected"}}
+        elif params.get("quoteOrderQty") == "999":
+            await ws.close()
+            return
+        else:
+            if params.get("quoteOrderQty") == "1":
+                # 第一笔慢响应，验证按 id 关联而非按顺序
+                asyncio.get_running_loop().call_later(
+                    0.05, asyncio.ensure_future, ws.send(json.dumps(
+                        {"id": req["id"], "status": 200, "result": {"clientOrderId": params["newClientOrderId"]}}
+                    ))
+                )
+                continue
+            reply = {"id": req["id"], "status": 200, "result": {"clientOrderId": params["newClientOrderId"]}}
+        await ws.send(json.dumps(reply))
+
+
+def _run(body, monkeypatch):
+    monkeypatch.setattr(binance_ws_api, "ws_api_sessions", WsApiSessionPool())
+
+    async def main():
+        async with websockets.serve(_handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            conn = BinanceWsApiConnector("key", SECRET, url=f"ws://127.0.0.1:{port}")
+            try:
+                return await body(conn)
+            finally:
+                await conn.close()
+                await binance_ws_api.ws_api_sessions.aclose()
+
+    return asyncio.run(main())
+
+
+def test_orders_are_correlated_by_id(monkeypatch):
+    async def body(conn):
+        return await asyncio.gather(
+            conn.order_market_buy("BTCUSDT", 1, client_order_id="slow"),
+            conn.order_market_buy("BTCUSDT", 2, client_order_id="fast"),
+            conn.order_market_sell("BTCUSDT", 0.1, client_order_id="sell"),
+        )
+
+    results = _run(body, monkeypatch)
+    assert [r["clientOrderId"] for r in results] == ["slow", "fast", "sell"]
+
+
+def test_rejection_and_lookup(monkeypatch):
+    async def body(conn):
+        with pytest.raises(WsApiError) as info:
+            await conn.order_market_buy("BTCUSDT", 666, client_order_id="x")
+        assert info.value.code == -2010 and info.value.status_code == 400
+        assert not is_retryable(info.value, "binance")
+        assert await conn.get_order("BTCUSDT", "x") is None
+
+    _run(body, monkeypatch)
+
+
+def test_disconnect_after_send_needs_lookup(monkeypatch):
+    async def body(conn):
+        with pytest.raises(WsApiDisconnected) as info:
+            await conn.order_market_buy("BTCUSDT", 999, client_order_id="x")
+        assert needs_lookup(info.value, "binance")
+        # 下一笔订单自动重连
+        assert (await conn.order_market_buy("BTCUSDT", 2, client_order_id="y"))["clientOrderId"] == "y"
+
+    _run(body, monkeypatch)
+
+
+def test_falls_back_to_rest_when_unreachable(monkeypatch):
+    calls = []
+
+    async def fake_rest(self, api_key, api_secret, side, **kwargs):
+        calls.append((side, kwargs))
+        return {"via": "rest"}
+
+    monkeypatch.setattr(BinanceConnector, "create_market_order", fake_rest)
+    monkeypatch.setattr(binance_ws_api, "ws_api_sessions", WsApiSessionPool())
+
+    async def main():
+        conn = BinanceWsApiConnector("key", SECRET, url="ws://127.0.0.1:1")
+        async with conn:
+            first = await conn.order_market_buy("BTCUSDT", 5, client_order_id="a")
+            second = await conn.order_market_sell("BTCUSDT", 0.5, client_order_id="b")
+        return first, second
+
+    assert asyncio.run(main()) == ({"via": "rest"}, {"via": "rest"})
+    assert calls[0] == ("BUY", {
+        "quote_amount": 5, "base_amount": None, "symbol": "BTCUSDT",
+        "client_order_id": "a", "test": False,
+    })
+    assert calls[1][1]["base_amount"] == 0.5
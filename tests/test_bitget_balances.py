@@ -56,3 +56,49 @@ async def test_balance_endpoint_returns_values(monkeypatch, tmp_path):
     resp = client.get("/api/balances/acc1")
     assert resp.status_code == 200
     assert resp.json() == {"BTC": 0.5, "USDT": 100.0, "stale": False}
+
+
+@pytest.mark.asyncio
+async def test_bulk_balances_versioning(monkeypatch, tmp_path):
+    client, accounts_mod, balances_mod = await _setup(tmp_path)
+    svc = balances_mod.balance_service
+
+    resp = client.get("/api/balances")
+    assert resp.status_code == 200
+    epoch = svc.epoch
+    assert resp.json() == {"epoch": epoch, "version": 0, "balances": {}}
+
+    svc._set_cache("acc1", {"BTC": 0.5, "USDT": 100.0, "stale": False})
+    svc._set_cache("acc2", {"BTC": 0.1, "USDT": 1.0, "stale": False})
+    resp = client.get("/api/balances")
+    body = resp.json()
+    assert body["version"] == 2 and body["epoch"] == epoch
+    assert set(body["balances"]) == {"acc1", "acc2"}
+    etag = resp.headers["etag"]
+
+    resp = client.get("/api/balances", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert client.get("/api/balances", params={"since": 2, "epoch": epoch}).status_code == 304
+
+    svc._set_cache("acc2", {"BTC": 0.2, "USDT": 1.0, "stale": False})
+    svc._set_cache("acc1", {"BTC": 0.5, "USDT": 100.0, "stale": False})  # unchanged
+    resp = client.get("/api/balances", params={"since": 2, "epoch": epoch})
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "epoch": epoch,
+        "version": 3,
+        "balances": {"acc2": {"BTC": 0.2, "USDT": 1.0, "stale": False}},
+    }
+    assert resp.headers["etag"] != etag
+
+    # After a restart (new epoch) or with a version ahead of the server the
+    # client gets the full snapshot instead of a false 304.
+    full = {"acc1", "acc2"}
+    resp = client.get("/api/balances", params={"since": 3, "epoch": "old"})
+    assert resp.status_code == 200 and set(resp.json()["balances"]) == full
+    resp = client.get("/api/balances", params={"since": 3})
+    assert resp.status_code == 200 and set(resp.json()["balances"]) == full
+    resp = client.get("/api/balances", params={"since": 50, "epoch": epoch})
+    assert resp.status_code == 200 and set(resp.json()["balances"]) == full
+    stale_etag = '"old-3"'
+    assert client.get("/api/balances", headers={"If-None-Match": stale_etag}).status_code == 200
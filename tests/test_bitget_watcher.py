@@ -0,0 +1,154 @@
+import asyncio
+import base64
+import contextlib
+import hmac
+import json
+from hashlib import sha256
+
+import pytest
+import websockets
+
+from server.bitget_watcher import BitgetFillTracker, order_report, translate, watch_bitget_leader_orders
+from server.connectors.bitget import BitgetConnector
+
+SECRET = "secret"
+
+
+def _order(oid, status, side="buy", base="0.001", price="10000", ts=1000, **extra):
+    return {"instId": "BTCUSDT", "orderId": oid, "clientOid": f"c{oid}", "side": side,
+            "orderType": "market", "status": status, "accBaseVolume": base,
+            "priceAvg": price, "size": "10", "notional": "10", "uTime": str(ts), **extra}
+
+
+def _push(channel, data):
+    return json.dumps({"action": "snapshot", "arg": {"instType": "SPOT", "channel": channel},
+                       "data": data})
+
+
+class BitgetServer:
+    """Private websocket emulator: checks the login signature, answers pings."""
+
+    def __init__(self, sessions):
+        self.sessions = list(sessions)
+        self.pings = 0
+        self.subscribed = []
+
+    async def handler(self, ws):
+        login = json.loads(await ws.recv())["args"][0]
+        expected = base64.b64encode(hmac.new(
+            SECRET.encode(), f"{login['timestamp']}GET/user/verify".encode(), sha256
+        ).digest()).decode()
+        if login["sign"] != expected or login["passphrase"] != "pp":
+            await ws.send(json.dumps({"event": "error", "code": 30005, "msg": "login failed"}))
+            return
+        await ws.send(json.dumps({"event": "login", "code": 0}))
+        self.subscribed.append(json.loads(await ws.recv())["args"])
+        pushes = self.sessions.pop(0) if self.sessions else []
+        for frame in pushes:
+            await ws.send(frame)
+        async for raw in ws:
+            if raw == "ping":
+                self.pings += 1
+                await ws.send("pong")
+
+
+async def _collect(server, n, monkeypatch, history=(), ping_interval=0.05):
+    async def get_balance(self, api_key, api_secret, passphrase):
+        return {"USDT": 100.0, "BTC": 1.0}
+
+    async def get_order_history(self, api_key, api_secret, passphrase, *, symbol, start_time=None):
+        return list(history)
+
+    monkeypatch.setattr(BitgetConnector, "get_balance", get_balance)
+    monkeypatch.setattr(BitgetConnector, "get_order_history", get_order_history)
+    monkeypatch.setattr("server.bitget_watcher.RECONNECT_DELAY", 0.01)
+
+    activity = []
+    async with websockets.serve(server.handler, "127.0.0.1", 0) as srv:
+        port = srv.sockets[0].getsockname()[1]
+        agen = watch_bitget_leader_orders(
+            "key", SECRET, "pp", ws_url=f"ws://127.0.0.1:{port}",
+            on_activity=activity.append, ping_interval=ping_interval,
+        )
+        events = []
+        try:
+            while len(events) < n:
+                events.append(await asyncio.wait_for(agen.__anext__(), 2))
+        finally:
+            with contextlib.suppress(BaseException):
+                await agen.aclose()
+    return events, activity
+
+
+def test_translate_matches_binance_schema():
+    report = translate(json.loads(_push("orders", [_order("1", "filled")])))[0]
+    assert report["e"] == "executionReport" and report["X"] == "FILLED" and report["o"] == "MARKET"
+    assert report["S"] == "BUY" and report["z"] == 0.001 and report["Z"] == 10.0 and report["Q"] == 10.0
+    balance = translate(json.loads(_push("account", [{"coin": "USDT", "available": "90", "uTime": "5"}])))[0]
+    assert balance == {"e": "outboundAccountPosition", "E": 5, "B": [{"a": "USDT", "f": "90"}]}
+    assert translate({"event": "subscribe", "arg": {"channel": "orders"}}) == []
+
+
+def test_tracker_uses_balance_frame_order():
+    tracker = BitgetFillTracker(100.0, 1.0)
+    event = tracker.feed(order_report(_order("1", "filled", ts=1000)))
+    # 余额推送晚于成交：按成交额推算成交后余额
+    assert event.balances == {"USDT": pytest.approx(90.0), "BTC": pytest.approx(1.001)}
+    assert tracker.feed(order_report(_order("1", "filled", ts=1000))) is None
+    # 余额推送早于成交推送：余额已包含该笔成交
+    tracker.feed({"e": "outboundAccountPosition", "E": 3000,
+                  "B": [{"a": "USDT", "f": "80"}, {"a": "BTC", "f": "1.002"}]})
+    event = tracker.feed(order_report(_order("2", "filled", ts=2000)))
+    assert event.balances == {"USDT": 80.0, "BTC": 1.002}
+
+
+def test_watcher_emits_fill_events(monkeypatch):
+    server = BitgetServer([[
+        _push("orders", [_order("7", "live", base="0", price="0")]),
+        _push("orders", [_order("7", "filled", ts=2000)]),
+        _push("account", [{"coin": "USDT", "available": "90", "uTime": "2001"}]),
+        _push("orders", [_order("8", "filled", side="sell", base="0.5", price="100", ts=3000)]),
+    ]])
+    events, activity = asyncio.run(_collect(server, 2, monkeypatch))
+    assert [e.event_id for e in events] == ["7-2000-10.0", "8-3000-50.0"]
+    assert events[0].side == "BUY" and events[0].quote_filled == 10.0
+    assert events[0].balances == {"USDT": pytest.approx(90.0), "BTC": pytest.approx(1.001)}
+    assert events[1].balances == {"USDT": pytest.approx(140.0), "BTC": pytest.approx(0.501)}
+    assert activity == ["leader_reconnect", "leader_new"]
+    assert server.subscribed[0][0]["channel"] == "orders"
+
+
+def test_reconnect_backfills_missed_fills(monkeypatch):
+    class DroppingServer(BitgetServer):
+        async def handler(self, ws):
+            if not self.subscribed:
+                await ws.recv()  # login
+                await ws.send(json.dumps({"event": "login", "code": 0}))
+                self.subscribed.append(json.loads(await ws.recv())["args"])
+                await ws.send(_push("orders", [_order("1", "filled", ts=1000)]))
+                return  # 断线
+            await super().handler(ws)
+
+    server = DroppingServer([[]])
+    history = [
+        {**_order("1", "filled", ts=1000), "quoteVolume": "10"},  # 已推送过，不重复
+        {**_order("2", "filled", ts=2000), "quoteVolume": "20", "baseVolume": "0.002"},
+        {**_order("3", "cancelled", ts=2500)},
+    ]
+    events, activity = asyncio.run(_collect(server, 2, monkeypatch, history=history))
+    assert [e.event_id for e in events] == ["1-1000-10.0", "2-2000-20.0"]
+    assert activity == ["leader_reconnect", "leader_reconnect"]
+
+
+def test_keepalive_pings(monkeypatch):
+    server = BitgetServer([[_push("orders", [_order("1", "filled")])]])
+
+    async def main():
+        task = asyncio.ensure_future(_collect(server, 2, monkeypatch, ping_interval=0.02))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with contextlib.suppress(BaseException):
+            await task
+
+    asyncio.run(main())
+    assert server.pings >= 3
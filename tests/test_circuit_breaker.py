@@ -0,0 +1,160 @@
+import asyncio
+from dataclasses import dataclass
+
+from server.accounts import Account, AccountStatus
+from server.circuit_breaker import BreakerRegistry, BreakerState, CircuitBreaker
+from server.copy_dispatcher import CopyDispatcher
+from server.idempotency import IdempotencyStore
+from server.retry import is_exchange_fault
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0)
+    assert breaker.allow(0.0)
+    breaker.record_failure(0.0, "boom")
+    breaker.record_failure(1.0, "boom")
+    assert breaker.state is BreakerState.OPEN
+    assert not breaker.allow(5.0)
+    assert breaker.allow(11.0)
+    assert breaker.state is BreakerState.HALF_OPEN
+    assert not breaker.allow(11.5)  # 半开期间只放行一次试探
+    breaker.record_failure(11.0, "boom")
+    assert breaker.state is BreakerState.OPEN and breaker.trips == 2
+    assert breaker.allow(22.0)
+    breaker.record_success()
+    assert breaker.state is BreakerState.CLOSED and breaker.trips == 0
+
+
+def test_registry_exchange_breaker_blocks_all_accounts():
+    clock = Clock()
+    reg = BreakerRegistry(account_threshold=5, exchange_threshold=2, clock=clock)
+    reg.record("a", "bitget", {"success": False, "error": "503"})
+    reg.record("b", "bitget", {"success": False, "error": "503"})
+    assert reg.allow("c", "bitget") == (False, "circuit open: exchange bitget")
+    assert reg.allow("c", "binance") == (True, None)
+    assert reg.snapshot()["exchanges"]["bitget"]["state"] == "open"
+
+
+def test_half_open_trial_is_lost_only_after_a_timeout():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10.0)
+    breaker.record_failure(0.0, "boom")
+    assert breaker.would_allow(10.0) and breaker.state is BreakerState.OPEN
+    assert breaker.allow(10.0)
+    assert not breaker.allow(15.0)
+    assert breaker.allow(20.0)  # 试探结果一直未回来，换一次新的试探
+
+
+def test_registry_takes_half_open_trial_only_when_both_allow():
+    clock = Clock()
+    reg = BreakerRegistry(account_threshold=1, exchange_threshold=1, reset_timeout=10.0, clock=clock)
+    reg.record("a", "binance", {"success": False, "error": "503"})
+    clock.now = 5.0
+    reg.record("b", "bitget", {"success": False, "error": "bad key"}, exchange_fault=False)
+    clock.now = 11.0
+    # b 的账户熔断仍然打开：交易所的试探名额不能被它占用
+    assert reg.check("b", "binance") == "circuit open: account b"
+    assert reg.allow("b", "binance") == (False, "circuit open: account b")
+    assert reg.allow("c", "binance") == (True, None)
+    assert reg.allow("d", "binance") == (False, "circuit open: exchange binance")
+
+
+def test_account_rejections_do_not_open_the_exchange_breaker():
+    class Rejected(Exception):
+        code = -2010  # insufficient balance
+
+    class Banned(Exception):
+        status_code = 429
+
+    assert not is_exchange_fault(Rejected(), "binance")
+    assert not is_exchange_fault(RuntimeError("API-key revoked"), "binance")
+    assert is_exchange_fault(Banned(), "binance")
+    assert is_exchange_fault(asyncio.TimeoutError(), "binance")
+
+    reg = BreakerRegistry(account_threshold=100, exchange_threshold=2, clock=Clock())
+    for name in ("a", "b", "c"):
+        reg.record(name, "binance", {"success": False, "error": "rejected"}, exchange_fault=False)
+    assert reg.allow("d", "binance") == (True, None)
+    assert reg.snapshot()["exchanges"]["binance"]["failures"] == 0
+
+
+@dataclass
+class StubAccounts:
+    accounts: list
+    paused: list
+
+    def list_accounts(self):
+        return [a for a in self.accounts if a.status == AccountStatus.ACTIVE]
+
+    def update_account(self, name, **updates):
+        self.paused.append(name)
+        for a in self.accounts:
+            if a.name == name:
+                a.status = updates["status"]
+
+
+class StubBalances:
+    async def get_balance(self, name):
+        return {"USDT": 100.0, "BTC": 1.0}
+
+    def apply_fill(self, name, side, result):
+        pass
+
+
+class FailingConnector:
+    calls = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def order_market_buy(self, symbol, quote_amount, client_order_id=None):
+        FailingConnector.calls += 1
+        raise RuntimeError("API-key revoked")
+
+    async def close(self):
+        pass
+
+
+def test_dispatcher_skips_open_breaker_and_pauses_hopeless_account(tmp_path):
+    async def main():
+        clock = Clock()
+        account = Account(
+            name="acc1", exchange="binance", env="test", api_key="k", api_secret="s"
+        )
+        accounts = StubAccounts([account], [])
+        reg = BreakerRegistry(
+            account_threshold=2, reset_timeout=10.0, pause_after_trips=2, clock=clock
+        )
+        dispatcher = CopyDispatcher(
+            accounts, StubBalances(), IdempotencyStore(str(tmp_path / "i.json")), reg
+        )
+        dispatcher._connectors = {"binance": FailingConnector}
+
+        async def fire(i):
+            await dispatcher.dispatch(
+                {"event_id": i, "side": "BUY", "quote_filled": 10.0, "leader_pre_usdt": 100.0}
+            )
+
+        await fire(1)
+        await fire(2)
+        assert FailingConnector.calls == 2
+        await fire(3)
+        assert FailingConnector.calls == 2
+        assert dispatcher.get_last_results()["acc1"]["error"] == "circuit open: account acc1"
+
+        clock.now = 11.0
+        await fire(4)  # half-open trial fails -> second trip -> paused
+        assert FailingConnector.calls == 3
+        assert accounts.paused == ["acc1"]
+        assert account.status == AccountStatus.PAUSED
+        # 单个账户的拒单不算交易所故障
+        assert reg.snapshot()["exchanges"]["binance"]["state"] == "closed"
+
+    asyncio.run(main())
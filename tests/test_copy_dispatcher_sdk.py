@@ -23,7 +23,7 @@ class StubBalances:
     async def get_balance(self, name):
         return self._balances[name]
 
-    def trigger_update(self, name):  # pragma: no cover - simple record
+    def apply_fill(self, name, side, result):  # pragma: no cover - simple record
         self.updated.append(name)
 
 
@@ -112,3 +112,17 @@ def test_sell_negative_ratio_skips_order(dummy_binance_sdk, tmp_path):
     dispatcher, calls = _dispatch_raw(event, dummy_binance_sdk, tmp_path)
     assert calls == []
     assert dispatcher.get_last_results()["acc1"]["error"] == "zero base_amt"
+
+
+def test_dispatch_appends_history(dummy_binance_sdk, tmp_path):
+    event = {
+        "event_id": "h1",
+        "side": "BUY",
+        "quote_filled": 10.0,
+        "leader_pre_usdt": 100.0,
+    }
+    dispatcher, calls = _dispatch_raw(event, dummy_binance_sdk, tmp_path)
+    record = dispatcher.get_history().query(event_id="h1")[0]
+    assert record.account == "acc1"
+    assert record.amount == pytest.approx(5.0)
+    assert record.latency_ms >= 0.0
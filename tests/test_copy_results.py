@@ -39,3 +39,35 @@ def test_copy_results_endpoint(tmp_path):
     resp = client.get("/api/copy/results")
     assert resp.status_code == 200
     assert resp.json() == {"acc1": {"success": True}}
+
+
+def test_copy_results_with_breakers(tmp_path):
+    client = _get_client(tmp_path)
+    from server.copy_dispatcher import copy_dispatcher
+
+    copy_dispatcher._last_results = {"acc1": {"success": False, "error": "boom"}}
+    copy_dispatcher._breakers.record("acc1", "binance", {"success": False, "error": "boom"})
+    resp = client.get("/api/copy/results", params={"breakers": "true"})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["results"] == {"acc1": {"success": False, "error": "boom"}}
+    assert body["breakers"]["accounts"]["acc1"]["failures"] == 1
+    assert body["breakers"]["exchanges"]["binance"]["state"] == "closed"
+
+
+def test_copy_results_history_endpoint(tmp_path):
+    client = _get_client(tmp_path)
+    from server.copy_dispatcher import copy_dispatcher
+
+    history = copy_dispatcher.get_history()
+    history.append(event_id="e1", account="acc1", exchange="binance", side="BUY",
+                   amount=10.0, success=True, order_id=42, ts=100.0)
+    history.append(event_id="e1", account="acc2", exchange="bitget", side="BUY",
+                   amount=5.0, success=False, error="boom", ts=101.0)
+    resp = client.get("/api/copy/results/history", params={"event_id": "e1"})
+    assert resp.status_code == 200
+    records = resp.json()["records"]
+    assert [r["account"] for r in records] == ["acc2", "acc1"]
+    assert records[1]["order_id"] == "42"
+    resp = client.get("/api/copy/results/history", params={"account": "acc2"})
+    assert resp.json()["records"][0]["error"] == "boom"
@@ -31,7 +31,7 @@ class DummyConnector:
         raise AssertionError("should not be called")
 
 
-async def _run_dispatch(side: str):
+async def _run_dispatch(side: str, balance=None):
     account = Account(
         name="acc1",
         exchange="binance",
@@ -40,7 +40,7 @@ async def _run_dispatch(side: str):
         api_secret="s",
     )
     accounts = StubAccounts([account])
-    balances = StubBalances({"acc1": {"USDT": 0.0, "BTC": 0.0}})
+    balances = StubBalances({"acc1": balance or {"USDT": 0.0, "BTC": 0.0}})
     dispatcher = CopyDispatcher(accounts, balances, IdempotencyStore())
     dispatcher._connectors = {"binance": DummyConnector}
     event = {
@@ -52,6 +52,7 @@ async def _run_dispatch(side: str):
         "leader_pre_btc": 1.0,
     }
     await dispatcher.dispatch(event)
+    assert dispatcher.get_breaker_states()["accounts"] == {}
     return dispatcher.get_last_results()["acc1"]
 
 
@@ -64,3 +65,9 @@ def test_zero_base_amount_recorded():
     result = asyncio.run(_run_dispatch("SELL"))
     assert result == {"success": False, "error": "zero base_amt"}
 
+
+
+def test_sub_min_notional_order_is_skipped():
+    # 0.04 BTC * 0.1% = 0.00004 BTC at the leader's 10000 USDT fill price
+    result = asyncio.run(_run_dispatch("SELL", {"USDT": 0.0, "BTC": 0.04}))
+    assert result == {"success": False, "error": "notional 0.40 below minimum 5.0"}
@@ -0,0 +1,39 @@
+import pytest
+
+from server.events import FillEvent
+
+
+def test_from_execution_report_converts_once():
+    report = {
+        "e": "executionReport",
+        "i": 123,
+        "E": 1700,
+        "S": "BUY",
+        "s": "BTCUSDT",
+        "z": "0.00100000",
+        "Z": "67.50000000",
+    }
+    event = FillEvent.from_execution_report(report, free_usdt=90.0, free_btc=1.001)
+    assert event.event_id == "123-1700-67.50000000"
+    assert event.side == "BUY"
+    assert event.base_filled == pytest.approx(0.001)
+    assert event.quote_filled == pytest.approx(67.5)
+    assert event.balances == {"USDT": 90.0, "BTC": 1.001}
+    assert event.order is report
+    assert not hasattr(event, "__dict__")
+
+
+def test_from_dict_prefers_pre_balances():
+    event = FillEvent.from_dict(
+        {
+            "event_id": "e1",
+            "side": "SELL",
+            "base_filled": "0.5",
+            "leader_pre_btc": 2.0,
+            "leader_free_btc": 1.5,
+            "leader_free_usdt": 10.0,
+        }
+    )
+    assert event.ref_btc == 2.0
+    assert event.ref_usdt == 10.0
+    assert FillEvent.from_dict(event.to_dict()) == event
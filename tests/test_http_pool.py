@@ -0,0 +1,75 @@
+import asyncio
+
+import httpx
+import requests
+
+from server.connectors import http
+from server.connectors.binance import BinanceConnector
+from server.connectors.bitget import BitgetConnector
+
+
+def test_connectors_share_one_pool_per_origin(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append(str(request.url))
+        return httpx.Response(200, json={"serverTime": 1, "data": 2})
+
+    created = []
+
+    def fake_transport(**kwargs):
+        created.append(kwargs)
+        return httpx.MockTransport(handler)
+
+    monkeypatch.setattr(http.httpx, "AsyncHTTPTransport", fake_transport)
+    monkeypatch.setattr(http, "transport_pool", http.TransportPool())
+
+    async def main():
+        for _ in range(3):
+            async with BinanceConnector() as conn:
+                assert await conn.get_time() == 1
+        async with BitgetConnector() as conn:
+            await conn.get_time()
+        origins = http.transport_pool.origins()
+        await http.transport_pool.aclose()
+        return origins
+
+    origins = asyncio.run(main())
+    assert origins == ["https://api.binance.com", "https://api.bitget.com"]
+    assert len(created) == 2
+    assert all(kw["limits"] is http.POOL_LIMITS for kw in created)
+    assert len(seen) == 4
+
+
+def test_pools_are_per_event_loop(monkeypatch):
+    monkeypatch.setattr(
+        http.httpx, "AsyncHTTPTransport",
+        lambda **kw: httpx.MockTransport(lambda r: httpx.Response(200)),
+    )
+    pool = http.TransportPool()
+
+    async def get():
+        return pool.get("https://api.binance.com")
+
+    assert asyncio.run(get()) is not asyncio.run(get())
+
+
+def test_http2_only_for_known_hosts(monkeypatch):
+    monkeypatch.setattr(http, "HTTP2_ENABLED", True)
+    assert http.use_http2("https://api.binance.com")
+    assert not http.use_http2("https://example.com")
+    monkeypatch.setattr(http, "HTTP2_ENABLED", False)
+    assert not http.use_http2("https://api.binance.com")
+
+
+def test_requests_sessions_share_adapter():
+    origin = "https://pool-test.example"
+    a, b = requests.Session(), requests.Session()
+    http.mount_shared_adapter(a, origin)
+    http.mount_shared_adapter(b, origin)
+    adapter = a.get_adapter(origin + "/api")
+    assert adapter is b.get_adapter(origin + "/api")
+    a.close()
+    # 关闭 session 不会清空共享连接池
+    assert http._adapters[origin] is adapter
+    http._adapters.pop(origin).close_pool()
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import multiprocessing
+
+from server.events import FillEvent
+from server.idempotency import IdempotencyStore, SQLiteIdempotencyStore
+from server.replay import MockConnector, build_replay_dispatcher
+
+
+def test_json_store_claim_lifecycle(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "i.json"))
+    key = ("e1", "a")
+    assert store.claim(key)
+    assert not store.claim(key)
+    store.release(key)
+    assert store.claim(key)
+    store.complete(key)
+    assert store.state(key) == "done"
+    assert not store.claim(key)
+    assert IdempotencyStore(str(tmp_path / "i.json")).is_processed(key)
+
+
+def test_sqlite_store_is_shared_and_imports_json(tmp_path):
+    legacy = tmp_path / "idempotency.json"
+    legacy.write_text(json.dumps([["old", "a"]]))
+    db = str(tmp_path / "i.db")
+    first = SQLiteIdempotencyStore(db, import_json=str(legacy), owner="p1")
+    second = SQLiteIdempotencyStore(db, owner="p2")
+    assert second.is_processed(("old", "a"))
+
+    key = ("e1", "a")
+    assert first.claim(key)
+    assert not second.claim(key)
+    assert second.state(key) == "inflight"
+    first.release(key)
+    assert second.claim(key)
+    second.complete(key)
+    first.release(key)  # a late release never reopens a done key
+    assert not first.claim(key)
+    assert first.is_processed(key)
+
+
+def test_sqlite_claim_is_taken_over_only_from_a_dead_owner(tmp_path):
+    db = str(tmp_path / "i.db")
+    live = SQLiteIdempotencyStore(db)
+    assert live.claim(("e1", "a"))
+    # 认领者仍在运行：无论多久都不接管
+    assert not SQLiteIdempotencyStore(db).claim(("e1", "a"))
+
+    ctx = multiprocessing.get_context("spawn")
+    proc = ctx.Process(target=_claim_all, args=((db, [("e2", "a"), ("e3", "a")]),))
+    proc.start()
+    proc.join()
+    other = SQLiteIdempotencyStore(db)
+    assert other.state(("e2", "a")) == "inflight"
+    assert other.claim(("e2", "a"))
+
+
+def test_sqlite_unknown_outcome_is_never_reclaimed(tmp_path):
+    db = str(tmp_path / "i.db")
+    first = SQLiteIdempotencyStore(db)
+    key = ("e1", "a")
+    assert first.claim(key)
+    first.mark_unknown(key)
+    first.release(key)  # 只影响 inflight 的 key
+    first.close()
+
+    second = SQLiteIdempotencyStore(db)
+    assert second.state(key) == "unknown" and not second.claim(key)
+    assert second.unknown_keys() == {key}
+    second.resolve(key, placed=False)
+    assert second.claim(key)
+
+
+def test_json_store_unknown_outcome_is_not_reclaimed(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "i.json"))
+    key = ("e1", "a")
+    assert store.claim(key)
+    store.mark_unknown(key)
+    assert store.state(key) == "unknown" and not store.claim(key)
+    store.resolve(key, placed=True)
+    assert store.is_processed(key)
+
+
+def _claim_all(args):
+    db, keys = args
+    store = SQLiteIdempotencyStore(db)
+    return [k for k in keys if store.claim(tuple(k))]
+
+
+def test_sqlite_claims_are_exclusive_across_processes(tmp_path):
+    db = str(tmp_path / "i.db")
+    SQLiteIdempotencyStore(db).close()
+    keys = [(f"e{i}", "a") for i in range(200)]
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(4) as pool:
+        wins = pool.map(_claim_all, [(db, keys)] * 4)
+    claimed = [tuple(k) for won in wins for k in won]
+    assert sorted(claimed) == sorted(keys)
+
+
+def test_concurrent_dispatch_submits_once(tmp_path):
+    db = str(tmp_path / "i.db")
+
+    async def main():
+        first = build_replay_dispatcher(followers=5, latency=0.01)
+        second = build_replay_dispatcher(followers=5, latency=0.01)
+        first._idem = SQLiteIdempotencyStore(db)
+        second._idem = SQLiteIdempotencyStore(db)
+        event = FillEvent("e1", "BUY", quote_filled=100.0, leader_free_usdt=1000.0)
+        await asyncio.gather(first.dispatch(event), second.dispatch(event), first.dispatch(event))
+        assert len(MockConnector.orders) == 5
+
+    asyncio.run(main())
+
+
+def test_sqlite_store_calls_run_off_the_event_loop(tmp_path):
+    import threading
+
+    store = SQLiteIdempotencyStore(str(tmp_path / "i.db"), import_json=None)
+    calls = []
+    for name in ("claim_many", "complete", "release_many"):
+        method = getattr(store, name)
+
+        def wrapped(*args, _name=name, _method=method):
+            calls.append((_name, threading.current_thread().name))
+            return _method(*args)
+
+        setattr(store, name, wrapped)
+
+    async def main():
+        dispatcher = build_replay_dispatcher(followers=5)
+        dispatcher._idem = store
+        await dispatcher.dispatch(FillEvent("e1", "BUY", quote_filled=100.0, leader_free_usdt=1000.0))
+        return threading.current_thread().name
+
+    loop_thread = asyncio.run(main())
+    # 每个成交只认领一次（一个事务），其余调用都在存储专用线程中执行
+    assert [c[0] for c in calls].count("claim_many") == 1
+    assert [c[0] for c in calls].count("complete") == 5
+    assert all(t != loop_thread and t.startswith("idempotency") for _, t in calls)
+    assert len(store.processed_keys()) == 5
+    store.close()
@@ -0,0 +1,47 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from server import json_codec
+from server.responses import FastJSONResponse
+
+
+class DummyResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+def test_loads_accepts_bytes_and_str():
+    frame = '{"e":"executionReport","X":"FILLED","Z":"10.5","i":123}'
+    assert json_codec.loads(frame) == json_codec.loads(frame.encode())
+    assert json_codec.loads(frame)["i"] == 123
+
+
+def test_dumps_round_trip_is_compact():
+    data = {"acc1": {"success": True, "data": {"qty": 0.001}}}
+    encoded = json_codec.dumps(data)
+    assert " " not in encoded
+    assert json_codec.loads(encoded) == data
+
+
+def test_response_json_uses_content_or_falls_back():
+    class RawResponse:
+        content = b'{"listenKey":"abc"}'
+
+    assert json_codec.response_json(RawResponse()) == {"listenKey": "abc"}
+    assert json_codec.response_json(DummyResponse({"ok": True})) == {"ok": True}
+
+
+def test_fast_json_response_class():
+    app = FastAPI(default_response_class=FastJSONResponse)
+
+    @app.get("/x")
+    async def x():
+        return {"BTC": 0.5, "USDT": 100.0, "stale": False}
+
+    resp = TestClient(app).get("/x")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    assert resp.json() == {"BTC": 0.5, "USDT": 100.0, "stale": False}
@@ -0,0 +1,118 @@
+import asyncio
+import importlib
+import os
+
+from fastapi.testclient import TestClient
+
+from server.leader_election import LeaderElector, SQLiteLease
+
+
+def test_lease_is_exclusive_until_expiry(tmp_path):
+    path = str(tmp_path / "lease.db")
+    a = SQLiteLease(path, owner="a")
+    b = SQLiteLease(path, owner="b")
+
+    held, state = a.try_acquire(5, now=100.0)
+    assert held and state.epoch == 1
+    held, state = b.try_acquire(5, now=102.0)
+    assert not held and state.owner == "a"
+    # Renewal keeps the epoch; takeover after expiry bumps it.
+    held, state = a.try_acquire(5, now=104.0)
+    assert held and state.epoch == 1
+    held, state = b.try_acquire(5, now=110.0)
+    assert held and state.owner == "b" and state.epoch == 2
+
+
+def test_release_allows_immediate_takeover(tmp_path):
+    path = str(tmp_path / "lease.db")
+    calls = []
+
+    async def main():
+        first = LeaderElector(
+            SQLiteLease(path, owner="a"), ttl=30, renew_interval=1,
+            on_elected=lambda: _note(calls, "a+"), on_demoted=lambda: _note(calls, "a-"),
+        )
+        second = LeaderElector(
+            SQLiteLease(path, owner="b"), ttl=30, renew_interval=1,
+            on_elected=lambda: _note(calls, "b+"),
+        )
+        assert await first.step()
+        assert not await second.step()
+        assert first.is_leader and not second.is_leader
+        assert second.status()["holder"] == "a"
+
+        await first.stop()
+        assert await second.step()
+        assert second.is_leader and not first.is_leader
+        assert second.status()["epoch"] == 2
+
+    asyncio.run(main())
+    assert calls == ["a+", "a-", "b+"]
+
+
+async def _note(calls, item):
+    calls.append(item)
+
+
+def test_standby_only_saves_leader_config(tmp_path):
+    os.environ["LEADER_CRED_FILE"] = str(tmp_path / "leader_credentials.json")
+    os.environ["ACCOUNTS_FILE"] = str(tmp_path / "accounts.json")
+    import server.storage as storage
+    import server.api as server_api
+    import server.main as main
+
+    importlib.reload(storage)
+    importlib.reload(server_api)
+    importlib.reload(main)
+    client = TestClient(main.create_app())
+    assert client.get("/api/leader/election").json() == {"enabled": False, "is_leader": True}
+
+    leader = SQLiteLease(str(tmp_path / "lease.db"), owner="other")
+    leader.try_acquire(60)
+    server_api._elector = LeaderElector(SQLiteLease(str(tmp_path / "lease.db")), ttl=60)
+    try:
+        payload = {"exchange": "binance", "env": "test", "api_key": "k", "api_secret": "s"}
+        assert client.put("/api/leader", json=payload).json() == {"listening": True}
+        assert server_api._leader_task is None
+        assert (tmp_path / "leader_credentials.json").exists()
+        assert client.get("/api/leader/election").json()["is_leader"] is False
+    finally:
+        server_api._elector = None
+
+
+def test_copy_switch_is_shared_between_workers(tmp_path):
+    os.environ["LEADER_CRED_FILE"] = str(tmp_path / "leader_credentials.json")
+    os.environ["ACCOUNTS_FILE"] = str(tmp_path / "accounts.json")
+    import server.storage as storage
+    import server.copy_dispatcher as copy_module
+    import server.api as server_api
+    import server.main as main
+
+    from server.events import FillEvent
+
+    importlib.reload(storage)
+    importlib.reload(copy_module)
+    importlib.reload(server_api)
+    importlib.reload(main)
+    client = TestClient(main.create_app())
+    lease_file = str(tmp_path / "lease.db")
+    leader = SQLiteLease(lease_file, owner="other")
+    leader.try_acquire(60)
+    server_api._elector = LeaderElector(SQLiteLease(lease_file), ttl=60)
+    dispatcher = server_api.copy_dispatcher
+    try:
+        # Stop reaches a standby worker; the elected one sees it before dispatching.
+        assert client.post("/api/copy/stop").json() == {"running": False}
+        assert leader.get_setting(server_api.COPY_ENABLED_SETTING) == "0"
+        dispatcher.start()
+        dispatcher.set_gate(server_api._shared_copy_enabled)
+        asyncio.run(dispatcher.dispatch(FillEvent("e1", "BUY", quote_filled=1.0, leader_free_usdt=10.0)))
+        assert not dispatcher.is_running()
+        assert client.get("/api/copy/status").json()["running"] is False
+
+        leader.set_setting(server_api.COPY_ENABLED_SETTING, "1")
+        assert client.get("/api/copy/status").json()["running"] is True
+    finally:
+        dispatcher.set_gate(None)
+        dispatcher.start()
+        server_api._elector = None
@@ -96,3 +96,258 @@ def test_reconnect_after_connection_drop():
         assert keepalive_calls and keepalive_calls[-1] == "k2"
 
     run(main())
+
+
+def _keys():
+    created = []
+
+    async def create_listen_key():
+        created.append(f"k{len(created) + 1}")
+        return created[-1]
+
+    return created, create_listen_key
+
+
+async def _noop(key):
+    pass
+
+
+async def _run_for(supervisor, seconds):
+    task = asyncio.create_task(supervisor.run())
+    await asyncio.sleep(seconds)
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+def test_consumer_receives_messages_with_backpressure():
+    from services.leader_ws import OPEN, LeaderStreamSupervisor
+
+    async def main():
+        received = []
+        connected = []
+        _, create_listen_key = _keys()
+
+        async def connect_ws(key):
+            yield OPEN
+            for i in range(3):
+                yield {"e": "executionReport", "E": 1, "i": i}
+            await asyncio.sleep(10)
+
+        async def consumer(msg):
+            await asyncio.sleep(0.01)  # 慢消费：读取等待处理完成
+            received.append(msg["i"])
+
+        supervisor = LeaderStreamSupervisor(
+            create_listen_key, connect_ws, _noop, consumer, on_connect=lambda: connected.append(1)
+        )
+        await _run_for(supervisor, 0.1)
+        assert received == [0, 1, 2]
+        assert connected == [1]
+        stats = supervisor.status()
+        assert stats["connects"] == 1 and stats["state"] == "stopped"
+        conn = stats["recent"][0]
+        assert conn["messages"] == 3 and conn["connect_s"] is not None
+        assert conn["event_lag_ms"] > 0 and conn["consume_avg_ms"] >= 5
+
+    run(main())
+
+
+def test_consumer_error_does_not_stop_the_stream():
+    from services.leader_ws import OPEN, LeaderStreamSupervisor
+
+    async def main():
+        received = []
+        created, create_listen_key = _keys()
+
+        async def connect_ws(key):
+            yield OPEN
+            for i in range(3):
+                yield {"i": i}
+            await asyncio.sleep(10)
+
+        async def consumer(msg):
+            if msg["i"] == 0:
+                raise ValueError("bad frame")
+            received.append(msg["i"])
+
+        def on_connect():
+            raise RuntimeError("prewarm failed")
+
+        supervisor = LeaderStreamSupervisor(
+            create_listen_key, connect_ws, _noop, consumer, on_connect=on_connect
+        )
+        task = asyncio.create_task(supervisor.run())
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        assert received == [1, 2]
+        assert supervisor.counters["errors"] == 2
+        assert supervisor.state == "connected" and created == ["k1"]
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    run(main())
+
+
+def test_failed_connects_back_off_exponentially():
+    from services.leader_ws import LeaderStreamSupervisor
+
+    async def main():
+        attempts = []
+        _, create_listen_key = _keys()
+
+        async def connect_ws(key):
+            attempts.append(asyncio.get_running_loop().time())
+            raise ConnectionError("refused")
+            yield  # pragma: no cover
+
+        supervisor = LeaderStreamSupervisor(
+            create_listen_key, connect_ws, _noop, backoff_base=0.02, backoff_max=0.08
+        )
+        assert [supervisor.backoff(n) for n in range(5)] == [0.0, 0.02, 0.04, 0.08, 0.08]
+        await _run_for(supervisor, 0.2)
+        gaps = [b - a for a, b in zip(attempts, attempts[1:])]
+        assert 3 <= len(attempts) <= 6
+        assert gaps[1] > gaps[0]
+        assert supervisor.failures >= 3
+
+    run(main())
+
+
+def test_silent_connection_is_replaced():
+    from services.leader_ws import LeaderStreamSupervisor
+
+    async def main():
+        created, create_listen_key = _keys()
+
+        async def connect_ws(key):
+            yield {"msg": key}
+            await asyncio.sleep(10)  # 半开连接：不再有任何数据
+
+        supervisor = LeaderStreamSupervisor(create_listen_key, connect_ws, _noop, max_silence=0.05)
+        await _run_for(supervisor, 0.18)
+        assert len(created) >= 3
+        assert supervisor.counters["stale"] >= 2
+
+    run(main())
+
+
+def test_keepalive_failure_and_expiry_rotate_listen_key():
+    from services.leader_ws import LeaderStreamSupervisor
+
+    async def main():
+        created, create_listen_key = _keys()
+
+        async def keepalive(key):
+            if key == "k1":
+                raise RuntimeError("listen key expired")
+
+        async def connect_ws(key):
+            yield {"msg": key}
+            await asyncio.sleep(10)
+
+        supervisor = LeaderStreamSupervisor(
+            create_listen_key, connect_ws, keepalive, keepalive_interval=0.03, rotate_after=0.1
+        )
+        await _run_for(supervisor, 0.15)
+        assert created[:2] == ["k1", "k2"] and len(created) == 3
+        assert supervisor.counters["keepalive_failures"] == 1
+        assert supervisor.counters["rotations"] == 1
+        assert [c["close_reason"] for c in supervisor.status()["recent"]][:2] == [
+            "keepalive_failed", "rotate"
+        ]
+
+    run(main())
+
+
+def test_missing_pong_forces_reconnect_and_rtt_is_tracked():
+    from services.leader_ws import OPEN, LeaderStreamSupervisor
+
+    async def main():
+        created, create_listen_key = _keys()
+        pongs = {"k1": True}
+
+        async def connect_ws(key):
+            yield OPEN
+            await asyncio.sleep(10)
+
+        async def ping():
+            # k1 的连接正常回 pong；之后的连接为半开状态
+            if pongs.get(created[-1]):
+                await asyncio.sleep(0.002)
+                return 0.002
+            await asyncio.sleep(10)
+
+        supervisor = LeaderStreamSupervisor(
+            create_listen_key, connect_ws, _noop,
+            ping=ping, ping_interval=0.02, ping_timeout=0.02,
+        )
+        task = asyncio.create_task(supervisor.run())
+        await asyncio.sleep(0.07)
+        live = supervisor.status()
+        assert live["liveness"]["alive"] and live["liveness"]["ping_rtt_ms"] == 2.0
+        assert live["current"]["pings"] >= 2
+        pongs["k1"] = False
+        await asyncio.sleep(0.06)
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        assert supervisor.counters["ping_timeouts"] >= 1
+        assert supervisor.recent[0].close_reason == "ping_timeout"
+        assert len(created) >= 2
+
+    run(main())
+
+
+def test_pongs_keep_quiet_stream_alive():
+    from services.leader_ws import OPEN, LeaderStreamSupervisor
+
+    async def main():
+        created, create_listen_key = _keys()
+
+        async def connect_ws(key):
+            yield OPEN
+            await asyncio.sleep(10)  # 没有业务消息，但连接正常
+
+        async def ping():
+            return 0.001
+
+        supervisor = LeaderStreamSupervisor(
+            create_listen_key, connect_ws, _noop,
+            ping=ping, ping_interval=0.02, max_silence=0.05,
+        )
+        await _run_for(supervisor, 0.15)
+        assert created == ["k1"] and supervisor.counters["stale"] == 0
+
+    run(main())
+
+
+def test_invalid_listen_key_probe_reconnects():
+    from services.leader_ws import LeaderStreamSupervisor
+
+    async def main():
+        created, create_listen_key = _keys()
+        calls = []
+
+        async def probe(key):
+            calls.append(key)
+            if len(calls) == 1:
+                raise ConnectionError("REST unreachable")  # 只计数，不重连
+            return key != "k1"
+
+        async def connect_ws(key):
+            yield {"msg": key}
+            await asyncio.sleep(10)
+
+        supervisor = LeaderStreamSupervisor(
+            create_listen_key, connect_ws, _noop, probe_listen_key=probe, probe_interval=0.03
+        )
+        await _run_for(supervisor, 0.15)
+        assert created[:2] == ["k1", "k2"] and len(created) == 2
+        assert supervisor.counters["invalid_listen_keys"] == 1
+        first = supervisor.recent[0]
+        assert first.close_reason == "listen_key_invalid" and first.probe_errors == 1
+        assert supervisor.recent[-1].listen_key_valid is True
+
+    run(main())
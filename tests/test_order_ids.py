@@ -0,0 +1,159 @@
+import asyncio
+import json
+import re
+from unittest.mock import AsyncMock
+
+import httpx
+
+from server.accounts import Account
+from server.connectors.binance import BinanceConnector
+from server.connectors.bitget import BitgetConnector
+from server.copy_dispatcher import CopyDispatcher
+from server.events import FillEvent
+from server.idempotency import IdempotencyStore
+from server.order_ids import client_order_id
+
+
+class DummyResponse:
+    def __init__(self, data=None, status_code=200):
+        self._data = data or {}
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+def test_client_order_id_is_deterministic_and_valid():
+    cid = client_order_id("1-2-3", "acct")
+    assert cid == client_order_id("1-2-3", "acct")
+    assert cid != client_order_id("1-2-3", "other")
+    assert re.fullmatch(r"[A-Za-z0-9]{32}", cid)
+
+
+def test_connectors_send_client_order_id():
+    async def main():
+        binance = BinanceConnector()
+        binance._client.post = AsyncMock(return_value=DummyResponse({"orderId": 1}))
+        await binance.create_market_order("k", "s", "BUY", quote_amount=10, client_order_id="bsX")
+        assert "newClientOrderId=bsX" in binance._client.post.await_args.args[0]
+
+        binance._client.get = AsyncMock(
+            return_value=DummyResponse({"code": -2013, "msg": "Order does not exist."}, 400)
+        )
+        assert await binance.get_order("k", "s", "bsX") is None
+
+        bitget = BitgetConnector()
+        bitget._client.post = AsyncMock(return_value=DummyResponse({"data": {}}))
+        await bitget.create_market_order("k", "s", "p", "sell", base_amount=1, client_oid="bsY")
+        assert json.loads(bitget._client.post.await_args.kwargs["content"])["clientOid"] == "bsY"
+
+        bitget._client.get = AsyncMock(return_value=DummyResponse({"data": [{"clientOid": "bsY"}]}))
+        assert await bitget.get_order("k", "s", "p", "bsY") == {"clientOid": "bsY"}
+        assert "clientOid=bsY" in bitget._client.get.await_args.args[0]
+        await binance.close()
+        await bitget.close()
+
+    asyncio.run(main())
+
+
+class TimeoutConnector:
+    """Times out on every order; ``lookup`` sets what the exchange knows.
+
+    ``found``: the order was placed. ``late``: it was still in flight at the
+    first lookup and lands afterwards. ``missing``: it never arrived.
+    ``error``: the lookup fails.
+    """
+
+    orders = {}
+    submits = 0
+    lookups = 0
+    lookup = "found"
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def order_market_buy(self, symbol, quote_amount, client_order_id=None):
+        TimeoutConnector.submits += 1
+        if self.lookup in ("found", "late"):
+            TimeoutConnector.orders[client_order_id] = {"orderId": 7, "clientOrderId": client_order_id}
+        raise httpx.ReadTimeout("timed out")
+
+    async def get_order(self, symbol, cid):
+        TimeoutConnector.lookups += 1
+        if self.lookup == "error":
+            raise httpx.ConnectError("down")
+        if self.lookup == "late" and TimeoutConnector.lookups == 1:
+            return None
+        return TimeoutConnector.orders.get(cid)
+
+    async def close(self):
+        pass
+
+
+class StubAccounts:
+    def __init__(self, accounts):
+        self._accounts = accounts
+
+    def list_accounts(self):
+        return self._accounts
+
+
+class StubBalances:
+    async def get_balance(self, name):
+        return {"USDT": 100.0, "BTC": 1.0}
+
+    def apply_fill(self, name, side, result):
+        pass
+
+
+def _run(tmp_path, monkeypatch, lookup, window=0.05):
+    import server.copy_dispatcher as copy_module
+
+    monkeypatch.setattr(copy_module, "ACCEPT_WINDOW", {} if window is None else {"binance": window})
+    TimeoutConnector.orders = {}
+    TimeoutConnector.submits = TimeoutConnector.lookups = 0
+    TimeoutConnector.lookup = lookup
+    account = Account(name="a", exchange="binance", env="test", api_key="k", api_secret="s")
+    idem = IdempotencyStore(str(tmp_path / "i.json"))
+    dispatcher = CopyDispatcher(StubAccounts([account]), StubBalances(), idem)
+    dispatcher._connectors = {"binance": TimeoutConnector}
+    asyncio.run(dispatcher.dispatch(
+        FillEvent("e1", "BUY", quote_filled=10.0, leader_free_usdt=100.0)
+    ))
+    return dispatcher.get_last_results()["a"], idem.state(("e1", "a"))
+
+
+def test_timeout_resolved_by_lookup(tmp_path, monkeypatch):
+    result, state = _run(tmp_path, monkeypatch, "found")
+    assert result["success"] and result["data"]["orderId"] == 7
+    assert state == "done"
+    assert TimeoutConnector.lookups == 1
+
+
+def test_in_flight_order_is_not_resent(tmp_path, monkeypatch):
+    # 首次查询时请求仍在途中：等待接受窗口结束后再查，找到即成功，不重发
+    result, state = _run(tmp_path, monkeypatch, "late")
+    assert result["success"] and state == "done"
+    assert TimeoutConnector.submits == 1 and TimeoutConnector.lookups == 2
+
+
+def test_timeout_without_order_is_retryable(tmp_path, monkeypatch):
+    result, state = _run(tmp_path, monkeypatch, "missing")
+    assert not result["success"]
+    assert state is None
+    assert TimeoutConnector.submits > 1
+
+
+def test_lookup_miss_without_accept_window_is_parked_unknown(tmp_path, monkeypatch):
+    result, state = _run(tmp_path, monkeypatch, "missing", window=None)
+    assert "order outcome unknown" in result["error"]
+    assert state == "unknown" and TimeoutConnector.submits == 1
+
+
+def test_timeout_with_failed_lookup_is_parked_unknown(tmp_path, monkeypatch):
+    result, state = _run(tmp_path, monkeypatch, "error")
+    assert "order outcome unknown" in result["error"]
+    assert state == "unknown"
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+from server import persist
+from server.idempotency import IdempotencyStore
+from server.storage import EncryptedJSONStorage, JSONStorage
+
+
+def test_atomic_write_replaces_and_keeps_old_file_on_failure(tmp_path, monkeypatch):
+    path = tmp_path / "data.json"
+    persist.atomic_write(str(path), b'{"v": 1}')
+    os.chmod(path, 0o640)
+    persist.atomic_write(str(path), b'{"v": 2}')
+    assert path.read_bytes() == b'{"v": 2}'
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+    def broken_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(persist.os, "replace", broken_replace)
+    with pytest.raises(OSError):
+        persist.atomic_write(str(path), b'{"v": 3}')
+    assert path.read_bytes() == b'{"v": 2}'
+    assert os.listdir(tmp_path) == ["data.json"]  # 临时文件已清理
+
+
+def test_saves_in_event_loop_are_coalesced_off_loop(tmp_path, monkeypatch):
+    writer = persist.AtomicFileWriter(str(tmp_path / "c.json"), delay=0.02)
+    threads = []
+    real_write = persist.atomic_write
+    monkeypatch.setattr(
+        persist, "atomic_write",
+        lambda p, d: threads.append(threading.current_thread()) or real_write(p, d),
+    )
+    renders = []
+
+    def render(i):
+        renders.append(i)
+        return json.dumps({"n": i}).encode()
+
+    async def main():
+        for i in range(50):
+            writer.submit(lambda i=i: render(i))
+        assert writer.pending and writer.stats["writes"] == 0
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert json.loads((tmp_path / "c.json").read_text()) == {"n": 49}
+    assert renders == [49] and writer.stats["writes"] == 1
+    assert threads[0] is not threading.main_thread()
+
+
+def test_reads_see_pending_saves_after_loop_ends(tmp_path):
+    path = str(tmp_path / "accounts.json")
+    storage = JSONStorage(path, save_delay=10)
+
+    async def main():
+        storage.save({"accounts": [1]})
+
+    asyncio.run(main())
+    assert not os.path.exists(path)
+    assert JSONStorage(path).load() == {"accounts": [1]}
+    assert json.loads(open(path).read()) == {"accounts": [1]}
+
+
+def test_asave_waits_for_disk(tmp_path):
+    path = tmp_path / "creds.json"
+    storage = EncryptedJSONStorage(str(path), "s3cret", save_delay=10)
+
+    async def main():
+        await storage.asave({"api_key": "k"})
+        return path.read_bytes()
+
+    raw = asyncio.run(main())
+    assert raw and b"api_key" not in raw
+    assert EncryptedJSONStorage(str(path), "s3cret").load() == {"api_key": "k"}
+
+
+def test_idempotency_store_debounces_and_survives_restart(tmp_path):
+    path = str(tmp_path / "idem.json")
+    store = IdempotencyStore(path, save_delay=0.01)
+
+    async def main():
+        for i in range(20):
+            store.claim((f"e{i}", "a"))
+            store.complete((f"e{i}", "a"))
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert persist.writer_for(path).stats["writes"] == 1
+    assert len(IdempotencyStore(path).processed_keys()) == 20
+
+
+def test_idempotency_completion_is_written_without_debounce(tmp_path):
+    path = str(tmp_path / "idem.json")
+    store = IdempotencyStore(path)
+    writer = persist.writer_for(path)
+    assert writer.delay == 0
+
+    async def main():
+        store.claim(("e1", "a"))
+        store.complete(("e1", "a"))
+        assert writer.stats["writes"] == 0  # 写入在线程中进行，不阻塞事件循环
+        for _ in range(1000):
+            if writer.stats["writes"]:
+                break
+            await asyncio.sleep(0.001)
+
+    asyncio.run(main())
+    assert writer.stats["writes"] == 1
+    assert json.loads(open(path).read()) == [["e1", "a"]]
+
+
+def test_corrupt_idempotency_file_is_kept_aside(tmp_path):
+    path = tmp_path / "idem.json"
+    path.write_text('[["e1", "a"], ["e2"')
+    store = IdempotencyStore(str(path))
+    assert store.processed_keys() == set()
+    assert not path.exists()
+    assert [p.name.startswith("idem.json.corrupt-") for p in tmp_path.iterdir()] == [True]
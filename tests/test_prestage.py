@@ -0,0 +1,167 @@
+import asyncio
+
+from server.accounts import Account
+from server.copy_dispatcher import CopyDispatcher
+from server import prestage
+from server.idempotency import IdempotencyStore
+from server.order_ids import client_order_id
+from server.prestage import PreStager
+from server.rate_limit import TokenBucket
+
+
+class StagingConnector:
+    log = []
+    instances = []
+    cids = []
+
+    def __init__(self, api_key=None, api_secret=None, testnet=False):
+        self.key = api_key
+        self.closed = False
+        StagingConnector.instances.append(self)
+
+    def prepare_market_order(self, symbol, side, amount, client_order_id=None):
+        self.log.append(("prepare", self.key, amount))
+        return {"amount": amount, "cid": client_order_id}
+
+    async def send_prepared(self, prepared):
+        self.log.append(("send_prepared", self.key, prepared["amount"]))
+        self.cids.append(prepared["cid"])
+        return {"orderId": 1, "clientOrderId": prepared["cid"]}
+
+    async def order_market_buy(self, symbol, quote_amount, client_order_id=None):
+        self.log.append(("order", self.key, quote_amount))
+        self.cids.append(client_order_id)
+        return {"orderId": 2, "clientOrderId": client_order_id}
+
+    async def order_market_sell(self, symbol, quantity, client_order_id=None):
+        self.log.append(("order", self.key, quantity))
+        return {"orderId": 3, "clientOrderId": client_order_id}
+
+    async def close(self):
+        self.closed = True
+
+
+class StubAccounts:
+    def __init__(self, accounts):
+        self._accounts = accounts
+
+    def list_accounts(self):
+        return self._accounts
+
+
+class StubBalances:
+    async def get_balance(self, name):
+        return {"USDT": 100.0, "BTC": 1.0}
+
+    def apply_fill(self, name, side, result):
+        pass
+
+
+def _dispatcher(tmp_path):
+    StagingConnector.log = []
+    StagingConnector.instances = []
+    StagingConnector.cids = []
+    accounts = [
+        Account(name=n, exchange="binance", env="prod", api_key=n, api_secret="s") for n in ("a", "b")
+    ]
+    idem = IdempotencyStore(str(tmp_path / "i.json"))
+    dispatcher = CopyDispatcher(StubAccounts(accounts), StubBalances(), idem)
+    dispatcher._connectors = {"binance": StagingConnector}
+    return dispatcher, idem
+
+
+NEW = {"e": "executionReport", "X": "NEW", "o": "MARKET", "i": 42, "S": "BUY", "Q": "100", "E": 1}
+
+
+def _filled(quote):
+    return {"e": "executionReport", "X": "FILLED", "o": "MARKET", "i": 42, "S": "BUY",
+            "Q": "100", "Z": str(quote), "z": "0.001", "E": 2}
+
+
+def test_staged_orders_fire_on_fill(tmp_path):
+    dispatcher, idem = _dispatcher(tmp_path)
+    stager = PreStager(dispatcher)
+
+    async def main():
+        stager.observe(NEW, 1000.0, 0.5)
+        await asyncio.sleep(0.01)
+        # 预暂存阶段只建连接、预留令牌，不签名也不下单
+        assert StagingConnector.log == [] and len(StagingConnector.instances) == 2
+        stager.observe(_filled(100), 1000.0, 0.5)
+        await stager.close()
+
+    asyncio.run(main())
+    assert StagingConnector.log == [
+        ("prepare", "a", 11.11), ("send_prepared", "a", 11.11),
+        ("prepare", "b", 11.11), ("send_prepared", "b", 11.11),
+    ]
+    assert len(StagingConnector.instances) == 2  # 下单复用预建的连接器
+    event_id = "42-2-100"
+    # 与普通路径（重放 / 重启后再次分发同一成交）相同的 client order id
+    assert StagingConnector.cids == [client_order_id(event_id, "a"), client_order_id(event_id, "b")]
+    assert idem.state((event_id, "a")) == "done" and idem.state((event_id, "b")) == "done"
+    assert stager.consume(event_id) and not stager.consume(event_id)
+    assert all(c.closed for c in StagingConnector.instances)
+    assert stager.stats == {"staged": 1, "fired": 1, "discarded": 0}
+
+
+def test_size_mismatch_falls_back_to_fresh_orders(tmp_path):
+    dispatcher, idem = _dispatcher(tmp_path)
+    stager = PreStager(dispatcher)
+
+    async def main():
+        stager.observe(NEW, 1000.0, 0.5)
+        await asyncio.sleep(0.01)
+        stager.observe(_filled(50), 1000.0, 0.5)
+        await stager.close()
+
+    asyncio.run(main())
+    assert StagingConnector.log == [("order", "a", 5.26), ("order", "b", 5.26)]
+    assert all(c.closed for c in StagingConnector.instances)
+    # 预留令牌已退回
+    assert dispatcher._limiter._buckets["a"].tokens >= dispatcher._limiter._buckets["a"].capacity - 1
+
+
+def test_cancel_discards_staged_orders(tmp_path):
+    dispatcher, idem = _dispatcher(tmp_path)
+    stager = PreStager(dispatcher)
+
+    async def main():
+        stager.observe(NEW, 1000.0, 0.5)
+        stager.observe({**NEW, "X": "CANCELED"}, 1000.0, 0.5)
+        await stager.close()
+
+    asyncio.run(main())
+    assert StagingConnector.log == []
+    assert all(c.closed for c in StagingConnector.instances)
+    bucket = dispatcher._limiter._buckets["a"]
+    assert bucket.tokens == bucket.capacity
+    assert stager.stats["discarded"] == 1
+
+
+def test_unclaimed_fired_events_expire(tmp_path, monkeypatch):
+    dispatcher, _ = _dispatcher(tmp_path)
+    stager = PreStager(dispatcher)
+    clock = [100.0]
+    monkeypatch.setattr(prestage.time, "monotonic", lambda: clock[0])
+
+    async def main():
+        stager.observe(NEW, 1000.0, 0.5)
+        stager.observe(_filled(100), 1000.0, 0.5)
+        await stager.close()
+
+    asyncio.run(main())
+    # 看门狗从未上报该成交：超过 STAGE_TTL 后丢弃，不会无限增长
+    clock[0] += prestage.STAGE_TTL + 1
+    stager.observe({**NEW, "i": 43, "X": "PARTIALLY_FILLED"}, 1000.0, 0.5)
+    assert not stager.consume("42-2-100")
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=10.0, capacity=2)
+    assert bucket.try_take() and bucket.try_take()
+    assert not bucket.try_take()
+    assert 0 < bucket.take() <= 0.1 + 1e-6
+    bucket.refund()
+    bucket.refund()
+    assert bucket.tokens <= bucket.capacity
@@ -0,0 +1,89 @@
+import asyncio
+import importlib
+import os
+
+from fastapi.testclient import TestClient
+
+from server.events import FillEvent
+from server.profiling import Histogram, Profiler, SpanRecorder, spans
+from server.replay import build_replay_dispatcher
+
+
+def test_histogram_quantiles():
+    hist = Histogram()
+    for ms in (0.3, 0.4, 3.0, 40.0):
+        hist.observe(ms)
+    data = hist.to_dict()
+    assert data["count"] == 4
+    assert data["p50_ms"] == 0.5
+    assert data["p99_ms"] == 50
+    assert data["max_ms"] == 40.0
+    assert data["buckets"] == {"0.5": 2, "5": 1, "50": 1}
+
+
+def test_disabled_recorder_records_nothing():
+    recorder = SpanRecorder()
+    with recorder.span("order", "binance"):
+        pass
+    assert recorder.snapshot() == {}
+    recorder.enabled = True
+    with recorder.span("order", "binance"):
+        pass
+    assert recorder.snapshot()["binance"]["order"]["count"] == 1
+
+
+def test_dispatch_records_stage_spans():
+    dispatcher = build_replay_dispatcher(followers=3)
+    spans.reset()
+    spans.enabled = True
+    try:
+        asyncio.run(dispatcher.dispatch(
+            FillEvent("e1", "BUY", quote_filled=100.0, leader_free_usdt=1000.0)
+        ))
+    finally:
+        spans.enabled = False
+    stages = spans.snapshot()
+    spans.reset()
+    for stage in ("balance", "connector_init", "order", "ledger", "idempotency", "result"):
+        assert stages["binance"][stage]["count"] == 3
+    assert stages["*"]["sizing"]["count"] == 1
+
+
+def test_profiler_rejects_concurrent_capture():
+    profiler = Profiler()
+
+    async def main():
+        first = asyncio.create_task(profiler.capture(0.05))
+        await asyncio.sleep(0)
+        try:
+            await profiler.capture(0.05)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("expected RuntimeError")
+        return await first
+
+    assert "function calls" in asyncio.run(main())
+
+
+def test_profiling_endpoints(tmp_path):
+    os.environ["ACCOUNTS_FILE"] = str(tmp_path / "accounts.json")
+    import server.api as server_api
+    import server.main as main
+
+    importlib.reload(server_api)
+    importlib.reload(main)
+    client = TestClient(main.create_app())
+
+    resp = client.put("/api/profiling/spans", json={"enabled": True, "reset": True})
+    assert resp.json() == {"enabled": True}
+    spans.observe("order", "bitget", 12.0)
+    body = client.get("/api/profiling/spans").json()
+    assert body["stages"]["bitget"]["order"]["count"] == 1
+    client.put("/api/profiling/spans", json={"enabled": False, "reset": True})
+
+    resp = client.post("/api/profiling/capture", params={"seconds": 0.1})
+    assert resp.status_code == 200
+    assert "function calls" in resp.text
+    resp = client.post("/api/profiling/capture", params={"seconds": 0.1, "mode": "bogus"})
+    assert resp.status_code == 400
@@ -0,0 +1,47 @@
+import asyncio
+import json
+
+from server.push import PushHub
+
+
+def test_publish_reaches_subscribers_as_sse():
+    async def main():
+        hub = PushHub()
+        sub = hub.subscribe()
+        stream = hub.sse_stream(sub)
+        assert await stream.__anext__() == "retry: 3000\n\n"
+        hub.publish("result", account="acc1", result={"success": True})
+        frame = await stream.__anext__()
+        event, data = frame.strip().split("\n")
+        assert event == "event: result"
+        payload = json.loads(data[len("data: "):])
+        assert payload["account"] == "acc1" and payload["result"] == {"success": True}
+        await stream.aclose()
+        assert hub.subscriber_count() == 0
+
+    asyncio.run(main())
+
+
+def test_slow_subscriber_is_resynced_without_blocking():
+    async def main():
+        hub = PushHub(queue_size=3)
+        slow = hub.subscribe()
+        for i in range(10):
+            hub.publish("balance", account=f"acc{i}", balance={})
+        assert slow.queue.qsize() <= 3
+        drained = [slow.queue.get_nowait() for _ in range(slow.queue.qsize())]
+        assert any(m["type"] == "resync" for m in drained)
+        assert slow.dropped > 0
+
+    asyncio.run(main())
+
+
+def test_heartbeat_when_idle():
+    async def main():
+        hub = PushHub(heartbeat=0.01)
+        stream = hub.sse_stream(hub.subscribe())
+        await stream.__anext__()
+        assert await stream.__anext__() == ": ping\n\n"
+        await stream.aclose()
+
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+from server.result_history import ResultHistory, read_spill
+
+
+def _fill(history, n, account="acc1"):
+    for i in range(n):
+        history.append(
+            event_id=f"e{i}",
+            account=account if i % 2 == 0 else "acc2",
+            exchange="binance",
+            side="BUY",
+            amount=float(i),
+            success=i % 3 != 0,
+            latency_ms=1.5,
+            order_id=i,
+            ts=1000.0 + i,
+        )
+
+
+def test_ring_evicts_oldest_and_keeps_indexes():
+    history = ResultHistory(capacity=4)
+    _fill(history, 10)
+    assert len(history) == 4
+    assert [r.event_id for r in history.query()] == ["e9", "e8", "e7", "e6"]
+    assert [r.event_id for r in history.query(account="acc1")] == ["e8", "e6"]
+    assert history.query(event_id="e1") == []
+    assert history.query(event_id="e7")[0].order_id == "7"
+
+
+def test_time_range_and_limit():
+    history = ResultHistory(capacity=100)
+    _fill(history, 20)
+    records = history.query(start=1005.0, end=1010.0)
+    assert [r.ts for r in records] == [1010.0 - i for i in range(6)]
+    assert len(history.query(limit=3)) == 3
+
+
+def test_spill_writes_evicted_records_as_column_blocks(tmp_path):
+    path = tmp_path / "history.log"
+    history = ResultHistory(capacity=3, spill_path=str(path), spill_block=2)
+    _fill(history, 8)
+    history.flush()
+    spilled = list(read_spill(str(path)))
+    assert [r.event_id for r in spilled] == ["e0", "e1", "e2", "e3", "e4"]
+    assert spilled[0].amount == 0.0 and spilled[1].account == "acc2"
+
+
+def test_spill_inside_event_loop_is_written_off_the_loop(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+
+    path = tmp_path / "history.log"
+    history = ResultHistory(capacity=3, spill_path=str(path), spill_block=2)
+    writers = []
+    write = history._write_lines
+
+    def record_thread():
+        writers.append(threading.current_thread())
+        write()
+
+    monkeypatch.setattr(history, "_write_lines", record_thread)
+
+    async def main():
+        _fill(history, 8)
+        assert not path.exists()  # 满块在后台线程追加，不阻塞调度
+        await history._spill_task
+        assert [r.event_id for r in read_spill(str(path))] == ["e0", "e1", "e2", "e3"]
+        await history.aflush()  # 关闭时写出未满一块的记录
+
+    asyncio.run(main())
+    assert [r.event_id for r in read_spill(str(path))] == ["e0", "e1", "e2", "e3", "e4"]
+    assert writers and threading.main_thread() not in writers
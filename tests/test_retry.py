@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+import httpx
+
+from server.accounts import Account
+from server.copy_dispatcher import CopyDispatcher
+from server.events import FillEvent
+from server.idempotency import IdempotencyStore
+from server.retry import OrderOutcomeUnknown, RetryPolicy, is_retryable, needs_lookup
+
+
+class ApiError(Exception):
+    def __init__(self, status_code, code=None):
+        super().__init__(f"{status_code} {code}")
+        self.status_code = status_code
+        self.code = code
+
+
+def test_classification():
+    request = httpx.Request("POST", "https://api.binance.com/api/v3/order")
+    assert needs_lookup(httpx.ReadTimeout("t"), "binance")
+    assert needs_lookup(asyncio.TimeoutError(), "binance")
+    assert needs_lookup(ApiError(503), "binance")
+    assert needs_lookup(ApiError(400, -1007), "binance")
+    assert not needs_lookup(httpx.ConnectError("down", request=request), "binance")
+
+    assert is_retryable(httpx.ConnectError("down", request=request), "binance")
+    assert is_retryable(ApiError(429), "binance")
+    assert is_retryable(ApiError(400, -1003), "binance")
+    assert is_retryable(ApiError(429, "429"), "bitget")
+    assert is_retryable(ApiError(503), "binance")
+
+    assert not is_retryable(ApiError(418), "binance")
+    assert not is_retryable(ApiError(400, -2010), "binance")
+    assert not is_retryable(OrderOutcomeUnknown("bsX", ApiError(503)), "binance")
+
+
+def test_backoff_is_bounded():
+    policy = RetryPolicy(base_delay=0.1, max_delay=0.3)
+    for retry in range(1, 6):
+        assert 0.0 <= policy.backoff(retry) <= min(0.3, 0.1 * 2 ** (retry - 1))
+
+
+class ScriptedConnector:
+    """Raises the scripted errors for an account in order, then fills."""
+
+    script = {}
+    calls = []
+
+    def __init__(self, api_key=None, **kwargs):
+        self.name = api_key
+
+    async def order_market_buy(self, symbol, quote_amount, client_order_id=None):
+        ScriptedConnector.calls.append((self.name, time.monotonic()))
+        errors = ScriptedConnector.script.get(self.name, [])
+        if errors:
+            raise errors.pop(0)
+        return {"orderId": 1, "clientOrderId": client_order_id}
+
+    async def get_order(self, symbol, cid):
+        return None
+
+    async def close(self):
+        pass
+
+
+class StubAccounts:
+    def __init__(self, accounts):
+        self._accounts = accounts
+
+    def list_accounts(self):
+        return self._accounts
+
+
+class StubBalances:
+    async def get_balance(self, name):
+        return {"USDT": 100.0, "BTC": 1.0}
+
+    def apply_fill(self, name, side, result):
+        pass
+
+
+def _dispatch(tmp_path, script, policy, names=("a",)):
+    ScriptedConnector.script = script
+    ScriptedConnector.calls = []
+    accounts = [
+        Account(name=n, exchange="binance", env="test", api_key=n, api_secret="s") for n in names
+    ]
+    idem = IdempotencyStore(str(tmp_path / "i.json"))
+    dispatcher = CopyDispatcher(StubAccounts(accounts), StubBalances(), idem, retry=policy)
+    dispatcher._connectors = {"binance": ScriptedConnector}
+    started = time.monotonic()
+    asyncio.run(dispatcher.dispatch(
+        FillEvent("e1", "BUY", quote_filled=10.0, leader_free_usdt=100.0)
+    ))
+    return dispatcher.get_last_results(), idem, started
+
+
+def test_transient_error_is_retried(tmp_path):
+    policy = RetryPolicy(base_delay=0.01, max_delay=0.02)
+    results, idem, _ = _dispatch(tmp_path, {"a": [ApiError(429), ApiError(400, -1003)]}, policy)
+    assert results["a"]["success"]
+    assert len(ScriptedConnector.calls) == 3
+    assert idem.state(("e1", "a")) == "done"
+
+
+def test_fatal_error_is_not_retried(tmp_path):
+    policy = RetryPolicy(base_delay=0.01, max_delay=0.02)
+    results, idem, _ = _dispatch(tmp_path, {"a": [ApiError(400, -2010)]}, policy)
+    assert not results["a"]["success"]
+    assert len(ScriptedConnector.calls) == 1
+    assert idem.state(("e1", "a")) is None
+
+
+def test_attempts_are_capped(tmp_path):
+    policy = RetryPolicy(max_attempts=2, base_delay=0.01, max_delay=0.02)
+    results, _, _ = _dispatch(tmp_path, {"a": [ApiError(429)] * 5}, policy)
+    assert not results["a"]["success"]
+    assert len(ScriptedConnector.calls) == 2
+
+
+def test_budget_is_respected(tmp_path):
+    policy = RetryPolicy(max_attempts=100, base_delay=0.05, max_delay=0.05, budget=0.2)
+    _, _, started = _dispatch(tmp_path, {"a": [ApiError(429)] * 100}, policy)
+    assert ScriptedConnector.calls[-1][1] - started < 0.2
+    assert 1 < len(ScriptedConnector.calls) < 100
+
+
+def test_retries_do_not_delay_other_followers(tmp_path):
+    policy = RetryPolicy(base_delay=0.2, max_delay=0.2)
+    script = {"a": [ApiError(429)], "b": [ApiError(429)]}
+    results, _, started = _dispatch(tmp_path, script, policy, names=("a", "b", "c"))
+    assert all(r["success"] for r in results.values())
+    first_pass = [name for name, _ in ScriptedConnector.calls[:3]]
+    assert first_pass == ["a", "b", "c"]
+    # 两个 follower 的重试并发执行，总耗时不超过单次退避上限太多
+    assert ScriptedConnector.calls[-1][1] - started < 0.35
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import server.sharding as sharding
+from server.accounts import AccountService
+from server.balances import BalanceService
+from server.events import FillEvent
+from server.replay import MockConnector
+from server.sharding import ShardAccounts, ShardedDispatcher, shard_of
+
+
+class GateConnector(MockConnector):
+    """Mock connector whose orders wait while the ``SHARD_TEST_GATE`` file exists."""
+
+    async def _fill(self, *args, **kwargs):
+        while os.path.exists(os.environ["SHARD_TEST_GATE"]):
+            await asyncio.sleep(0.01)
+        return await super()._fill(*args, **kwargs)
+
+
+def _write_accounts(path, names):
+    accounts = [
+        {"name": n, "exchange": "binance", "env": "test", "api_key": "k", "api_secret": "s"}
+        for n in names
+    ]
+    path.write_text(json.dumps({"accounts": accounts}))
+
+
+def test_shard_of_is_stable_and_spreads():
+    names = [f"acct{i}" for i in range(1000)]
+    counts = [0, 0, 0, 0]
+    for name in names:
+        assert shard_of(name, 4) == shard_of(name, 4)
+        counts[shard_of(name, 4)] += 1
+    assert min(counts) > 200
+
+
+def test_shard_accounts_filters_and_reloads(tmp_path, monkeypatch):
+    import server.storage as storage
+
+    path = tmp_path / "accounts.json"
+    _write_accounts(path, ["a", "b", "c", "d"])
+    monkeypatch.setattr(storage, "_accounts_file", str(path))
+    monkeypatch.setattr(storage, "_accounts_storage", storage.JSONStorage(str(path)))
+    service = AccountService()
+    notes = []
+    owned = [ShardAccounts(service, i, 2, notify=notes.append) for i in range(2)]
+    assert sorted(a.name for s in owned for a in s.list_accounts()) == ["a", "b", "c", "d"]
+
+    _write_accounts(path, ["a", "b", "c", "d", "e"])
+    os.utime(path, ns=(1, 1))
+    assert sorted(a.name for s in owned for a in s.list_accounts()) == ["a", "b", "c", "d", "e"]
+
+    shard = owned[shard_of("a", 2)]
+    shard.update_account("a", status="paused")
+    assert notes == [{"type": "account_update", "account": "a", "updates": {"status": "paused"}}]
+
+
+def test_sharded_dispatch_end_to_end(tmp_path, monkeypatch):
+    names = [f"f{i}" for i in range(6)]
+    path = tmp_path / "accounts.json"
+    _write_accounts(path, names)
+    monkeypatch.setenv("ACCOUNTS_FILE", str(path))
+    # 子进程继承环境：worker 在分片模式下解封 run_worker 时导入本包
+    monkeypatch.setenv("DISPATCH_SHARDS", "2")
+    gate = tmp_path / "gate"
+    monkeypatch.setenv("SHARD_TEST_GATE", str(gate))
+    service = AccountService()
+    balances = BalanceService()
+
+    async def main():
+        dispatcher = ShardedDispatcher(
+            2,
+            service,
+            balances,
+            idem_dir=str(tmp_path),
+            connectors=f"{__name__}:GateConnector",
+        )
+        await dispatcher.startup()
+        try:
+            event = FillEvent("e1", "BUY", quote_filled=100.0, leader_free_usdt=1000.0)
+            await dispatcher.dispatch(event)
+            results = dispatcher.get_last_results()
+            assert sorted(results) == names
+            assert all(r["success"] for r in results.values())
+            assert len(dispatcher.get_history().query(event_id="e1")) == 6
+            metrics = dispatcher.get_shard_metrics()
+            assert [m["events"] for m in metrics] == [1, 1]
+            assert sum(m["accounts"] for m in metrics) == 6
+
+            # Balances come from the workers, optimistic fills included.
+            snapshot = balances.snapshot()
+            assert sorted(snapshot) == names
+            assert all(b["USDT"] == 900.0 for b in snapshot.values())
+            assert balances._tasks == {}
+
+            # Already processed: workers skip, no new history records.
+            await dispatcher.dispatch(event)
+            assert len(dispatcher.get_history().query(event_id="e1")) == 6
+
+            # Shards blocked on the gate are counted and no longer waited for.
+            gate.touch()
+            dispatcher._dispatch_timeout = 0.3
+            await dispatcher.dispatch(FillEvent("e2", "BUY", quote_filled=90.0, leader_free_usdt=900.0))
+            assert [m["timeouts"] for m in dispatcher.get_shard_metrics()] == [1, 1]
+            assert dispatcher._pending == {}
+
+            # Once released the workers finish e2 and keep serving fills.
+            gate.unlink()
+            dispatcher._dispatch_timeout = 30.0
+            await dispatcher.dispatch(FillEvent("e3", "BUY", quote_filled=90.0, leader_free_usdt=900.0))
+            assert len(dispatcher.get_history().query(event_id="e3")) == 6
+            assert [m["timeouts"] for m in dispatcher.get_shard_metrics()] == [1, 1]
+        finally:
+            await dispatcher.shutdown()
+        assert sorted(p.name for p in tmp_path.glob("idempotency.shard*.json")) == [
+            "idempotency.shard0.json", "idempotency.shard1.json"
+        ]
+
+    asyncio.run(main())
+
+
+def test_shutdown_does_not_hang_on_a_stuck_worker(tmp_path, monkeypatch):
+    path = tmp_path / "accounts.json"
+    _write_accounts(path, ["f0", "f4"])
+    monkeypatch.setenv("ACCOUNTS_FILE", str(path))
+    gate = tmp_path / "gate"
+    monkeypatch.setenv("SHARD_TEST_GATE", str(gate))
+    monkeypatch.setattr(sharding, "SHUTDOWN_JOIN_TIMEOUT", 0.5)
+
+    async def main():
+        dispatcher = ShardedDispatcher(
+            2, AccountService(), BalanceService(), idem_dir=str(tmp_path),
+            connectors=f"{__name__}:GateConnector", dispatch_timeout=0.3,
+        )
+        await dispatcher.startup()
+        procs = list(dispatcher._procs.values())
+        gate.touch()  # 两个 worker 都卡在下单上，不再读取 IPC 消息
+        await dispatcher.dispatch(FillEvent("e1", "BUY", quote_filled=100.0, leader_free_usdt=1000.0))
+        await asyncio.wait_for(dispatcher.shutdown(), 10)
+        assert not any(p.is_alive() for p in procs)
+
+    asyncio.run(main())
+
+
+def test_sharded_mode_imports_in_any_order(tmp_path):
+    env = dict(os.environ, DISPATCH_SHARDS="2", ACCOUNTS_FILE=str(tmp_path / "accounts.json"))
+    for first in ("server.sharding", "server.copy_dispatcher", "server.api"):
+        code = (
+            f"import {first}\n"
+            "from server.copy_dispatcher import copy_dispatcher\n"
+            "from server.sharding import ShardedDispatcher\n"
+            "assert isinstance(copy_dispatcher, ShardedDispatcher), type(copy_dispatcher)\n"
+            "assert copy_dispatcher.shards == 2\n"
+        )
+        proc = subprocess.run(
+            [sys.executable, "-c", code], cwd=Path(__file__).resolve().parents[1],
+            env=env, capture_output=True, text=True, timeout=60,
+        )
+        assert proc.returncode == 0, (first, proc.stderr)
+
+
+def test_crashing_worker_is_restarted_with_backoff(tmp_path, monkeypatch):
+    monkeypatch.setenv("ACCOUNTS_FILE", str(tmp_path / "accounts.json"))
+    monkeypatch.setattr(sharding, "RESTART_BACKOFF_BASE", 0.02)
+    monkeypatch.setattr(sharding, "RESTART_BACKOFF_MAX", 0.08)
+
+    class DeadProcess:
+        def is_alive(self):
+            return False
+
+    async def main():
+        dispatcher = ShardedDispatcher(1, AccountService(), BalanceService())
+        assert [dispatcher.restart_delay(n) for n in range(6)] == [0.0, 0.02, 0.04, 0.08, 0.08, 0.08]
+        loop = asyncio.get_running_loop()
+        spawned = []
+
+        def spawn(index):
+            # The first three restarts die during startup, the fourth connects.
+            spawned.append(loop.time())
+            dispatcher._procs[index] = DeadProcess()
+            if len(spawned) == 4:
+                dispatcher._ready[index].set()
+
+        dispatcher._spawn = spawn
+        dispatcher._ready[0] = asyncio.Event()
+        dispatcher._metrics[0] = {"restarts": 0}
+        dispatcher._crashes[0] = 1
+        await dispatcher._respawn(0)
+        gaps = [b - a for a, b in zip(spawned, spawned[1:])]
+        assert len(spawned) == 4 and dispatcher._metrics[0]["restarts"] == 4
+        assert dispatcher._crashes[0] == 4
+        assert gaps[0] >= 0.04 and gaps[1] >= 0.08 and gaps[2] >= 0.08
+
+    asyncio.run(main())
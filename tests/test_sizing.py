@@ -0,0 +1,71 @@
+import pytest
+
+from server import sizing
+from server.sizing import FollowerTable, size_orders
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        if sizing.np is None:
+            pytest.skip("numpy not installed")
+    else:
+        monkeypatch.setattr(sizing, "np", None)
+    return request.param
+
+
+def _table():
+    return FollowerTable.from_rows(
+        [
+            ("a", "binance", 123.456789, 0.123456789),
+            ("b", "bitget", 10.0, 0.5),
+            ("c", "binance", 0.0, 0.0),
+        ]
+    )
+
+
+def test_buy_sizes_and_rounds_per_exchange(backend):
+    sized = size_orders(_table(), "BUY", 0.5, 0.0)
+    assert sized.amounts[0] == pytest.approx(61.72)
+    assert sized.amounts[1] == pytest.approx(5.0)
+    assert sized.skip == [None, None, "zero quote_amt"]
+
+
+def test_sell_sizes_and_rounds_per_exchange(backend):
+    sized = size_orders(_table(), "SELL", 0.0, 0.5)
+    assert sized.amounts[0] == pytest.approx(0.061728)
+    assert sized.amounts[1] == pytest.approx(0.25)
+    assert sized.skip[2] == "zero base_amt"
+
+
+def test_min_amount_filter(backend, monkeypatch):
+    monkeypatch.setitem(sizing.MIN_AMOUNT, "binance", {"BUY": 100.0, "SELL": 0.0})
+    sized = size_orders(_table(), "BUY", 0.5, 0.0)
+    assert sized.skip[0] == "quote_amt below minimum 100.0"
+    assert sized.skip[1] is None
+
+
+def test_empty_table(backend):
+    sized = size_orders(FollowerTable.from_rows([]), "BUY", 1.0, 1.0)
+    assert sized.amounts == [] and sized.skip == []
+
+
+def test_min_notional_skips_dust_followers(backend):
+    table = FollowerTable.from_rows(
+        [
+            ("big", "binance", 1000.0, 0.01),
+            ("small", "binance", 40.0, 0.0004),
+            ("tiny", "bitget", 8.0, 0.00001),
+        ]
+    )
+    sized = size_orders(table, "BUY", 0.1, 0.0)
+    assert sized.skip == [None, "notional 4.00 below minimum 5.0", "notional 0.80 below minimum 1.0"]
+
+    sized = size_orders(table, "SELL", 0.0, 0.1, price=60_000.0)
+    assert sized.skip[0] is None  # 0.001 BTC = 60 USDT
+    assert sized.skip[1] == "notional 2.40 below minimum 5.0"
+    assert sized.skip[2] == "notional 0.06 below minimum 1.0"
+
+    # Without a price SELL orders are only checked against the minimum quantity.
+    sized = size_orders(table, "SELL", 0.0, 0.1)
+    assert sized.skip == [None, None, None]
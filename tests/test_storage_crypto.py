@@ -0,0 +1,119 @@
+import base64
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from server import crypto
+from server.storage import EncryptedJSONStorage
+
+
+def _legacy(data, secret):
+    key = hashlib.sha256(secret.encode()).digest()
+    plain = json.dumps(data).encode()
+    return base64.b64encode(bytes(b ^ key[i % len(key)] for i, b in enumerate(plain)))
+
+
+@pytest.mark.parametrize("cipher", [crypto.AES_GCM, crypto.SHAKE_HMAC])
+def test_seal_round_trip_and_tamper_detection(cipher):
+    if cipher == crypto.AES_GCM and crypto.AESGCM is None:
+        pytest.skip("cryptography not installed")
+    plain = json.dumps({"accounts": [{"api_secret": "x" * 64}] * 300}).encode()
+    sealed = crypto.seal(plain, b"secret", cipher=cipher)
+    assert sealed.startswith(crypto.MAGIC) and crypto.header_cipher(sealed) == cipher
+    assert b"api_secret" not in sealed
+    assert crypto.open_sealed(sealed, b"secret") == plain
+
+    flipped = bytearray(sealed)
+    flipped[crypto.HEADER_SIZE + 5] ^= 1
+    with pytest.raises(crypto.DecryptionError):
+        crypto.open_sealed(bytes(flipped), b"secret")
+    with pytest.raises(crypto.DecryptionError):
+        crypto.open_sealed(sealed, b"other")
+    header = bytearray(sealed)
+    header[7] ^= 1  # 盐也在认证范围内
+    with pytest.raises(crypto.DecryptionError):
+        crypto.open_sealed(bytes(header), b"secret")
+
+
+def test_legacy_xor_file_is_migrated(tmp_path):
+    path = tmp_path / "creds.json"
+    data = {"api_key": "k", "api_secret": "s"}
+    path.write_bytes(_legacy(data, "pw"))
+    assert EncryptedJSONStorage(str(path), "pw", migrate=True).load() == data
+    assert crypto.is_sealed(path.read_bytes())
+    assert EncryptedJSONStorage(str(path), "pw").load() == data
+
+
+def test_plain_json_file_is_migrated(tmp_path):
+    path = tmp_path / "accounts.json"
+    path.write_text(json.dumps({"accounts": [{"name": "a"}]}))
+    assert EncryptedJSONStorage(str(path), "pw", migrate=True).load() == {"accounts": [{"name": "a"}]}
+    assert crypto.is_sealed(path.read_bytes())
+
+
+def test_plain_accounts_are_migrated_once_on_upgrade(tmp_path):
+    path = tmp_path / "accounts.json"
+    path.write_text(json.dumps({"accounts": [{"name": "a"}]}))
+    # 升级后首次启动：从未加密过，自动迁移一次并留下标记
+    assert EncryptedJSONStorage(str(path), "pw").load() == {"accounts": [{"name": "a"}]}
+    assert crypto.is_sealed(path.read_bytes())
+    assert (tmp_path / "accounts.json.sealed").exists()
+
+    path.write_text(json.dumps({"accounts": [{"name": "evil"}]}))
+    with pytest.raises(crypto.DecryptionError):
+        EncryptedJSONStorage(str(path), "pw").load()
+
+
+def test_unsealed_file_is_rejected_without_migrate(tmp_path):
+    # 能写文件的人不能用明文替换掉已加密的账户
+    path = tmp_path / "accounts.json"
+    EncryptedJSONStorage(str(path), "pw").save({"accounts": [{"name": "a"}]})
+    path.write_text(json.dumps({"accounts": [{"name": "evil"}]}))
+    with pytest.raises(crypto.DecryptionError):
+        EncryptedJSONStorage(str(path), "pw").load()
+    path.write_bytes(_legacy({"api_key": "k"}, "pw"))
+    with pytest.raises(crypto.DecryptionError):
+        EncryptedJSONStorage(str(path), "pw").load()
+
+
+def test_key_is_derived_once_per_file(tmp_path):
+    path = str(tmp_path / "s.json")
+    storage = EncryptedJSONStorage(path, "pw-cache")
+    storage.save({"n": 0})
+    misses = crypto.derive_key.cache_info().misses
+    for i in range(1, 20):
+        storage.save({"n": i})
+    reopened = EncryptedJSONStorage(path, "pw-cache")
+    assert reopened.load() == {"n": 19}
+    reopened.save({"n": 20})
+    assert crypto.derive_key.cache_info().misses == misses
+
+
+def test_wrong_secret_raises_instead_of_loading_empty(tmp_path):
+    path = str(tmp_path / "s.json")
+    EncryptedJSONStorage(path, "right").save({"a": 1})
+    with pytest.raises(crypto.DecryptionError):
+        EncryptedJSONStorage(path, "wrong").load()
+
+
+def test_secret_without_cryptography_fails_closed(tmp_path):
+    code = "import server.crypto as c; c.AESGCM = None; import server.storage"
+    env = dict(
+        os.environ,
+        STORAGE_SECRET="pw",
+        LEADER_CRED_FILE=str(tmp_path / "creds.json"),
+        ACCOUNTS_FILE=str(tmp_path / "accounts.json"),
+    )
+    env.pop("STORAGE_ALLOW_STDLIB_CIPHER", None)
+    root = Path(__file__).resolve().parents[1]
+    proc = subprocess.run([sys.executable, "-c", code], cwd=root, env=env, capture_output=True, text=True)
+    assert proc.returncode != 0 and "cryptography" in proc.stderr
+
+    env["STORAGE_ALLOW_STDLIB_CIPHER"] = "1"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=root, env=env, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
@@ -0,0 +1,111 @@
+import asyncio
+import contextlib
+
+import httpx
+
+from server.accounts import Account, AccountStatus
+from server.connectors import http
+from server.connectors.binance import BinanceConnector
+from server.leader_watcher import watch_leader_orders
+from server.warmer import ConnectionWarmer
+
+
+class StubAccounts:
+    def __init__(self, accounts):
+        self._accounts = accounts
+
+    def list_accounts(self):
+        return self._accounts
+
+
+class WarmableConnector:
+    calls = []
+
+    @classmethod
+    async def warm(cls, accounts, *, env="", parallel=1):
+        await asyncio.sleep(0.01)
+        cls.calls.append((sorted(a.name for a in accounts), env, parallel))
+
+
+class PlainConnector:
+    pass
+
+
+def _accounts():
+    return StubAccounts([
+        Account(name="a", exchange="binance", env="prod", api_key="k", api_secret="s"),
+        Account(name="b", exchange="binance", env="prod", api_key="k", api_secret="s"),
+        Account(name="c", exchange="binance", env="test", api_key="k", api_secret="s"),
+        Account(name="d", exchange="binance", env="prod", api_key="k", api_secret="s",
+                status=AccountStatus.PAUSED),
+        Account(name="e", exchange="bitget", env="prod", api_key="k", api_secret="s"),
+    ])
+
+
+def test_warm_groups_active_accounts_by_venue():
+    WarmableConnector.calls = []
+    warmer = ConnectionWarmer(
+        _accounts(), lambda: {"binance": WarmableConnector, "bitget": PlainConnector}
+    )
+    asyncio.run(warmer.warm("test"))
+    assert sorted(WarmableConnector.calls) == [(["a", "b"], "prod", 2), (["c"], "test", 1)]
+    status = warmer.status()
+    assert status["runs"] == 1 and status["errors"] == 0 and status["last_reason"] == "test"
+
+
+def test_poke_is_debounced():
+    WarmableConnector.calls = []
+    warmer = ConnectionWarmer(_accounts(), lambda: {"binance": WarmableConnector}, min_gap=10)
+
+    async def main():
+        warmer.poke("leader_new")
+        warmer.poke("leader_new")  # 正在预热：忽略
+        await asyncio.sleep(0.05)
+        warmer.poke("leader_new")  # 刚预热过：忽略
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert warmer.status()["runs"] == 1
+
+
+def test_failed_warm_is_counted():
+    class Broken:
+        @classmethod
+        async def warm(cls, accounts, *, env="", parallel=1):
+            raise ConnectionError("down")
+
+    warmer = ConnectionWarmer(_accounts(), lambda: {"binance": Broken})
+    asyncio.run(warmer.warm())
+    assert warmer.status()["errors"] == 2
+
+
+def test_binance_warm_opens_parallel_requests(monkeypatch):
+    seen = []
+    monkeypatch.setattr(
+        http.httpx, "AsyncHTTPTransport",
+        lambda **kw: httpx.MockTransport(
+            lambda r: seen.append(r.url.path) or httpx.Response(200, json={"serverTime": 1})
+        ),
+    )
+    monkeypatch.setattr(http, "transport_pool", http.TransportPool())
+    monkeypatch.setattr(http, "HTTP2_ENABLED", False)
+    asyncio.run(BinanceConnector.warm([], env="prod", parallel=3))
+    assert seen == ["/api/v3/time"] * 3
+
+
+def test_watcher_reports_leader_activity(dummy_binance_sdk):
+    activity = []
+    new = {"e": "executionReport", "X": "NEW", "o": "MARKET", "i": 1, "S": "BUY"}
+    filled = {"e": "executionReport", "X": "FILLED", "o": "MARKET", "i": 1, "S": "BUY",
+              "Z": 10.0, "z": 0.001}
+    balance = {"e": "outboundAccountPosition", "B": [{"a": "USDT", "f": "90.0"}]}
+
+    async def main():
+        dummy_binance_sdk.set_events([new, filled, balance])
+        agen = watch_leader_orders("k", "s", on_activity=activity.append)
+        await agen.__anext__()
+        with contextlib.suppress(BaseException):
+            await agen.aclose()
+
+    asyncio.run(main())
+    assert activity == ["leader_reconnect", "leader_new"]